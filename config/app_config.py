@@ -230,6 +230,9 @@ def initialize_managers():
     user_app_manager = UserAppManager(logs_manager)
     user_preferences = UserPreferences(logs_manager, user_app_manager=user_app_manager)
     websocket_manager = WebSocketManager(logs_manager)
+    
+    # Push VFS changes to clients watching directories instead of having them poll
+    virtual_file_manager.add_change_listener(websocket_manager.broadcast_vfs_changes)
 
     # Initialize service manager with logger and VFS manager
     service_manager = get_service_manager(logs_manager, virtual_file_manager)
@@ -396,7 +399,8 @@ def upload_assets_to_vfs(asset_mappings, managers):
             print(f"  ⚠️  Local path not found: {full_local_path}")
             continue
         
-        # Upload all files in the directory
+        # Upload all files in the directory as one batch (a failed file does not stop the rest)
+        operations = []
         for root, dirs, files in os.walk(full_local_path):
             for file in files:
                 file_path = os.path.join(root, file)
@@ -407,14 +411,20 @@ def upload_assets_to_vfs(asset_mappings, managers):
                     with open(file_path, 'rb') as f:
                         file_content = f.read()
                     
-                    success = managers['virtual_file_manager'].create_file(vfs_file_path, file_content)
-                    if success:
-                        print(f"  ✅ Uploaded: {file} -> {vfs_file_path}")
-                    else:
-                        print(f"  ❌ Failed to upload: {file}")
+                    operations.append({'op': 'create', 'path': vfs_file_path, 'content': file_content})
                         
                 except Exception as e:
                     eprint(f"  ❌ Error uploading {file}: {e}")
+        
+        if not operations:
+            continue
+        
+        batch = managers['virtual_file_manager'].apply_batch(operations, atomic=False)
+        for result in batch['results']:
+            if result['success']:
+                print(f"  ✅ Uploaded: {result['path']}")
+            else:
+                print(f"  ❌ Failed to upload: {result['path']}")
 
 def set_default_preferences(preferences, managers):
     """Set default preferences using the preferences API"""
@@ -1,29 +1,109 @@
 """
 Logs Manager for Sypnex OS
-Handles logging operations with VFS storage and file size management
+Handles logging operations with append-only SQLite storage and segment rotation
 """
 
 import json
 import os
-from datetime import datetime
+import base64
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
-from core.virtual_file_manager import VirtualFileManager
+from core.virtual_file_manager import SQLiteConnectionPool
 
 
 class LogsManager:
-    def __init__(self, vfs_manager):
+    # Log buckets - each one used to be a /logs/<component> directory in the VFS
+    COMPONENT_TYPES = ['core-os', 'user-apps', 'services', 'system']
+    MAX_QUERY_LIMIT = 1000  # Most entries a single query returns
+    
+    def __init__(self, vfs_manager, db_path="data/logs.db", queue_size=10000, flush_interval=0.5,
+                 batch_size=500, overflow_policy='drop'):
         self.vfs_manager = vfs_manager
+        self.db_path = db_path
         self.blueprint = Blueprint('logs', __name__)
-        self.max_file_size = 2 * 1024 * 1024  # 2MB in bytes (configurable later via system settings)
+        self.max_file_size = 2 * 1024 * 1024  # 2MB per segment in bytes (configurable later via system settings)
+        self.max_segments = 4  # Segments kept per component per day before the oldest is dropped
+        
+        # Logs live in their own database so log appends never contend with VFS writers
+        self.pool = SQLiteConnectionPool(db_path, pool_size=4, pragmas=['journal_mode=WAL', 'synchronous=NORMAL'])
+        self.write_lock = threading.Lock()  # Serializes segment bookkeeping between writers
+        
+        # Background writer - log() only enqueues, entries are group-committed in batches
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.flush_interval = flush_interval  # Max seconds an entry waits for its batch to fill
+        self.batch_size = batch_size  # Max entries committed per transaction
+        self.overflow_policy = overflow_policy  # 'drop' discards when full, 'block' waits up to flush_interval
+        self.writer_thread = None
+        self._writer_stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.writer_stats = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'batches': 0,
+            'largest_batch': 0,
+            'write_errors': 0
+        }
+        
+        self._init_database()
         self.setup_routes()
         self.ensure_log_directories()
+        self._migrate_vfs_logs()
+        
+        self.start_writer()
+        atexit.register(self.shutdown)
+    
+    def _init_database(self):
+        """Initialize the append-only log tables."""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            # One row per log entry; rows are only ever inserted or dropped by segment
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS log_entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    component_type TEXT NOT NULL,
+                    log_date TEXT NOT NULL,
+                    segment INTEGER NOT NULL DEFAULT 0,
+                    timestamp TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    source TEXT,
+                    entry TEXT NOT NULL
+                )
+            ''')
+            
+            # Running size/count per segment so appends never have to measure existing data
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS log_segments (
+                    component_type TEXT NOT NULL,
+                    log_date TEXT NOT NULL,
+                    segment INTEGER NOT NULL,
+                    size_bytes INTEGER NOT NULL DEFAULT 0,
+                    entry_count INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (component_type, log_date, segment)
+                )
+            ''')
+            
+            # Indexes for rotation and for the query engine (filters + newest-first ordering)
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_log_entries_segment ON log_entries(component_type, log_date, segment)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_log_entries_time ON log_entries(timestamp, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_log_entries_component_time ON log_entries(component_type, timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_log_entries_level_time ON log_entries(level, timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_log_entries_source_time ON log_entries(source COLLATE NOCASE, timestamp)')
+            
+            conn.commit()
     
     def ensure_log_directories(self):
         """Create log directory structure in VFS"""
         directories = [
             '/logs',
             '/logs/core-os',
-            '/logs/user-apps', 
+            '/logs/user-apps',
             '/logs/services',
             '/logs/system'  # For failed log attempts and system logs
         ]
@@ -31,33 +111,405 @@ class LogsManager:
             if not self.vfs_manager.get_file_info(directory):
                 self.vfs_manager.create_directory(directory)
     
-    def _get_file_size(self, file_path):
-        """Get the size of a file in the VFS"""
+    def _migrate_vfs_logs(self):
+        """Import legacy /logs/<component>/*.log files from the VFS and remove them."""
+        for component_type in self.COMPONENT_TYPES:
+            component_path = f'/logs/{component_type}'
+            try:
+                files = self.vfs_manager.list_directory(component_path)
+            except Exception:
+                continue
+            
+            for file_info in files:
+                if file_info['is_directory'] or not file_info['name'].endswith('.log'):
+                    continue
+                
+                file_path = f"{component_path}/{file_info['name']}"
+                try:
+                    file_data = self.vfs_manager.read_file(file_path)
+                    content = file_data['content'].decode('utf-8') if file_data and file_data['content'] else ""
+                    
+                    batch = []
+                    for line in content.split('\n'):
+                        if not line:
+                            continue
+                        try:
+                            batch.append((component_type, json.loads(line)))
+                        except json.JSONDecodeError:
+                            continue  # Skip malformed log entries
+                    
+                    if batch:
+                        self._append_entries(batch)
+                    self.vfs_manager.delete_path(file_path)
+                    print(f"Migrated {len(batch)} log entries from {file_path}")
+                except Exception as e:
+                    eprint(f"Failed to migrate log file {file_path}: {e}")
+    
+    def _resolve_component_type(self, component, default):
+        """Map a log entry component onto one of the storage buckets."""
+        component_type = component.lower()
+        if component_type not in ['core-os', 'user-apps', 'services']:
+            component_type = default
+        return component_type
+    
+    def _drop_old_segments(self, cursor, component_type, log_date, newest_segment):
+        """Drop segments that fall outside the retention window for a component/day."""
+        oldest_kept = newest_segment - self.max_segments + 1
+        cursor.execute('''
+            DELETE FROM log_entries
+            WHERE component_type = ? AND log_date = ? AND segment < ?
+        ''', (component_type, log_date, oldest_kept))
+        cursor.execute('''
+            DELETE FROM log_segments
+            WHERE component_type = ? AND log_date = ? AND segment < ?
+        ''', (component_type, log_date, oldest_kept))
+    
+    def drop_segments(self, before_date=None, max_total_bytes=None):
+        """
+        Drop whole log segments and their entries for retention.
+        
+        Args:
+            before_date: Drop every segment logged before this YYYY-MM-DD date
+            max_total_bytes: Then drop the oldest segments until the rest fit in this size
+        
+        Returns:
+            dict: segments_deleted, entries_deleted and bytes_freed
+        """
+        result = {'segments_deleted': 0, 'entries_deleted': 0, 'bytes_freed': 0}
+        
+        with self.write_lock:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT component_type, log_date, segment, size_bytes, entry_count
+                    FROM log_segments
+                    ORDER BY log_date, segment
+                ''')
+                segments = cursor.fetchall()
+                
+                remaining = sum(row[3] for row in segments)
+                doomed = []
+                for component_type, log_date, segment, size_bytes, entry_count in segments:
+                    too_old = before_date is not None and log_date < before_date
+                    too_big = max_total_bytes is not None and remaining > max_total_bytes
+                    if not too_old and not too_big:
+                        continue
+                    doomed.append((component_type, log_date, segment))
+                    remaining -= size_bytes
+                    result['segments_deleted'] += 1
+                    result['entries_deleted'] += entry_count
+                    result['bytes_freed'] += size_bytes
+                
+                cursor.executemany('''
+                    DELETE FROM log_entries
+                    WHERE component_type = ? AND log_date = ? AND segment = ?
+                ''', doomed)
+                cursor.executemany('''
+                    DELETE FROM log_segments
+                    WHERE component_type = ? AND log_date = ? AND segment = ?
+                ''', doomed)
+                conn.commit()
+        
+        return result
+    
+    def _append_entries(self, batch):
+        """
+        Append log entries to the active segment of their component/day.
+        
+        Args:
+            batch: List of (component_type, log_entry) tuples
+        
+        Returns:
+            int: Number of segment rotations triggered by this batch
+        """
+        rotations = 0
+        
+        with self.write_lock:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                active_segments = {}  # (component_type, log_date) -> [segment, size_bytes]
+                
+                for component_type, log_entry in batch:
+                    line = json.dumps(log_entry)
+                    entry_size = len(line.encode('utf-8')) + 1  # Include the newline of the old file format
+                    timestamp = log_entry.get('timestamp') or (datetime.utcnow().isoformat() + 'Z')
+                    log_date = timestamp[:10]
+                    key = (component_type, log_date)
+                    
+                    if key not in active_segments:
+                        cursor.execute('''
+                            SELECT segment, size_bytes FROM log_segments
+                            WHERE component_type = ? AND log_date = ?
+                            ORDER BY segment DESC LIMIT 1
+                        ''', key)
+                        row = cursor.fetchone()
+                        if row is None:
+                            cursor.execute('''
+                                INSERT INTO log_segments (component_type, log_date, segment)
+                                VALUES (?, ?, 0)
+                            ''', key)
+                            row = (0, 0)
+                        active_segments[key] = list(row)
+                    
+                    segment, segment_size = active_segments[key]
+                    
+                    # Rotate by starting a new segment instead of rewriting or deleting a file
+                    if segment_size > 0 and segment_size + entry_size > self.max_file_size:
+                        segment += 1
+                        segment_size = 0
+                        cursor.execute('''
+                            INSERT INTO log_segments (component_type, log_date, segment)
+                            VALUES (?, ?, ?)
+                        ''', (component_type, log_date, segment))
+                        self._drop_old_segments(cursor, component_type, log_date, segment)
+                        rotations += 1
+                    
+                    cursor.execute('''
+                        INSERT INTO log_entries
+                        (component_type, log_date, segment, timestamp, level, source, entry)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', (component_type, log_date, segment, timestamp,
+                          log_entry.get('level', ''), log_entry.get('source', ''), line))
+                    cursor.execute('''
+                        UPDATE log_segments
+                        SET size_bytes = size_bytes + ?, entry_count = entry_count + 1
+                        WHERE component_type = ? AND log_date = ? AND segment = ?
+                    ''', (entry_size, component_type, log_date, segment))
+                    
+                    active_segments[key] = [segment, segment_size + entry_size]
+                
+                conn.commit()
+        
+        return rotations
+    
+    def _encode_cursor(self, timestamp, entry_id):
+        """Encode a (timestamp, id) position as an opaque pagination cursor."""
+        return base64.urlsafe_b64encode(json.dumps([timestamp, entry_id]).encode('utf-8')).decode('ascii')
+    
+    def _decode_cursor(self, cursor_token):
+        """Decode a pagination cursor. Raises ValueError if it is malformed."""
         try:
-            file_info = self.vfs_manager.get_file_info(file_path)
-            if file_info:
-                return file_info.get('size', 0)
-            return 0
+            timestamp, entry_id = json.loads(base64.urlsafe_b64decode(cursor_token.encode('ascii')))
+            return str(timestamp), int(entry_id)
         except Exception:
-            return 0
+            raise ValueError('Invalid cursor')
+    
+    def _range_bound(self, value, upper=False):
+        """
+        Convert a date (YYYY-MM-DD) or ISO timestamp into a timestamp bound.
+        Date-only upper bounds include the whole day.
+        """
+        if len(value) == 10:
+            day = datetime.strptime(value, '%Y-%m-%d')
+            if upper:
+                day += timedelta(days=1)
+            return day.strftime('%Y-%m-%d')
+        return value
     
-    def _handle_file_size_limit(self, log_path):
-        """Check if file exceeds size limit and handle rotation"""
-        if self._get_file_size(log_path) >= self.max_file_size:
+    def query_logs(self, components=None, level=None, source=None, start=None, end=None,
+                   limit=100, cursor=None):
+        """
+        Query log entries newest-first with filters and limit pushed down to SQLite.
+        
+        Args:
+            components: List of component buckets to include (None for all)
+            level: Log level to match (case-insensitive, None for all)
+            source: Source to match (case-insensitive, None for all)
+            start: Inclusive lower bound - date (YYYY-MM-DD) or ISO timestamp
+            end: Upper bound - date (whole day included) or exclusive ISO timestamp
+            limit: Maximum number of entries to return (1 to MAX_QUERY_LIMIT)
+            cursor: Cursor returned by a previous call to continue from
+            
+        Returns:
+            tuple: (entries, next_cursor) - next_cursor is None when there are no more results
+            
+        Raises:
+            ValueError: If limit is not a positive integer or the cursor is malformed
+        """
+        limit = self._parse_limit(limit)
+        
+        conditions = []
+        params = []
+        
+        if components:
+            conditions.append(f"component_type IN ({','.join('?' for _ in components)})")
+            params.extend(components)
+        if level:
+            conditions.append('level = ?')
+            params.append(level.upper())
+        if source:
+            conditions.append('source = ? COLLATE NOCASE')
+            params.append(source)
+        if start:
+            conditions.append('timestamp >= ?')
+            params.append(self._range_bound(start))
+        if end:
+            conditions.append('timestamp < ?')
+            params.append(self._range_bound(end, upper=True))
+        if cursor:
+            cursor_timestamp, cursor_id = self._decode_cursor(cursor)
+            conditions.append('(timestamp < ? OR (timestamp = ? AND id < ?))')
+            params.extend([cursor_timestamp, cursor_timestamp, cursor_id])
+        
+        where = ' AND '.join(conditions) if conditions else '1 = 1'
+        
+        with self.pool.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT id, timestamp, entry FROM log_entries
+                WHERE {where}
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+            ''', params + [limit + 1]).fetchall()
+        
+        # Only the rows being returned are ever decoded
+        entries = []
+        for entry_id, timestamp, line in rows[:limit]:
             try:
-                # Delete the old file and let a new one be created
-                self.vfs_manager.delete_path(log_path)
-                return True  # Indicates file was rotated
-            except Exception as e:
-                # Log this failure to system logs if possible
-                self._log_system_error(f"Failed to rotate log file {log_path}: {str(e)}")
-                return False
-        return False
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # Skip malformed log entries
+        
+        next_cursor = None
+        if len(rows) > limit:
+            last_id, last_timestamp, _ = rows[limit - 1]
+            next_cursor = self._encode_cursor(last_timestamp, last_id)
+        
+        return entries, next_cursor
+    
+    def _parse_limit(self, limit):
+        """Parse a query limit, capped at MAX_QUERY_LIMIT. Raises ValueError if it is not a positive integer."""
+        if isinstance(limit, bool) or not isinstance(limit, (int, str)):
+            raise ValueError('limit must be a positive integer')
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('limit must be a positive integer')
+        if limit < 1:
+            raise ValueError('limit must be a positive integer')
+        return min(limit, self.MAX_QUERY_LIMIT)
+    
+    def _count(self, stat, amount=1):
+        """Increment a writer statistics counter."""
+        with self._stats_lock:
+            self.writer_stats[stat] += amount
+    
+    def start_writer(self):
+        """Start the background thread that persists queued log entries."""
+        if self.writer_thread and self.writer_thread.is_alive():
+            return
+        self._writer_stop.clear()
+        self.writer_thread = threading.Thread(target=self._writer_loop, name='logs-writer', daemon=True)
+        self.writer_thread.start()
+    
+    def _writer_loop(self):
+        """Collect queued entries into batches and commit each batch in one transaction."""
+        while True:
+            stopping = self._writer_stop.is_set()
+            try:
+                first = self.queue.get(timeout=0 if stopping else self.flush_interval)
+            except queue.Empty:
+                if stopping:
+                    break
+                continue
+            
+            # Linger until the batch is full or the flush interval has passed
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = 0 if stopping else deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self.queue.get(timeout=remaining))
+                    else:
+                        batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            self._write_batch(batch)
+    
+    def _write_batch(self, batch):
+        """Persist a batch of queued entries and mark them done."""
+        try:
+            self._append_entries(batch)
+            self._count('written', len(batch))
+            self._count('batches')
+            with self._stats_lock:
+                self.writer_stats['largest_batch'] = max(self.writer_stats['largest_batch'], len(batch))
+        except Exception as e:
+            self._count('write_errors')
+            eprint(f"LogsManager: Failed to write batch of {len(batch)} log entries: {e}")
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+    
+    def _enqueue(self, component_type, log_entry):
+        """
+        Hand an entry to the background writer without waiting for I/O.
+        
+        Returns:
+            bool: False if the entry was dropped because the queue was full
+        """
+        # Without a running writer there is nothing to drain the queue - write inline
+        if not (self.writer_thread and self.writer_thread.is_alive()):
+            self._append_entries([(component_type, log_entry)])
+            return True
+        
+        try:
+            if self.overflow_policy == 'block':
+                self.queue.put((component_type, log_entry), timeout=self.flush_interval)
+            else:
+                self.queue.put_nowait((component_type, log_entry))
+            self._count('enqueued')
+            return True
+        except queue.Full:
+            self._count('dropped')
+            return False
+    
+    def flush(self, timeout=None):
+        """
+        Wait until every queued entry has been written.
+        
+        Returns:
+            bool: True if the queue drained before the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+    
+    def shutdown(self, timeout=10):
+        """Stop the background writer after flushing everything still queued."""
+        self._writer_stop.set()
+        if self.writer_thread and self.writer_thread.is_alive():
+            self.writer_thread.join(timeout=timeout)
+        
+        # Write anything the thread did not get to (e.g. if it was never started)
+        leftover = []
+        while True:
+            try:
+                leftover.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftover:
+            self._write_batch(leftover)
+    
+    def get_writer_stats(self):
+        """Get background writer statistics."""
+        with self._stats_lock:
+            stats = dict(self.writer_stats)
+        stats['queued'] = self.queue.qsize()
+        stats['queue_capacity'] = self.queue.maxsize
+        stats['overflow_policy'] = self.overflow_policy
+        stats['running'] = bool(self.writer_thread and self.writer_thread.is_alive())
+        return stats
     
     def _log_system_error(self, message):
         """Log system-level errors (like failed log operations)"""
         try:
-            error_log_path = '/logs/system/errors.log'
             error_entry = {
                 'timestamp': datetime.utcnow().isoformat() + 'Z',
                 'level': 'ERROR',
@@ -65,33 +517,11 @@ class LogsManager:
                 'message': message,
                 'source': 'system'
             }
-            
-            # Check size limit for error log too
-            if self._get_file_size(error_log_path) >= self.max_file_size:
-                try:
-                    self.vfs_manager.delete_path(error_log_path)
-                except Exception:
-                    pass  # Can't do much if we can't even clear the error log
-            
-            # Read existing content
-            existing_content = ""
-            file_data = self.vfs_manager.read_file(error_log_path)
-            if file_data:
-                existing_content = file_data['content'].decode('utf-8') if file_data['content'] else ""
-            
-            # Append new error entry
-            new_content = existing_content + json.dumps(error_entry) + '\n'
-            
-            # Create file if it doesn't exist, otherwise update it
-            if not self.vfs_manager.get_file_info(error_log_path):
-                self.vfs_manager.create_file(error_log_path, new_content.encode('utf-8'), 'text/plain')
-            else:
-                self.vfs_manager.write_file(error_log_path, new_content.encode('utf-8'))
-            
-        except Exception:
-            # If we can't even log the error, there's not much we can do
-            # In a future version, this could fall back to console output
-            pass
+            self._append_entries([('system', error_entry)])
+        
+        except Exception as e:
+            # If we can't even log the error, fall back to console output
+            eprint(f"LogsManager: {message} (also failed to persist error: {e})")
     
     def setup_routes(self):
         @self.blueprint.route('/api/logs/write', methods=['POST'])
@@ -120,41 +550,28 @@ class LogsManager:
                     'source': data.get('source', 'unknown')
                 }
                 
-                # Determine log file path
-                component_type = data['component'].lower()
-                if component_type not in ['core-os', 'user-apps', 'services']:
-                    component_type = 'user-apps'  # default fallback
+                # Determine log bucket
+                component_type = self._resolve_component_type(data['component'], 'user-apps')
                 
-                # Log file naming: /logs/component-type/YYYY-MM-DD.log
-                log_date = datetime.utcnow().strftime('%Y-%m-%d')
+                # Legacy path kept for API compatibility: /logs/component-type/YYYY-MM-DD.log
+                log_date = log_entry['timestamp'][:10]
                 log_path = f'/logs/{component_type}/{log_date}.log'
                 
-                # Check and handle file size limit
-                file_rotated = self._handle_file_size_limit(log_path)
-                
-                # Read existing content if file exists
-                existing_content = ""
-                file_data = self.vfs_manager.read_file(log_path)
-                if file_data:
-                    existing_content = file_data['content'].decode('utf-8') if file_data['content'] else ""
-                
-                # Append new log entry
-                new_content = existing_content + json.dumps(log_entry) + '\n'
-                
-                # Create file if it doesn't exist, otherwise update it
-                if not self.vfs_manager.get_file_info(log_path):
-                    self.vfs_manager.create_file(log_path, new_content.encode('utf-8'), 'text/plain')
-                else:
-                    self.vfs_manager.write_file(log_path, new_content.encode('utf-8'))
+                # Hand off to the background writer - rotation happens there, so it is never reported here
+                queued = self._enqueue(component_type, log_entry)
                 
                 response_data = {
-                    'success': True, 
+                    'success': queued,
                     'log_path': log_path,
-                    'file_rotated': file_rotated
+                    'file_rotated': False,
+                    'queued': queued
                 }
                 
-                return jsonify(response_data), 200
+                if not queued:
+                    return jsonify({**response_data, 'error': 'Log queue is full, entry dropped'}), 503
                 
+                return jsonify(response_data), 200
+            
             except Exception as e:
                 error_msg = f'Failed to write log: {str(e)}'
                 self._log_system_error(error_msg)
@@ -162,57 +579,55 @@ class LogsManager:
         
         @self.blueprint.route('/api/logs/read', methods=['GET'])
         def read_logs():
-            """Read logs with filtering options"""
+            """Read logs with filtering options and cursor pagination"""
             try:
                 # Query parameters
                 component = request.args.get('component', 'all')
                 level = request.args.get('level', 'all')
-                date = request.args.get('date', datetime.utcnow().strftime('%Y-%m-%d'))
-                limit = int(request.args.get('limit', 100))
+                try:
+                    limit = self._parse_limit(request.args.get('limit', 100))
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
                 source = request.args.get('source', 'all')
+                cursor = request.args.get('cursor')
+                start = request.args.get('start')
+                end = request.args.get('end')
                 
-                logs = []
+                # A single day is the default window unless an explicit range is given
+                date = request.args.get('date')
+                if not date and not start and not end:
+                    date = datetime.utcnow().strftime('%Y-%m-%d')
+                if date and date != 'all':
+                    start = start or date
+                    end = end or date
                 
                 # Determine which component logs to read
-                valid_components = ['core-os', 'user-apps',  'services', 'system']
-                components_to_read = valid_components if component == 'all' else [component]
+                components_to_read = None if component == 'all' else [component]
                 
-                for comp in components_to_read:
-                    log_path = f'/logs/{comp}/{date}.log'
-                    
-                    file_data = self.vfs_manager.read_file(log_path)
-                    if file_data:
-                        content = file_data['content'].decode('utf-8') if file_data['content'] else ""
-                        
-                        # Parse log entries
-                        for line in content.strip().split('\n'):
-                            if line:
-                                try:
-                                    log_entry = json.loads(line)
-                                    
-                                    # Apply filters
-                                    if level != 'all' and log_entry.get('level', '').lower() != level.lower():
-                                        continue
-                                    
-                                    if source != 'all' and log_entry.get('source', '').lower() != source.lower():
-                                        continue
-                                    
-                                    logs.append(log_entry)
-                                    
-                                except json.JSONDecodeError:
-                                    continue  # Skip malformed log entries
-                
-                # Sort by timestamp (newest first) and apply limit
-                logs.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-                logs = logs[:limit]
+                try:
+                    logs, next_cursor = self.query_logs(
+                        components=components_to_read,
+                        level=None if level == 'all' else level,
+                        source=None if source == 'all' else source,
+                        start=start,
+                        end=end,
+                        limit=limit,
+                        cursor=cursor
+                    )
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
                 
                 return jsonify({
                     'logs': logs,
                     'total': len(logs),
+                    'next_cursor': next_cursor,
+                    'has_more': next_cursor is not None,
                     'filters': {
                         'component': component,
                         'level': level,
                         'date': date,
+                        'start': start,
+                        'end': end,
                         'source': source,
                         'limit': limit
                     }
@@ -227,29 +642,19 @@ class LogsManager:
         def get_log_dates():
             """Get available log dates for each component"""
             try:
-                available_dates = {}
-                components = ['core-os', 'user-apps',  'services', 'system']
+                available_dates = {component: [] for component in self.COMPONENT_TYPES}
                 
-                for component in components:
-                    component_path = f'/logs/{component}'
-                    available_dates[component] = []
-                    
-                    if self.vfs_manager.get_file_info(component_path):
-                        # List files in component directory
-                        files = self.vfs_manager.list_directory(component_path)
-                        
-                        # Extract dates from .log files
-                        for file_info in files:
-                            if file_info['name'].endswith('.log'):
-                                date = file_info['name'].replace('.log', '')
-                                if date != 'errors':  # Skip the errors.log file
-                                    available_dates[component].append(date)
-                        
-                        # Sort dates
-                        available_dates[component].sort(reverse=True)
+                with self.pool.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT DISTINCT component_type, log_date FROM log_segments
+                        ORDER BY log_date DESC
+                    ''')
+                    for component_type, log_date in cursor.fetchall():
+                        available_dates.setdefault(component_type, []).append(log_date)
                 
                 return jsonify({'available_dates': available_dates}), 200
-                
+            
             except Exception as e:
                 error_msg = f'Failed to get log dates: {str(e)}'
                 self._log_system_error(error_msg)
@@ -262,34 +667,32 @@ class LogsManager:
                 component = request.args.get('component', 'all')
                 date = request.args.get('date', 'all')
                 
-                valid_components = ['core-os', 'user-apps', 'services', 'system']
-                components_to_clear = valid_components if component == 'all' else [component]
+                components_to_clear = self.COMPONENT_TYPES if component == 'all' else [component]
                 cleared_files = []
                 
-                for comp in components_to_clear:
-                    if date == 'all':
-                        # Clear all logs for this component
-                        component_path = f'/logs/{comp}'
-                        if self.vfs_manager.get_file_info(component_path):
-                            files = self.vfs_manager.list_directory(component_path)
-                            for file_info in files:
-                                if file_info['name'].endswith('.log'):
-                                    file_path = f"{component_path}/{file_info['name']}"
-                                    self.vfs_manager.delete_path(file_path)
-                                    cleared_files.append(file_path)
-                    else:
-                        # Clear specific date
-                        log_path = f'/logs/{comp}/{date}.log'
-                        if self.vfs_manager.get_file_info(log_path):
-                            self.vfs_manager.delete_path(log_path)
-                            cleared_files.append(log_path)
+                with self.write_lock:
+                    with self.pool.connection() as conn:
+                        cursor = conn.cursor()
+                        placeholders = ','.join('?' for _ in components_to_clear)
+                        where = f'component_type IN ({placeholders})'
+                        params = list(components_to_clear)
+                        if date != 'all':
+                            where += ' AND log_date = ?'
+                            params.append(date)
+                        
+                        cursor.execute(f'SELECT DISTINCT component_type, log_date FROM log_segments WHERE {where}', params)
+                        cleared_files = [f'/logs/{comp}/{log_date}.log' for comp, log_date in cursor.fetchall()]
+                        
+                        cursor.execute(f'DELETE FROM log_entries WHERE {where}', params)
+                        cursor.execute(f'DELETE FROM log_segments WHERE {where}', params)
+                        conn.commit()
                 
                 return jsonify({
                     'success': True,
                     'cleared_files': cleared_files,
                     'count': len(cleared_files)
                 }), 200
-                
+            
             except Exception as e:
                 error_msg = f'Failed to clear logs: {str(e)}'
                 self._log_system_error(error_msg)
@@ -303,45 +706,54 @@ class LogsManager:
                     'total_log_files': 0,
                     'total_size_bytes': 0,
                     'components': {},
-                    'max_file_size': self.max_file_size
+                    'max_file_size': self.max_file_size,
+                    'max_segments': self.max_segments
                 }
                 
-                components = ['core-os', 'user-apps', 'services', 'system']
-                
-                for component in components:
-                    component_path = f'/logs/{component}'
-                    component_stats = {
+                for component in self.COMPONENT_TYPES:
+                    stats['components'][component] = {
                         'file_count': 0,
                         'size_bytes': 0,
                         'files': []
                     }
-                    
-                    if self.vfs_manager.get_file_info(component_path):
-                        files = self.vfs_manager.list_directory(component_path)
-                        
-                        for file_info in files:
-                            if file_info['name'].endswith('.log'):
-                                file_path = f"{component_path}/{file_info['name']}"
-                                file_size = self._get_file_size(file_path)
-                                
-                                component_stats['files'].append({
-                                    'name': file_info['name'],
-                                    'size_bytes': file_size,
-                                    'size_mb': round(file_size / (1024 * 1024), 2)
-                                })
-                                
-                                component_stats['file_count'] += 1
-                                component_stats['size_bytes'] += file_size
-                    
-                    stats['components'][component] = component_stats
+                
+                # Each component/day is reported as one "file" made up of its segments
+                with self.pool.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT component_type, log_date, COUNT(*), SUM(size_bytes), SUM(entry_count)
+                        FROM log_segments
+                        GROUP BY component_type, log_date
+                        ORDER BY log_date DESC
+                    ''')
+                    rows = cursor.fetchall()
+                
+                for component_type, log_date, segment_count, size_bytes, entry_count in rows:
+                    component_stats = stats['components'].setdefault(component_type, {
+                        'file_count': 0,
+                        'size_bytes': 0,
+                        'files': []
+                    })
+                    component_stats['files'].append({
+                        'name': f'{log_date}.log',
+                        'size_bytes': size_bytes,
+                        'size_mb': round(size_bytes / (1024 * 1024), 2),
+                        'segments': segment_count,
+                        'entries': entry_count
+                    })
+                    component_stats['file_count'] += 1
+                    component_stats['size_bytes'] += size_bytes
+                
+                for component_stats in stats['components'].values():
                     stats['total_log_files'] += component_stats['file_count']
                     stats['total_size_bytes'] += component_stats['size_bytes']
                 
+                stats['writer'] = self.get_writer_stats()
                 stats['total_size_mb'] = round(stats['total_size_bytes'] / (1024 * 1024), 2)
                 stats['max_file_size_mb'] = round(self.max_file_size / (1024 * 1024), 2)
                 
                 return jsonify(stats), 200
-                
+            
             except Exception as e:
                 error_msg = f'Failed to get log stats: {str(e)}'
                 self._log_system_error(error_msg)
@@ -368,35 +780,12 @@ class LogsManager:
                 'source': source
             }
             
-            # Determine log file path
-            component_type = component.lower()
-            if component_type not in ['core-os', 'user-apps', 'services']:
-                component_type = 'core-os'  # default for internal components
-            
-            # Log file naming: /logs/component-type/YYYY-MM-DD.log
-            log_date = datetime.utcnow().strftime('%Y-%m-%d')
-            log_path = f'/logs/{component_type}/{log_date}.log'
-            
-            # Check and handle file size limit
-            self._handle_file_size_limit(log_path)
-            
-            # Read existing content if file exists
-            existing_content = ""
-            file_data = self.vfs_manager.read_file(log_path)
-            if file_data:
-                existing_content = file_data['content'].decode('utf-8') if file_data['content'] else ""
-            
-            # Append new log entry
-            new_content = existing_content + json.dumps(log_entry) + '\n'
-            
-            # Create file if it doesn't exist, otherwise update it
-            if not self.vfs_manager.get_file_info(log_path):
-                self.vfs_manager.create_file(log_path, new_content.encode('utf-8'), 'text/plain')
-            else:
-                self.vfs_manager.write_file(log_path, new_content.encode('utf-8'))
-            
-            return True
+            # Determine log bucket (default for internal components)
+            component_type = self._resolve_component_type(component, 'core-os')
             
+            # Queue for the background writer so callers never wait on log I/O
+            return self._enqueue(component_type, log_entry)
+        
         except Exception as e:
             # Log this failure to system error log
             self._log_system_error(f"Failed to write internal log: {str(e)}")
@@ -46,7 +46,8 @@ class ServiceManager:
         # Hardcoded array of required services
         required_services = [
             'log_cleanup_service',
-            'system_health_service'
+            'system_health_service',
+            'vfs_maintenance_service'
         ]
         
         defaults_dir = "defaults"
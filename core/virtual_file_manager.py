@@ -6,14 +6,63 @@ Handles file operations, directory structure, and persistence
 
 import os
 import sqlite3
+import gzip
 import hashlib
+import json
+import lzma
 import mimetypes
 import base64
+import calendar
+import atexit
+import re
+import tarfile
+import tempfile
+import time
+import uuid
+import zlib
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
 from typing import Dict, List, Optional, Any, Tuple
-from datetime import datetime
+from datetime import datetime, timezone
 import threading
 from pathlib import Path
 
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Codecs blob content can be stored with: name -> (compress, decompress). Blobs
+# record the codec they were written with (NULL when stored as-is).
+STORAGE_CODECS = {
+    'gzip': (lambda data: gzip.compress(data, compresslevel=6, mtime=0), gzip.decompress),
+    'lzma': (lzma.compress, lzma.decompress)
+}
+if ZSTD_AVAILABLE:
+    STORAGE_CODECS['zstd'] = (lambda data: zstandard.ZstdCompressor(level=3).compress(data),
+                              lambda data: zstandard.ZstdDecompressor().decompress(data))
+
+
+# Non-text/* MIME types that hold text. Text content is compressed with the
+# configured codec and indexed for search; so is octet-stream, which is what
+# logs and .app packages are stored as (search only indexes it if it decodes as UTF-8).
+# The read routes use the same test to decide which responses to compress.
+TEXT_MIME_TYPES = {'application/json', 'application/javascript', 'application/xml', 'image/svg+xml'}
+
+
+def is_text_mime(mime_type: Optional[str]) -> bool:
+    """Whether a MIME type always holds text."""
+    mime_type = (mime_type or '').split(';')[0].strip().lower()
+    return mime_type.startswith('text/') or mime_type in TEXT_MIME_TYPES or mime_type.endswith(('+json', '+xml'))
+
+
+def blob_store_path(db_path: str) -> str:
+    """Path of the blob database kept next to a VFS metadata database."""
+    root, ext = os.path.splitext(db_path)
+    return f'{root}_blobs{ext or ".db"}'
+
 
 def validate_filename(filename: str) -> tuple[bool, str]:
     """
@@ -68,15 +117,764 @@ def validate_filename(filename: str) -> tuple[bool, str]:
     return True, ""
 
 
+class QuotaExceededError(ValueError):
+    """Raised when a write would take a directory over its storage quota."""
+    
+    def __init__(self, quota_path: str, message: str):
+        super().__init__(message)
+        self.quota_path = quota_path
+
+
+class FileChangedError(RuntimeError):
+    """Raised when a file is written while its content is being streamed out."""
+    
+    def __init__(self, path: str):
+        super().__init__(f'{path} changed while it was being read')
+        self.path = path
+
+
+class SQLiteConnectionPool:
+    """
+    Thread-aware pool of SQLite connections for a single database file, plus
+    any databases attached to it.
+    
+    Connections are opened lazily, have their PRAGMAs applied and databases
+    attached once when they are created and are then reused across calls. A
+    thread that already holds a connection gets the same one back on nested use,
+    so helper methods called from inside a transaction share it instead of
+    opening their own.
+    """
+    
+    def __init__(self, db_path: str, pool_size: int = 8, pragmas: Optional[List[str]] = None,
+                 health_check_interval: float = 30.0, timeout: float = 30.0,
+                 attachments: Optional[Dict[str, Tuple[str, List[str]]]] = None):
+        self.db_path = db_path
+        self.pool_size = max(1, pool_size)  # Maximum number of idle connections kept open
+        self.pragmas = pragmas or []
+        self.attachments = attachments or {}  # Schema name -> (database path, PRAGMAs for that schema)
+        self.health_check_interval = health_check_interval  # Seconds idle before a connection is re-validated
+        self.timeout = timeout  # Busy timeout passed to sqlite3.connect
+        
+        self._idle = []  # Stack of (connection, last_used) tuples
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        
+        self.stats = {
+            'created': 0,
+            'reused': 0,
+            'closed': 0,
+            'health_check_failures': 0
+        }
+    
+    def _create_connection(self) -> sqlite3.Connection:
+        """Open a new connection, apply the configured PRAGMAs and attach the extra databases."""
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        cursor = conn.cursor()
+        for pragma in self.pragmas:
+            cursor.execute(f'PRAGMA {pragma}')
+        for schema, (path, pragmas) in self.attachments.items():
+            cursor.execute(f'ATTACH DATABASE ? AS {schema}', (path,))
+            for pragma in pragmas:
+                cursor.execute(f'PRAGMA {schema}.{pragma}')
+        cursor.close()
+        
+        with self._lock:
+            self.stats['created'] += 1
+        return conn
+    
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        """Check that a pooled connection is still usable."""
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+    
+    def _close_connection(self, conn: sqlite3.Connection):
+        """Close a connection, ignoring errors from already-broken handles."""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self.stats['closed'] += 1
+    
+    def _acquire(self) -> sqlite3.Connection:
+        """Take an idle connection from the pool or open a new one."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, last_used = self._idle.pop()
+            
+            # Connections that sat idle for a while get a cheap liveness probe
+            if time.monotonic() - last_used < self.health_check_interval or self._is_healthy(conn):
+                with self._lock:
+                    self.stats['reused'] += 1
+                return conn
+            
+            with self._lock:
+                self.stats['health_check_failures'] += 1
+            self._close_connection(conn)
+        
+        return self._create_connection()
+    
+    def _release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool, closing it if the pool is full."""
+        try:
+            # Never hand out a connection with a half-finished transaction
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._close_connection(conn)
+            return
+        
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        
+        self._close_connection(conn)
+    
+    @contextmanager
+    def connection(self):
+        """
+        Context manager yielding a pooled connection for the current thread.
+        
+        Nested use on the same thread yields the connection that is already
+        checked out. Any transaction left open when the outermost block exits
+        is rolled back before the connection goes back to the pool.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        
+        conn = self._acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._release(conn)
+    
+    def close_all(self):
+        """Close every idle connection held by the pool."""
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+        for conn, _ in idle:
+            self._close_connection(conn)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool usage statistics."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['idle'] = len(self._idle)
+        stats['pool_size'] = self.pool_size
+        return stats
+
+
+class PathLockManager:
+    """
+    Striped, re-entrant locks keyed by VFS path.
+    
+    Every path hashes onto one of a fixed number of locks, so writers working on
+    unrelated paths rarely wait for each other while writers to the same path
+    are serialized. The atomicity of an operation comes from its SQLite write
+    transaction; the stripes keep same-path writers from queueing on SQLite's
+    single write lock. Contention is counted for get_stats().
+    """
+    
+    def __init__(self, stripes: int = 64):
+        self.stripes = max(1, stripes)
+        self._locks = [threading.RLock() for _ in range(self.stripes)]
+        self._stats_lock = threading.Lock()
+        
+        self.stats = {
+            'acquisitions': 0,
+            'contended': 0,
+            'wait_time_ms': 0.0,
+            'max_wait_ms': 0.0
+        }
+    
+    def _stripe(self, path: str) -> int:
+        """Map a path to its stripe index."""
+        return zlib.crc32(path.encode('utf-8')) % self.stripes
+    
+    @contextmanager
+    def hold(self, *paths: str):
+        """Hold the stripes of the given paths, taken in index order so callers cannot deadlock."""
+        acquired = []
+        try:
+            for index in sorted({self._stripe(path) for path in paths if path}):
+                lock = self._locks[index]
+                waited = 0.0
+                contended = not lock.acquire(blocking=False)
+                if contended:
+                    started = time.perf_counter()
+                    lock.acquire()
+                    waited = (time.perf_counter() - started) * 1000
+                acquired.append(lock)
+                
+                with self._stats_lock:
+                    self.stats['acquisitions'] += 1
+                    if contended:
+                        self.stats['contended'] += 1
+                        self.stats['wait_time_ms'] += waited
+                        self.stats['max_wait_ms'] = max(self.stats['max_wait_ms'], waited)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get lock usage and contention statistics."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['wait_time_ms'] = round(stats['wait_time_ms'], 3)
+        stats['max_wait_ms'] = round(stats['max_wait_ms'], 3)
+        stats['contention_rate'] = round(stats['contended'] / stats['acquisitions'], 4) if stats['acquisitions'] else 0.0
+        stats['stripes'] = self.stripes
+        return stats
+
+
+class AccessTimeBuffer:
+    """
+    In-memory buffer of file access times written back in periodic batches.
+    
+    Reads record the file id and time here instead of committing an UPDATE of
+    accessed_at, and a background thread hands everything pending to write_func
+    every flush_interval seconds (or sooner once max_pending files are waiting),
+    so a read never opens a write transaction. Modes:
+    
+    - 'relatime': only record when the stored time is not newer than the last
+      modification or is older than relatime_window seconds (like Linux relatime)
+    - 'strict': record every read, still coalesced to one row per file per flush
+    - 'off': do not track access times at all
+    """
+    
+    MODES = ('relatime', 'strict', 'off')
+    
+    def __init__(self, write_func, mode: str = 'relatime', flush_interval: float = 60.0,
+                 max_pending: int = 10000, relatime_window: int = 24 * 3600):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown access time mode '{mode}' (expected one of {', '.join(self.MODES)})")
+        self.write_func = write_func  # Called with a list of (accessed_at, file_id) pairs
+        self.mode = mode
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.relatime_window = relatime_window
+        
+        self._pending = {}  # file_id -> accessed_at
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        
+        self.stats = {
+            'recorded': 0,
+            'skipped': 0,
+            'written': 0,
+            'flushes': 0,
+            'flush_errors': 0
+        }
+    
+    @staticmethod
+    def _timestamp(seconds_ago: float = 0) -> str:
+        """UTC time formatted like SQLite's CURRENT_TIMESTAMP."""
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() - seconds_ago))
+    
+    def record(self, file_id: int, accessed_at=None, updated_at=None):
+        """Note a read of file_id, given its stored accessed_at and updated_at."""
+        if self.mode == 'off':
+            return
+        
+        with self._lock:
+            if self.mode == 'relatime':
+                # Stored values may be CURRENT_TIMESTAMP or isoformat strings
+                accessed = str(accessed_at or '').replace('T', ' ')[:19]
+                updated = str(updated_at or '').replace('T', ' ')[:19]
+                if file_id in self._pending or (accessed > updated and accessed >= self._timestamp(self.relatime_window)):
+                    self.stats['skipped'] += 1
+                    return
+            self._pending[file_id] = self._timestamp()
+            self.stats['recorded'] += 1
+            pending = len(self._pending)
+            
+            if self._thread is None:
+                # Started on first use, so short-lived managers never spawn one
+                self._thread = threading.Thread(target=self._flush_loop, name='vfs-atime', daemon=True)
+                self._thread.start()
+        
+        if pending >= self.max_pending:
+            self._wake.set()
+    
+    def _flush_loop(self):
+        """Flush pending access times every flush_interval seconds until closed."""
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+    
+    def flush(self) -> int:
+        """Write all pending access times in one batch and return how many were written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        
+        try:
+            self.write_func([(accessed_at, file_id) for file_id, accessed_at in pending.items()])
+        except Exception as e:
+            eprint(f"Error writing {len(pending)} VFS access times: {e}")
+            with self._lock:
+                self.stats['flush_errors'] += 1
+                # Keep them for the next attempt unless a newer read replaced them
+                for file_id, accessed_at in pending.items():
+                    self._pending.setdefault(file_id, accessed_at)
+            return 0
+        
+        with self._lock:
+            self.stats['written'] += len(pending)
+            self.stats['flushes'] += 1
+        return len(pending)
+    
+    def close(self):
+        """Stop the flush thread and write whatever is still pending."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get access time tracking statistics."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['pending'] = len(self._pending)
+        stats['mode'] = self.mode
+        stats['flush_interval'] = self.flush_interval
+        return stats
+
+
+class FileCache:
+    """
+    Size-bounded LRU cache of small file contents, keyed by path and version.
+    
+    The version is the file's (row id, content hash, updated_at). An entry is only
+    served for the version it was stored under, so a reader that looked up the
+    file's current version can never get stale content or metadata, even if the
+    file was changed by another process or deleted and recreated with the same
+    content. Writers invalidate the paths they touch
+    so replaced content stops taking up memory straight away. Entries are evicted
+    least recently used first once the cached content exceeds max_bytes.
+    """
+    
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_entry_bytes: Optional[int] = None):
+        self.max_bytes = max(0, max_bytes)  # Memory budget for cached content (0 disables the cache)
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else self.max_bytes // 8
+        
+        self._entries = OrderedDict()  # path -> (version, result, size), least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'inserts': 0,
+            'evictions': 0,
+            'invalidations': 0,
+            'too_large': 0
+        }
+    
+    def peek_version(self, path: str) -> Optional[Tuple[int, str, str]]:
+        """
+        Version of the entry cached for path, or None (counted as a miss) if
+        nothing is cached, so callers can skip validating a certain miss.
+        """
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            return entry[0]
+    
+    def get(self, path: str, version: Tuple[int, str, str]) -> Optional[Dict[str, Any]]:
+        """Return a copy of the result cached for path at version, counting the hit or miss."""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != version:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(path)
+            self.stats['hits'] += 1
+            return dict(entry[1])
+    
+    def put(self, path: str, version: Tuple[int, str, str], result: Dict[str, Any]):
+        """Cache a read_file result (which holds the content) for path at version."""
+        if not version[1] or self.max_bytes == 0:
+            return
+        size = len(result['content'])
+        
+        with self._lock:
+            if size > self.max_entry_bytes:
+                self.stats['too_large'] += 1
+                return
+            self._remove(path)
+            self._entries[path] = (version, dict(result), size)
+            self._bytes += size
+            self.stats['inserts'] += 1
+            
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.stats['evictions'] += 1
+    
+    def _remove(self, path: str) -> bool:
+        """Drop the entry for path; the caller holds the lock."""
+        entry = self._entries.pop(path, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[2]
+        return True
+    
+    def invalidate(self, path: str, subtree: bool = False):
+        """Drop the entry for path and, with subtree, every entry below it."""
+        with self._lock:
+            removed = self._remove(path)
+            if subtree:
+                prefix = path.rstrip('/') + '/'
+                for child in [key for key in self._entries if key.startswith(prefix)]:
+                    removed = self._remove(child) or removed
+            if removed:
+                self.stats['invalidations'] += 1
+    
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache usage and hit rate statistics."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['max_bytes'] = self.max_bytes
+        stats['max_entry_bytes'] = self.max_entry_bytes
+        return stats
+
+
+class ChangeFeed:
+    """
+    Coalescing feed of VFS change events for in-process listeners.
+    
+    Writers publish an event after their transaction commits; a background thread
+    waits interval seconds after the first pending event, so a burst lands in one
+    batch, and then calls every listener with the batch. Consecutive writes to a
+    file merge into its pending create or write event (keeping the newest hash).
+    Deletes and renames are never merged and later events never move ahead of
+    them, so a batch always replays in order. Nothing is queued without listeners.
+    
+    Listeners only ever run on the delivery thread, never on a writer's thread:
+    publish() is called while the writer still holds its path locks, so a slow
+    listener must not hold up VFS writes. If listeners fall so far behind that
+    max_backlog events are waiting, new events are dropped and counted.
+    """
+    
+    def __init__(self, interval: float = 0.25, max_pending: int = 1000, max_backlog: int = 10000):
+        self.interval = interval
+        self.max_pending = max_pending  # Deliver without waiting out the interval once this many are waiting
+        self.max_backlog = max(max_backlog, max_pending)  # Drop new events while this many are waiting
+        self.listeners = []
+        
+        self._pending = []
+        self._mergeable = {}  # path -> pending create/write event later writes can merge into
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._full = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        
+        self.stats = {
+            'published': 0,
+            'coalesced': 0,
+            'delivered': 0,
+            'batches': 0,
+            'dropped': 0,
+            'listener_errors': 0
+        }
+    
+    def add_listener(self, callback):
+        """Call callback(events) with each batch of change events."""
+        with self._lock:
+            if callback not in self.listeners:
+                self.listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        """Stop delivering events to callback."""
+        with self._lock:
+            if callback in self.listeners:
+                self.listeners.remove(callback)
+    
+    def publish(self, event: Dict[str, Any]):
+        """Queue a change event for the next batch."""
+        if not self.listeners:
+            return
+        event['timestamp'] = datetime.now().isoformat()
+        
+        with self._lock:
+            self.stats['published'] += 1
+            pending = self._mergeable.get(event['path'])
+            if event['type'] == 'write' and pending is not None:
+                # A pending create stays a create, just with the newest content
+                pending.update(hash=event.get('hash'), size=event.get('size'), timestamp=event['timestamp'])
+                self.stats['coalesced'] += 1
+                return
+            
+            if len(self._pending) >= self.max_backlog:
+                self.stats['dropped'] += 1
+                if self.stats['dropped'] == 1 or self.stats['dropped'] % self.max_backlog == 0:
+                    eprint(f"⚠️ VFS change listeners are behind, dropped {self.stats['dropped']} events so far")
+                return
+            
+            if event['type'] in ('delete', 'rename'):
+                self._mergeable.clear()
+            elif event['type'] in ('create', 'write') and not event.get('is_directory'):
+                self._mergeable[event['path']] = event
+            self._pending.append(event)
+            
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._deliver_loop, name='vfs-changes', daemon=True)
+                self._thread.start()
+            full = len(self._pending) >= self.max_pending
+        
+        self._wake.set()
+        if full:
+            self._full.set()
+    
+    def _deliver_loop(self):
+        """
+        Deliver a batch interval seconds after each first pending event, or as
+        soon as max_pending events are waiting.
+        """
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._full.wait(self.interval)
+            self._wake.clear()
+            self._full.clear()
+            self.flush()
+    
+    def flush(self) -> int:
+        """Deliver everything pending now and return the number of events delivered."""
+        with self._lock:
+            events, self._pending = self._pending, []
+            self._mergeable = {}
+            listeners = list(self.listeners)
+        if not events:
+            return 0
+        
+        for listener in listeners:
+            try:
+                listener(events)
+            except Exception as e:
+                eprint(f"Error delivering {len(events)} VFS change events: {e}")
+                with self._lock:
+                    self.stats['listener_errors'] += 1
+        
+        with self._lock:
+            self.stats['delivered'] += len(events)
+            self.stats['batches'] += 1
+        return len(events)
+    
+    def close(self):
+        """Stop the delivery thread after delivering whatever is pending."""
+        self._stop.set()
+        self._wake.set()
+        self._full.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get change feed statistics."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['pending'] = len(self._pending)
+            stats['listeners'] = len(self.listeners)
+        return stats
+
+
+class _ArchiveSink:
+    """
+    Write-only stream that buffers what an archive writer produces until it is
+    taken. Deliberately has no tell/seek, so zipfile writes a streamable archive.
+    """
+    
+    def __init__(self):
+        self._parts = []
+    
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def take(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+class _BatchConnection:
+    """
+    Connection handed to VFS operations while apply_batch owns the transaction.
+    Their commit() becomes a no-op so the whole batch commits once.
+    """
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+    
+    def commit(self):
+        pass
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
 class VirtualFileManager:
     """
     Manages a virtual file system stored entirely in SQLite.
     Provides file and directory operations without touching the host filesystem.
     """
     
-    def __init__(self, db_path="data/virtual_files.db"):
+    # PRAGMAs applied once to every pooled connection
+    CONNECTION_PRAGMAS = [
+        # Keep free pages reclaimable with incremental_vacuum. Must come first: it
+        # only takes effect before a new database is written to (existing files
+        # switch via enable_incremental_vacuum)
+        'auto_vacuum=INCREMENTAL',
+        
+        # Enable WAL mode for better concurrency and performance
+        'journal_mode=WAL',
+        'synchronous=NORMAL',
+        
+        # Optimized configuration (best performance + low memory)
+        'cache_size=2000',      # 2MB cache
+        'mmap_size=67108864',   # 64MB memory map
+        'temp_store=FILE'       # Use disk for temp storage
+    ]
+    
+    # File content (blobs) lives in a separate database attached to every pooled
+    # connection under this schema name, so bulk blob pages never share a file or a
+    # page cache with the metadata. SQL names the blobs table unqualified: once it
+    # has moved out of the main database the name resolves to this schema.
+    BLOB_SCHEMA = 'blobstore'
+    BLOB_PRAGMAS = [
+        'auto_vacuum=INCREMENTAL',
+        'journal_mode=WAL',
+        'synchronous=NORMAL',
+        
+        # Blob pages are mostly read once per request (hot small files sit in the
+        # FileCache), so they get a small cache of their own
+        'cache_size=500',
+        'mmap_size=67108864'
+    ]
+    
+    # PRAGMA auto_vacuum values, and the modes checkpoint_wal accepts
+    AUTO_VACUUM_MODES = ('none', 'full', 'incremental')
+    CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+    
+    # Content at or above this size is split into chunks of this size
+    CHUNK_SIZE = 1024 * 1024
+    
+    # Blobs smaller than this, or that compress by less than 10%, are stored as-is
+    MIN_COMPRESS_SIZE = 256
+    
+    # Columns list_directory_page can return, and its sort keys -> columns
+    LIST_FIELDS = ('path', 'name', 'is_directory', 'size', 'mime_type', 'created_at', 'updated_at', 'accessed_at')
+    LIST_SORT_COLUMNS = {'name': 'name', 'size': 'size', 'mtime': 'updated_at'}
+    
+    # Only the first this many bytes of a file's text are indexed for content search
+    MAX_INDEXED_CONTENT = 256 * 1024
+    MAX_SNIPPET_LENGTH = 400
+    SEARCH_MODES = ('name', 'prefix', 'glob', 'content')
+    
+    # Upload sessions untouched for this long are discarded
+    UPLOAD_SESSION_TTL_HOURS = 24
+    
+    # Operations accepted by apply_batch, keyed by their 'op' field
+    BATCH_OPERATIONS = ('mkdir', 'create', 'write', 'delete', 'rename')
+    
+    # Archive formats export_archive writes and import_archive reads
+    ARCHIVE_FORMATS = ('tar', 'zip')
+    
+    # Ids of a path and everything below it (params: path, *_subtree_range(path))
+    _SUBTREE_IDS_SQL = '''
+        SELECT id FROM virtual_files
+        WHERE path = ? OR (path >= ? AND path < ?)
+    '''
+    
+    # A byte range of blob b: sliced by SQLite when it is stored as-is, otherwise
+    # the whole compressed blob for _slice_blob (params: 1-based start, length)
+    _BLOB_SLICE_SQL = 'CASE WHEN b.codec IS NULL THEN substr(b.data, ?, ?) ELSE b.data END'
+    
+    def __init__(self, db_path="data/virtual_files.db", pool_size: int = 8, lock_stripes: int = 64,
+                 compression: Optional[str] = 'gzip', atime_mode: str = 'relatime',
+                 atime_flush_interval: float = 60.0, cache_size: int = 32 * 1024 * 1024,
+                 blob_db_path: Optional[str] = None):
         self.db_path = db_path
-        self.lock = threading.Lock()
+        self.blob_db_path = blob_db_path or blob_store_path(db_path)
+        
+        # Database file behind each schema, for storage stats and maintenance
+        self.databases = {'main': self.db_path, self.BLOB_SCHEMA: self.blob_db_path}
+        
+        # Codec for new compressible content (None stores everything as-is)
+        if compression and compression not in STORAGE_CODECS:
+            eprint(f"⚠️ Unknown VFS compression codec {compression}, storing content uncompressed")
+            compression = None
+        self.compression = compression
+        
+        # Per-path write locks instead of one lock for the whole filesystem
+        self.locks = PathLockManager(lock_stripes)
+        
+        # Set while apply_batch runs on a thread, so nested writers share its transaction
+        self._batch = threading.local()
+        
+        # Shared connection pool used by every VFS operation
+        self.pool = SQLiteConnectionPool(
+            db_path, pool_size=pool_size, pragmas=self.CONNECTION_PRAGMAS,
+            attachments={self.BLOB_SCHEMA: (self.blob_db_path, self.BLOB_PRAGMAS)}
+        )
+        
+        # Set by _init_database when SQLite has FTS5 for the search index
+        self.search_available = False
+        
+        # Reads buffer accessed_at here; it is written back in batches ('off' disables it)
+        self.access_times = AccessTimeBuffer(self._write_access_times, mode=atime_mode,
+                                             flush_interval=atime_flush_interval)
+        atexit.register(self.access_times.close)
+        
+        # Contents of small, frequently read files (cache_size=0 disables it)
+        self.cache = FileCache(cache_size)
+        
+        # Create/write/delete/rename events for watchers such as the WebSocket server
+        self.changes = ChangeFeed()
+        
+        # Storage quotas by directory path: path -> (max_bytes, max_items); loaded
+        # from the quotas table so write-time checks never query it
+        self._quotas = {}
         
         # Initialize database
         self._init_database()
@@ -84,24 +882,80 @@ class VirtualFileManager:
         # Create root directory if it doesn't exist
         self._ensure_root_directory()
     
+    def _connection(self):
+        """Get a pooled database connection (context manager)."""
+        return self.pool.connection()
+    
+    @contextmanager
+    def _write_transaction(self):
+        """
+        Pooled connection inside a BEGIN IMMEDIATE transaction, so existence
+        checks made in it cannot race other writers. The caller commits; anything
+        left uncommitted is rolled back when the connection returns to the pool.
+        """
+        with self._connection() as conn:
+            if getattr(self._batch, 'active', False):
+                yield _BatchConnection(conn)
+                return
+            if not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')
+            yield conn
+    
+    def _path_lock(self, *paths: str):
+        """Hold the write locks for the given (unnormalized) paths."""
+        return self.locks.hold(*(self._normalize_path(path) for path in paths))
+    
+    def add_change_listener(self, callback):
+        """Register callback(events) to receive batches of committed change events."""
+        self.changes.add_listener(callback)
+    
+    def remove_change_listener(self, callback):
+        """Unregister a change listener."""
+        self.changes.remove_listener(callback)
+    
+    def _emit_change(self, change_type: str, path: str, is_directory: bool = False, **details):
+        """
+        Publish a change once it is committed. Inside apply_batch events are held
+        until the batch commits and dropped if it rolls back.
+        """
+        if not self.changes.listeners:
+            return
+        event = {'type': change_type, 'path': path, 'is_directory': is_directory, **details}
+        if getattr(self._batch, 'active', False):
+            self._batch.events.append(event)
+        else:
+            self.changes.publish(event)
+    
+    def close(self):
+        """Write buffered access times and close all pooled database connections."""
+        self.access_times.close()
+        self.changes.close()
+        self.pool.close_all()
+    
+    def _write_access_times(self, updates: List[Tuple[str, int]]):
+        """Apply a batch of (accessed_at, file_id) updates in one transaction."""
+        with self._write_transaction() as conn:
+            conn.executemany('UPDATE virtual_files SET accessed_at = ? WHERE id = ?', updates)
+            conn.commit()
+    
     def _init_database(self):
         """Initialize the database with virtual file system tables."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             
-            # Enable WAL mode for better concurrency and performance
-            cursor.execute('PRAGMA journal_mode=WAL')
-            cursor.execute('PRAGMA synchronous=NORMAL')
-            
-            # Optimized configuration (best performance + low memory)
-            cursor.execute('PRAGMA cache_size=2000')    # 2MB cache
-            cursor.execute('PRAGMA mmap_size=67108864')  # 64MB memory map
-            cursor.execute('PRAGMA temp_store=FILE')     # Use disk for temp storage
-            
             # Check current schema version
             cursor.execute('PRAGMA user_version')
             current_version = cursor.fetchone()[0]
             
+            # From version 8 on every blob lives in the blob database; recreating it
+            # empty would leave every file pointing at content that no longer exists
+            if current_version >= 8:
+                cursor.execute(f"SELECT COUNT(*) FROM {self.BLOB_SCHEMA}.sqlite_master WHERE type = 'table' AND name = 'blobs'")
+                if not cursor.fetchone()[0]:
+                    raise RuntimeError(f'Blob database {self.blob_db_path} is missing or empty but {self.db_path} '
+                                       f'(schema version {current_version}) keeps its file content there; '
+                                       f'restore it from a backup before starting')
+            
             # Create files table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS virtual_files (
@@ -135,19 +989,63 @@ class VirtualFileManager:
             # Run schema migrations
             self._run_schema_migrations(cursor, current_version)
             
+            # Creates the blob store of a new database
+            self._ensure_blob_store(cursor)
+            
             # Create indexes for performance
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_virtual_files_path ON virtual_files(path)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_virtual_files_parent ON virtual_files(parent_path)')
+            # Directory listings read children straight from this index, one
+            # (parent_path, is_directory) group at a time in name order; it also
+            # serves every parent_path lookup the old single-column index did
+            cursor.execute('DROP INDEX IF EXISTS idx_virtual_files_parent')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_virtual_files_listing ON virtual_files(parent_path, is_directory, name)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_virtual_files_directory ON virtual_files(is_directory)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_virtual_files_name ON virtual_files(name)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_virtual_files_size ON virtual_files(size)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_metadata_file_key ON file_metadata(file_id, key)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_virtual_files_blob ON virtual_files(blob_hash)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_chunks_blob ON file_chunks(blob_hash)')
+            
+            self._ensure_search_index(cursor)
+            
+            cursor.execute('SELECT path, max_bytes, max_items FROM quotas')
+            self._quotas = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
             
             conn.commit()
     
+    def _ensure_search_index(self, cursor):
+        """
+        Create the FTS5 search tables and index existing files the first time.
+        search_names holds names and paths (trigram tokens, so substring, LIKE and
+        GLOB lookups use the index); search_content holds the leading text of text
+        files. Both are keyed by virtual_files.id and kept in step by the writers.
+        """
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name IN ('search_names', 'search_content')")
+        if cursor.fetchone()[0] == 2:
+            self.search_available = True
+            return
+        
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS search_names USING fts5(name, path, tokenize='trigram')")
+            cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS search_content USING fts5(content, tokenize='porter unicode61')")
+        except sqlite3.OperationalError as e:
+            eprint(f"⚠️ VFS search disabled, SQLite FTS5 with the trigram tokenizer is not available: {e}")
+            return
+        self.search_available = True
+        
+        print("📝 Building VFS search index...")
+        cursor.execute("DELETE FROM search_names")
+        cursor.execute("DELETE FROM search_content")
+        cursor.execute("INSERT INTO search_names (rowid, name, path) SELECT id, name, path FROM virtual_files WHERE path != '/'")
+        cursor.execute('SELECT id FROM virtual_files WHERE is_directory = 0')
+        file_ids = [row[0] for row in cursor.fetchall()]
+        for file_id in file_ids:
+            self._index_content(cursor, file_id)
+        print(f"✅ Indexed {len(file_ids)} files for search")
+    
     def _run_schema_migrations(self, cursor, current_version):
         """Run database schema migrations based on current version."""
-        target_version = 2  # Latest schema version
+        target_version = 8  # Latest schema version
         
         print(f"🔄 Database schema: current={current_version}, target={target_version}")
         
@@ -159,6 +1057,36 @@ class VirtualFileManager:
             # Migration 2: Add file_chunks table for chunked storage
             self._migrate_to_version_2(cursor)
             
+        if current_version < 3:
+            # Migration 3: Reclaim chunks and metadata leaked by earlier deletes
+            self._migrate_to_version_3(cursor)
+            
+        if current_version < 4:
+            # Migration 4: Move file content into deduplicated blobs
+            self._migrate_to_version_4(cursor)
+            
+        if current_version < 5:
+            # Migration 5: Add resumable upload session tables
+            self._migrate_to_version_5(cursor)
+            
+        if current_version < 6:
+            # Migration 6: Record the compression codec of each blob
+            self._migrate_to_version_6(cursor)
+        
+        if current_version < 7:
+            # Migration 7: Per-directory usage counters and quotas
+            self._migrate_to_version_7(cursor)
+        
+        if current_version < 8:
+            # Migration 8 commits its copy in batches: record migrations 1-7 first, so a
+            # crash part-way through the copy never runs them a second time
+            if current_version < 7:
+                cursor.execute('PRAGMA user_version = 7')
+                cursor.connection.commit()
+            
+            # Migration 8: Move blobs into their own database
+            self._migrate_to_version_8(cursor)
+        
         # Update schema version
         if current_version < target_version:
             cursor.execute(f'PRAGMA user_version = {target_version}')
@@ -209,33 +1137,282 @@ class VirtualFileManager:
             eprint(f"❌ Error in migration 2: {e}")
             raise
     
-    def _ensure_root_directory(self):
-        """Ensure the root directory exists."""
-        with self.lock:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+    def _migrate_to_version_3(self, cursor):
+        """Migration 3: One-time sweep of orphaned file_chunks and file_metadata rows."""
+        try:
+            print("📝 Sweeping orphaned chunks and metadata...")
+            chunks_deleted, metadata_deleted = self._delete_orphans(cursor)
+            print(f"✅ Removed {chunks_deleted} orphaned chunks and {metadata_deleted} orphaned metadata rows")
+            
+        except Exception as e:
+            eprint(f"❌ Error in migration 3: {e}")
+            raise
+    
+    def _migrate_to_version_4(self, cursor):
+        """Migration 4: Store file content in a content-addressed, reference-counted blob table."""
+        try:
+            print("📝 Creating blobs table...")
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS blobs (
+                    hash TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    ref_count INTEGER NOT NULL DEFAULT 0,
+                    data BLOB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            cursor.execute("PRAGMA table_info(virtual_files)")
+            columns = [column[1] for column in cursor.fetchall()]
+            if 'blob_hash' not in columns:
+                cursor.execute('ALTER TABLE virtual_files ADD COLUMN blob_hash TEXT')
+            
+            # Rebuild file_chunks so each row references a blob instead of holding the bytes
+            cursor.execute("PRAGMA table_info(file_chunks)")
+            chunk_columns = [column[1] for column in cursor.fetchall()]
+            chunks_migrated = 0
+            
+            if 'chunk_data' in chunk_columns:
                 cursor.execute('''
-                    INSERT OR IGNORE INTO virtual_files 
-                    (path, name, parent_path, is_directory, size) 
-                    VALUES (?, ?, ?, ?, ?)
-                ''', ('/', 'root', None, True, 0))
-                conn.commit()
+                    CREATE TABLE file_chunks_v4 (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        file_id INTEGER NOT NULL,
+                        chunk_index INTEGER NOT NULL,
+                        blob_hash TEXT NOT NULL,
+                        chunk_size INTEGER NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        FOREIGN KEY (file_id) REFERENCES virtual_files(id) ON DELETE CASCADE,
+                        UNIQUE(file_id, chunk_index)
+                    )
+                ''')
+                
+                cursor.execute('SELECT id FROM file_chunks ORDER BY id')
+                for (chunk_id,) in cursor.fetchall():
+                    cursor.execute('''
+                        SELECT file_id, chunk_index, chunk_data, chunk_size, created_at
+                        FROM file_chunks WHERE id = ?
+                    ''', (chunk_id,))
+                    file_id, chunk_index, chunk_data, chunk_size, created_at = cursor.fetchone()
+                    
+                    cursor.execute('''
+                        INSERT INTO file_chunks_v4 
+                        (file_id, chunk_index, blob_hash, chunk_size, created_at) 
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (file_id, chunk_index, self._put_blob(cursor, chunk_data), chunk_size, created_at))
+                    chunks_migrated += 1
+                
+                cursor.execute('DROP TABLE file_chunks')
+                cursor.execute('ALTER TABLE file_chunks_v4 RENAME TO file_chunks')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_chunks_file_id ON file_chunks(file_id)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_chunks_index ON file_chunks(file_id, chunk_index)')
+            
+            # Move inline content into blobs (empty files keep their empty inline content)
+            cursor.execute('''
+                SELECT id FROM virtual_files 
+                WHERE is_directory = 0 AND content IS NOT NULL AND length(content) > 0
+            ''')
+            files_migrated = 0
+            for (file_id,) in cursor.fetchall():
+                cursor.execute('SELECT content FROM virtual_files WHERE id = ?', (file_id,))
+                blob_hash = self._put_blob(cursor, cursor.fetchone()[0])
+                cursor.execute('''
+                    UPDATE virtual_files SET content = NULL, blob_hash = ? WHERE id = ?
+                ''', (blob_hash, file_id))
+                files_migrated += 1
+            
+            cursor.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs')
+            blob_count, blob_bytes = cursor.fetchone()
+            print(f"✅ Moved {files_migrated} inline files and {chunks_migrated} chunks into {blob_count} blobs ({blob_bytes} bytes)")
+            
+        except Exception as e:
+            eprint(f"❌ Error in migration 4: {e}")
+            raise
     
-    def _normalize_path(self, path: str) -> str:
-        """Normalize a path to ensure consistency."""
-        # Remove leading/trailing slashes except for root
-        if path == '/':
-            return '/'
-        
-        # Split path and filter out empty parts
-        parts = [part for part in path.split('/') if part]
-        
-        # Reconstruct path
-        if path.startswith('/'):
-            return '/' + '/'.join(parts)
-        else:
+    def _migrate_to_version_5(self, cursor):
+        """Migration 5: Add upload_sessions and upload_chunks tables for resumable uploads."""
+        try:
+            print("📝 Creating upload session tables...")
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS upload_sessions (
+                    id TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    total_size INTEGER NOT NULL,
+                    chunk_size INTEGER NOT NULL,
+                    chunk_count INTEGER NOT NULL,
+                    expected_hash TEXT,
+                    mime_type TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Uploaded chunks hold blob references until the session is committed or aborted
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS upload_chunks (
+                    session_id TEXT NOT NULL,
+                    chunk_index INTEGER NOT NULL,
+                    blob_hash TEXT NOT NULL,
+                    chunk_size INTEGER NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (session_id, chunk_index)
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_upload_chunks_blob ON upload_chunks(blob_hash)')
+            
+            print("✅ Created upload session tables")
+            
+        except Exception as e:
+            eprint(f"❌ Error in migration 5: {e}")
+            raise
+    
+    def _migrate_to_version_6(self, cursor):
+        """Migration 6: Add the codec column to blobs. Existing blobs stay uncompressed."""
+        try:
+            cursor.execute("PRAGMA table_info(blobs)")
+            columns = [column[1] for column in cursor.fetchall()]
+            
+            if 'codec' not in columns:
+                print("📝 Adding codec column to blobs table...")
+                cursor.execute('ALTER TABLE blobs ADD COLUMN codec TEXT')
+                print("✅ Added codec column")
+            else:
+                print("✅ codec column already exists")
+            
+        except Exception as e:
+            eprint(f"❌ Error in migration 6: {e}")
+            raise
+    
+    def _migrate_to_version_7(self, cursor):
+        """
+        Migration 7: Keep the total size, file count and directory count of each
+        directory's subtree on its row, and add the quotas table.
+        """
+        try:
+            cursor.execute("PRAGMA table_info(virtual_files)")
+            columns = [column[1] for column in cursor.fetchall()]
+            
+            print("📝 Adding directory usage counters...")
+            for column in ('subtree_size', 'subtree_files', 'subtree_dirs'):
+                if column not in columns:
+                    cursor.execute(f'ALTER TABLE virtual_files ADD COLUMN {column} INTEGER DEFAULT 0')
+            
+            cursor.execute('SELECT path FROM virtual_files WHERE is_directory = 1')
+            directories = [row[0] for row in cursor.fetchall()]
+            for directory in directories:
+                cursor.execute('''
+                    UPDATE virtual_files SET (subtree_size, subtree_files, subtree_dirs) = (
+                        SELECT COALESCE(SUM(size), 0), COALESCE(SUM(is_directory = 0), 0),
+                               COALESCE(SUM(is_directory = 1), 0)
+                        FROM virtual_files WHERE path >= ? AND path < ? AND path != ?
+                    )
+                    WHERE path = ?
+                ''', self._subtree_range(directory) + (directory, directory))
+            print(f"✅ Computed usage for {len(directories)} directories")
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS quotas (
+                    path TEXT PRIMARY KEY,
+                    max_bytes INTEGER,
+                    max_items INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            print("✅ Created quotas table")
+        
+        except Exception as e:
+            eprint(f"❌ Error in migration 7: {e}")
+            raise
+    
+    def _ensure_blob_store(self, cursor):
+        """Create the blobs table in the attached blob database."""
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {self.BLOB_SCHEMA}.blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                ref_count INTEGER NOT NULL DEFAULT 0,
+                data BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                codec TEXT
+            )
+        ''')
+    
+    def _migrate_to_version_8(self, cursor, batch_rows: int = 64):
+        """
+        Migration 8: Move the blobs table out of the metadata database into the
+        attached blob database. Rows are copied in batches, each committed on its
+        own to keep the WAL small (migrations 1-7 are already recorded by then).
+        Until the old table is dropped it is the one queries resolve to, so an
+        interrupted copy is simply redone on next start.
+        """
+        try:
+            cursor.execute("SELECT COUNT(*) FROM main.sqlite_master WHERE type = 'table' AND name = 'blobs'")
+            if not cursor.fetchone()[0]:
+                print("✅ Blobs already stored in the blob database")
+                return
+            
+            print(f"📝 Moving blobs to {self.blob_db_path}...")
+            self._ensure_blob_store(cursor)
+            cursor.execute('SELECT COALESCE(MAX(rowid), 0) FROM main.blobs')
+            max_rowid = cursor.fetchone()[0]
+            
+            moved = 0
+            for start in range(0, max_rowid, batch_rows):
+                cursor.execute(f'''
+                    INSERT OR REPLACE INTO {self.BLOB_SCHEMA}.blobs (hash, size, ref_count, data, created_at, codec)
+                    SELECT hash, size, ref_count, data, created_at, codec FROM main.blobs
+                    WHERE rowid > ? AND rowid <= ?
+                ''', (start, start + batch_rows))
+                moved += cursor.rowcount
+                cursor.connection.commit()
+            
+            # The freed pages are returned to the filesystem by the maintenance service
+            cursor.execute('DROP TABLE main.blobs')
+            print(f"✅ Moved {moved} blobs to the blob database")
+        
+        except Exception as e:
+            eprint(f"❌ Error in migration 8: {e}")
+            raise
+    
+    def _ensure_root_directory(self):
+        """Ensure the root directory exists."""
+        with self._path_lock('/'):
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT OR IGNORE INTO virtual_files 
+                    (path, name, parent_path, is_directory, size) 
+                    VALUES (?, ?, ?, ?, ?)
+                ''', ('/', 'root', None, True, 0))
+                conn.commit()
+    
+    def _normalize_path(self, path: str) -> str:
+        """Normalize a path to ensure consistency."""
+        # Remove leading/trailing slashes except for root
+        if path == '/':
+            return '/'
+        
+        # Split path and filter out empty parts
+        parts = [part for part in path.split('/') if part]
+        
+        # Reconstruct path
+        if path.startswith('/'):
+            return '/' + '/'.join(parts)
+        else:
             return '/'.join(parts)
     
+    def _subtree_range(self, path: str) -> Tuple[str, str]:
+        """
+        Get the [lower, upper) bounds that cover every descendant of a path.
+        
+        Descendants of /a are exactly the paths in ['/a/', '/a0') because '0' is
+        the character right after '/', so subtree lookups become index range scans
+        on the path column instead of recursive parent_path joins. The root range
+        also contains '/' itself.
+        """
+        if path == '/':
+            return '/', '0'
+        return path + '/', path + '0'
+    
     def _get_parent_path(self, path: str) -> Optional[str]:
         """Get the parent path of a given path."""
         if path == '/':
@@ -261,7 +1438,7 @@ class VirtualFileManager:
     
     def create_directory(self, path: str) -> bool:
         """Create a directory at the specified path."""
-        with self.lock:
+        with self._path_lock(path):
             try:
                 normalized_path = self._normalize_path(path)
                 parent_path = self._get_parent_path(normalized_path)
@@ -273,34 +1450,39 @@ class VirtualFileManager:
                 
                 print(f"Creating directory: path={normalized_path}, parent={parent_path}, name={name}")
                 
-                # Check if parent exists
-                if parent_path and not self._path_exists(parent_path):
-                    print(f"Parent path {parent_path} does not exist")
-                    return False
-                
-                # Check if path already exists
-                if self._path_exists(normalized_path):
-                    print(f"Path {normalized_path} already exists")
-                    return False
-                
-                with sqlite3.connect(self.db_path) as conn:
+                with self._write_transaction() as conn:
+                    # Check if parent exists
+                    if parent_path and not self._path_exists(parent_path):
+                        print(f"Parent path {parent_path} does not exist")
+                        return False
+                    
+                    # Check if path already exists
+                    if self._path_exists(normalized_path):
+                        print(f"Path {normalized_path} already exists")
+                        return False
+                    
                     cursor = conn.cursor()
                     cursor.execute('''
                         INSERT INTO virtual_files 
                         (path, name, parent_path, is_directory, size) 
                         VALUES (?, ?, ?, ?, ?)
                     ''', (normalized_path, name, parent_path, True, 0))
+                    self._index_paths(cursor, '?', (cursor.lastrowid,))
+                    self._adjust_usage(cursor, normalized_path, directories=1)
                     conn.commit()
                 
                 print(f"Directory created successfully: {normalized_path}")
+                self._emit_change('create', normalized_path, is_directory=True)
                 return True
+            except QuotaExceededError:
+                raise
             except Exception as e:
                 eprint(f"Error creating directory {path}: {e}")
                 return False
     
     def create_file(self, path: str, content: bytes = b'', mime_type: str = None) -> bool:
         """Create a file at the specified path with optional content."""
-        with self.lock:
+        with self._path_lock(path):
             try:
                 normalized_path = self._normalize_path(path)
                 parent_path = self._get_parent_path(normalized_path)
@@ -312,16 +1494,6 @@ class VirtualFileManager:
                 
                 print(f"Creating file: path={normalized_path}, parent={parent_path}, name={name}")
                 
-                # Check if parent exists
-                if parent_path and not self._path_exists(parent_path):
-                    print(f"Parent path {parent_path} does not exist")
-                    return False
-                
-                # Check if path already exists
-                if self._path_exists(normalized_path):
-                    print(f"Path {normalized_path} already exists")
-                    return False
-                
                 # Determine MIME type if not provided
                 if not mime_type:
                     mime_type, _ = mimetypes.guess_type(name)
@@ -331,298 +1503,381 @@ class VirtualFileManager:
                 # Calculate hash
                 content_hash = hashlib.sha256(content).hexdigest() if content else ''
                 
-                with sqlite3.connect(self.db_path) as conn:
+                with self._write_transaction() as conn:
+                    # Check if parent exists
+                    if parent_path and not self._path_exists(parent_path):
+                        print(f"Parent path {parent_path} does not exist")
+                        return False
+                    
+                    # Check if path already exists
+                    if self._path_exists(normalized_path):
+                        print(f"Path {normalized_path} already exists")
+                        return False
+                    
                     cursor = conn.cursor()
                     cursor.execute('''
                         INSERT INTO virtual_files 
-                        (path, name, parent_path, is_directory, size, content, mime_type, hash) 
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (normalized_path, name, parent_path, False, len(content), content, mime_type, content_hash))
+                        (path, name, parent_path, is_directory, size, mime_type, hash) 
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', (normalized_path, name, parent_path, False, len(content), mime_type, content_hash))
+                    file_id = cursor.lastrowid
+                    self._adjust_usage(cursor, normalized_path, size=len(content), files=1)
+                    self._store_content(cursor, file_id, content)
+                    self._index_paths(cursor, '?', (file_id,))
+                    self._index_content(cursor, file_id, content)
                     conn.commit()
                 
                 print(f"File created successfully: {normalized_path}")
+                self._emit_change('create', normalized_path, hash=content_hash, size=len(content))
                 return True
+            except QuotaExceededError:
+                raise
             except Exception as e:
                 eprint(f"Error creating file {path}: {e}")
                 return False
     
     def create_file_streaming(self, path: str, file_stream, chunk_size: int = 8192, mime_type: str = None) -> bool:
-        """Create a file from a stream with intelligent chunked storage for large files."""
-        with self.lock:
-            try:
-                normalized_path = self._normalize_path(path)
-                parent_path = self._get_parent_path(normalized_path)
-                name = self._get_name_from_path(normalized_path)
+        """
+        Create a file from a stream with intelligent chunked storage for large files.
+        
+        The stream is staged like an upload session: each CHUNK_SIZE piece is stored
+        in its own short transaction and the file only appears in a final commit,
+        so a slow upload never holds a lock or a long write transaction. Staged
+        chunks are discarded if the stream fails. Quotas are checked before each
+        chunk is staged, so a stream over quota stops with QuotaExceededError
+        before it writes past the limit.
+        """
+        session_id = None
+        try:
+            normalized_path = self._normalize_path(path)
+            parent_path = self._get_parent_path(normalized_path)
+            name = self._get_name_from_path(normalized_path)
 
-                # Ensure parent_path is '/' for root children
-                if parent_path is None and normalized_path != '/':
-                    parent_path = '/'
-                
-                print(f"Creating file (streaming): path={normalized_path}, parent={parent_path}, name={name}")
-                
-                # Check if parent exists
-                if parent_path and not self._path_exists(parent_path):
-                    print(f"Parent path {parent_path} does not exist")
-                    return False
-                
-                # Check if path already exists
-                if self._path_exists(normalized_path):
-                    print(f"Path {normalized_path} already exists")
-                    return False
-                
-                # Determine MIME type if not provided
+            # Ensure parent_path is '/' for root children
+            if parent_path is None and normalized_path != '/':
+                parent_path = '/'
+            
+            print(f"Creating file (streaming): path={normalized_path}, parent={parent_path}, name={name}")
+            
+            # Check if parent exists (checked again when the file is committed)
+            if parent_path and not self._path_exists(parent_path):
+                print(f"Parent path {parent_path} does not exist")
+                return False
+            
+            # Check if path already exists
+            if self._path_exists(normalized_path):
+                print(f"Path {normalized_path} already exists")
+                return False
+            
+            # Determine MIME type if not provided
+            if not mime_type:
+                mime_type, _ = mimetypes.guess_type(name)
                 if not mime_type:
-                    mime_type, _ = mimetypes.guess_type(name)
-                    if not mime_type:
-                        mime_type = 'application/octet-stream'
-                
-                # Stream the file content with true memory efficiency
-                total_size = 0
-                content_hash = hashlib.sha256()
-                chunk_storage_size = 1024 * 1024  # 1MB chunks for chunked storage
-                small_file_buffer = []  # Only for files < 1MB
-                
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-                    
-                    # Start with a placeholder record to get file_id
-                    cursor.execute('''
-                        INSERT INTO virtual_files 
-                        (path, name, parent_path, is_directory, size, content, mime_type, hash, is_chunked) 
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (normalized_path, name, parent_path, False, 0, None, mime_type, '', None))
-                    
-                    file_id = cursor.lastrowid
-                    chunk_index = 0
-                    current_chunk_buffer = b''
-                    
-                    print(f"📥 Streaming file in {chunk_size} byte chunks...")
-                    
-                    # Stream and process chunks immediately
-                    while True:
-                        chunk = file_stream.read(chunk_size)
-                        if not chunk:
-                            break
-                        
-                        content_hash.update(chunk)
-                        total_size += len(chunk)
-                        
-                        # Check if we should switch to chunked storage
-                        if total_size >= (1024 * 1024) and len(small_file_buffer) > 0:
-                            # Convert from small file buffer to chunked storage
-                            print(f"🔄 Converting to chunked storage at {total_size} bytes")
-                            
-                            # Process accumulated small file buffer first
-                            accumulated_data = b''.join(small_file_buffer) + current_chunk_buffer + chunk
-                            small_file_buffer = []  # Clear buffer
-                            
-                            # Store first chunk(s) from accumulated data
-                            offset = 0
-                            while offset < len(accumulated_data):
-                                chunk_data = accumulated_data[offset:offset + chunk_storage_size]
-                                
-                                cursor.execute('''
-                                    INSERT INTO file_chunks 
-                                    (file_id, chunk_index, chunk_data, chunk_size) 
-                                    VALUES (?, ?, ?, ?)
-                                ''', (file_id, chunk_index, chunk_data, len(chunk_data)))
-                                
-                                print(f"  📦 Stored chunk {chunk_index}: {len(chunk_data)} bytes")
-                                chunk_index += 1
-                                offset += chunk_storage_size
-                            
-                            current_chunk_buffer = b''
-                            
-                        elif total_size < (1024 * 1024):
-                            # Still in small file territory - buffer it
-                            small_file_buffer.append(chunk)
-                            
-                        else:
-                            # Already in chunked mode - process directly
-                            current_chunk_buffer += chunk
-                            
-                            # When buffer reaches chunk size, store it
-                            while len(current_chunk_buffer) >= chunk_storage_size:
-                                chunk_data = current_chunk_buffer[:chunk_storage_size]
-                                current_chunk_buffer = current_chunk_buffer[chunk_storage_size:]
-                                
-                                cursor.execute('''
-                                    INSERT INTO file_chunks 
-                                    (file_id, chunk_index, chunk_data, chunk_size) 
-                                    VALUES (?, ?, ?, ?)
-                                ''', (file_id, chunk_index, chunk_data, len(chunk_data)))
-                                
-                                print(f"  📦 Stored chunk {chunk_index}: {len(chunk_data)} bytes")
-                                chunk_index += 1
-                    
-                    # Handle final data
-                    final_hash = content_hash.hexdigest()
-                    use_chunked_storage = total_size >= (1024 * 1024)
-                    
-                    if use_chunked_storage:
-                        # Store any remaining data in final chunk
-                        if current_chunk_buffer:
-                            cursor.execute('''
-                                INSERT INTO file_chunks 
-                                (file_id, chunk_index, chunk_data, chunk_size) 
-                                VALUES (?, ?, ?, ?)
-                            ''', (file_id, chunk_index, current_chunk_buffer, len(current_chunk_buffer)))
-                            
-                            print(f"  📦 Stored final chunk {chunk_index}: {len(current_chunk_buffer)} bytes")
-                            chunk_index += 1
-                        
-                        # Update file record for chunked storage
-                        cursor.execute('''
-                            UPDATE virtual_files 
-                            SET size = ?, hash = ?, is_chunked = ?
-                            WHERE id = ?
-                        ''', (total_size, final_hash, True, file_id))
-                        
-                        print(f"✅ Stored {chunk_index} chunks for large file ({total_size / (1024*1024):.2f} MB)")
-                        
-                    else:
-                        # Small file - use traditional storage
-                        full_content = b''.join(small_file_buffer)
-                        cursor.execute('''
-                            UPDATE virtual_files 
-                            SET size = ?, content = ?, hash = ?, is_chunked = ?
-                            WHERE id = ?
-                        ''', (total_size, full_content, final_hash, False, file_id))
-                        
-                        print(f"✅ Stored small file using traditional storage ({total_size} bytes)")
-                    
-                    conn.commit()
-                
-                storage_type = "chunked" if use_chunked_storage else "traditional"
-                print(f"✅ File created successfully ({storage_type}): {normalized_path}, size: {total_size} bytes, max memory: ~1MB")
-                return True
-                
-            except Exception as e:
-                eprint(f"❌ Error creating file (streaming) {path}: {e}")
-                import traceback
-                traceback.print_exc()
+                    mime_type = 'application/octet-stream'
+            
+            codec = self._codec_for(mime_type)
+            ancestors = self._ancestors(normalized_path)
+            self._check_streaming_quota(ancestors, 0)
+            
+            session_id = uuid.uuid4().hex
+            with self._write_transaction() as conn:
+                conn.execute('''
+                    INSERT INTO upload_sessions 
+                    (id, path, total_size, chunk_size, chunk_count, mime_type) 
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (session_id, normalized_path, 0, self.CHUNK_SIZE, 0, mime_type))
+                conn.commit()
+            
+            # Stream the file content with true memory efficiency
+            total_size = 0
+            content_hash = hashlib.sha256()
+            chunk_hashes = []
+            buffer = bytearray()  # Never holds more than one storage chunk plus one read
+            
+            print(f"📥 Streaming file in {chunk_size} byte chunks...")
+            
+            while True:
+                chunk = file_stream.read(chunk_size)
+                if not chunk:
+                    break
                 
-                # Clean up any partial data on failure/cancellation
-                try:
-                    with sqlite3.connect(self.db_path) as cleanup_conn:
-                        cleanup_cursor = cleanup_conn.cursor()
-                        
-                        # Get the file_id if it exists
-                        cleanup_cursor.execute('SELECT id FROM virtual_files WHERE path = ?', (normalized_path,))
-                        file_record = cleanup_cursor.fetchone()
-                        
-                        if file_record:
-                            file_id_to_clean = file_record[0]
-                            eprint(f"🧹 Cleaning up orphaned data for file_id: {file_id_to_clean}")
-                            
-                            # Delete any chunks that were stored
-                            cleanup_cursor.execute('DELETE FROM file_chunks WHERE file_id = ?', (file_id_to_clean,))
-                            chunks_deleted = cleanup_cursor.rowcount
-                            
-                            # Delete the incomplete file record
-                            cleanup_cursor.execute('DELETE FROM virtual_files WHERE id = ?', (file_id_to_clean,))
-                            
-                            cleanup_conn.commit()
-                            eprint(f"✅ Cleaned up orphaned file record and {chunks_deleted} chunks")
-                        
-                except Exception as cleanup_error:
-                    eprint(f"⚠️ Warning: Failed to clean up orphaned data: {cleanup_error}")
+                content_hash.update(chunk)
+                total_size += len(chunk)
+                buffer += chunk
                 
-                return False
+                # Store each storage chunk as soon as it is complete
+                while len(buffer) >= self.CHUNK_SIZE:
+                    self._check_streaming_quota(ancestors, total_size)
+                    chunk_hashes.append(self._stage_upload_chunk(session_id, len(chunk_hashes),
+                                                                 bytes(buffer[:self.CHUNK_SIZE]), codec))
+                    del buffer[:self.CHUNK_SIZE]
+                    print(f"  📦 Stored chunk {len(chunk_hashes) - 1}: {self.CHUNK_SIZE} bytes")
+            
+            if buffer:
+                self._check_streaming_quota(ancestors, total_size)
+                chunk_hashes.append(self._stage_upload_chunk(session_id, len(chunk_hashes), bytes(buffer), codec))
+                print(f"  📦 Stored final chunk {len(chunk_hashes) - 1}: {len(buffer)} bytes")
+            
+            with self._path_lock(normalized_path):
+                self._finish_upload(session_id, normalized_path, total_size, mime_type,
+                                    chunk_hashes, content_hash.hexdigest())
+            
+            storage_type = "chunked" if total_size >= self.CHUNK_SIZE else "traditional"
+            print(f"✅ File created successfully ({storage_type}): {normalized_path}, size: {total_size} bytes, max memory: ~1MB")
+            return True
+            
+        except Exception as e:
+            eprint(f"❌ Error creating file (streaming) {path}: {e}")
+            import traceback
+            traceback.print_exc()
+            
+            # Clean up any partial data on failure/cancellation
+            if session_id:
+                if self.abort_upload_session(session_id):
+                    eprint(f"✅ Cleaned up staged chunks for {path}")
+                else:
+                    eprint(f"⚠️ Warning: Failed to clean up staged chunks for {path}")
+            
+            if isinstance(e, QuotaExceededError):
+                raise
+            return False
+    
+    def _check_streaming_quota(self, ancestors: List[str], size: int):
+        """Raise QuotaExceededError if a new file of size bytes would not fit below ancestors."""
+        if not any(path in self._quotas for path in ancestors):
+            return
+        with self._connection() as conn:
+            self._check_quotas(conn.cursor(), ancestors, size, 1)
+    
+    def _stage_upload_chunk(self, session_id: str, chunk_index: int, data: bytes,
+                            codec: Optional[str] = None) -> str:
+        """Store one chunk of an upload session in its own short transaction; returns its blob hash."""
+        blob_hash = hashlib.sha256(data).hexdigest()
+        with self._write_transaction() as conn:
+            cursor = conn.cursor()
+            self._put_blob(cursor, data, blob_hash, codec)
+            cursor.execute('''
+                INSERT INTO upload_chunks 
+                (session_id, chunk_index, blob_hash, chunk_size) 
+                VALUES (?, ?, ?, ?)
+            ''', (session_id, chunk_index, blob_hash, len(data)))
+            conn.commit()
+        return blob_hash
     
     def _path_exists(self, path: str) -> bool:
         """Check if a path exists."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT COUNT(*) FROM virtual_files WHERE path = ?', (path,))
             return cursor.fetchone()[0] > 0
     
     def list_directory(self, path: str = '/') -> List[Dict[str, Any]]:
         """List contents of a directory."""
+        page = self.list_directory_page(path)
+        return page['items'] if page else []
+    
+    def list_directory_page(self, path: str = '/', sort: str = 'name', descending: bool = False,
+                            limit: Optional[int] = None, cursor: Optional[str] = None,
+                            fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        List a directory one page at a time: directories first, then files, each
+        ordered by sort ('name', 'size' or 'mtime', ties broken by name).
+        
+        Pages are keyset-paginated: pass the returned next_cursor back to continue
+        after the last item (it is None on the last page), so deep pages cost the
+        same as the first. fields limits the returned columns (see LIST_FIELDS).
+        Returns None if the directory does not exist and raises ValueError for an
+        unknown sort or field, a bad limit or a malformed cursor.
+        """
+        if sort not in self.LIST_SORT_COLUMNS:
+            raise ValueError(f"Unknown sort '{sort}' (expected one of {', '.join(self.LIST_SORT_COLUMNS)})")
+        fields = list(fields) if fields else list(self.LIST_FIELDS)
+        unknown = [field for field in fields if field not in self.LIST_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        if limit is not None and limit < 1:
+            raise ValueError('limit must be a positive integer')
+        after = self._decode_list_cursor(cursor) if cursor else None
+        
         try:
             normalized_path = self._normalize_path(path)
             print(f"Listing directory: {path} (normalized: {normalized_path})")
             
-            # Check if path exists and is a directory
-            if not self._path_exists(normalized_path):
-                print(f"Path {normalized_path} does not exist")
-                return []
+            sort_column = self.LIST_SORT_COLUMNS[sort]
+            direction, comparison = ('DESC', '<') if descending else ('ASC', '>')
+            order_by = 'name' if sort_column == 'name' else f'{sort_column} {direction}, name'
+            columns = list(dict.fromkeys(fields + ['is_directory', sort_column, 'name']))
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT path, name, is_directory, size, mime_type, created_at, updated_at, accessed_at
-                    FROM virtual_files 
-                    WHERE parent_path = ?
-                    ORDER BY is_directory DESC, name ASC
-                ''', (normalized_path,))
+            with self._connection() as conn:
+                db_cursor = conn.cursor()
+                
+                # Check if path exists and is a directory
+                db_cursor.execute('SELECT 1 FROM virtual_files WHERE path = ? AND is_directory = 1', (normalized_path,))
+                if not db_cursor.fetchone():
+                    print(f"Path {normalized_path} does not exist")
+                    return None
                 
-                items = []
-                for row in cursor.fetchall():
-                    path, name, is_directory, size, mime_type, created_at, updated_at, accessed_at = row
+                rows = []
+                has_more = False
+                for is_directory in (1, 0):
+                    # A cursor in the file group means every directory was listed already
+                    if after and is_directory > after[0]:
+                        continue
+                    
+                    where = 'parent_path = ? AND is_directory = ?'
+                    params = [normalized_path, is_directory]
+                    if after and after[0] == is_directory:
+                        if sort_column == 'name':
+                            where += f' AND name {comparison} ?'
+                            params.append(after[2])
+                        else:
+                            where += f' AND ({sort_column} {comparison} ? OR ({sort_column} = ? AND name {comparison} ?))'
+                            params += [after[1], after[1], after[2]]
+                    
+                    sql = f'SELECT {", ".join(columns)} FROM virtual_files WHERE {where} ORDER BY {order_by} {direction}'
+                    if limit is not None:
+                        # One extra row tells whether anything follows this page
+                        sql += ' LIMIT ?'
+                        params.append(limit - len(rows) + 1)
+                    db_cursor.execute(sql, params)
                     
-                    items.append({
-                        'path': path,
-                        'name': name,
-                        'is_directory': bool(is_directory),
-                        'size': size,
-                        'mime_type': mime_type,
-                        'created_at': created_at,
-                        'updated_at': updated_at,
-                        'accessed_at': accessed_at
-                    })
-                
-                print(f"Found {len(items)} items in {normalized_path}")
-                return items
+                    group = db_cursor.fetchall()
+                    if limit is not None and len(rows) + len(group) > limit:
+                        rows.extend(group[:limit - len(rows)])
+                        has_more = True
+                        break
+                    rows.extend(group)
+            
+            items = []
+            for row in rows:
+                record = dict(zip(columns, row))
+                record['is_directory'] = bool(record['is_directory'])
+                items.append({field: record[field] for field in fields})
+            
+            next_cursor = None
+            if has_more and rows:
+                last = dict(zip(columns, rows[-1]))
+                next_cursor = self._encode_list_cursor(last['is_directory'], last[sort_column], last['name'])
+            
+            print(f"Found {len(items)} items in {normalized_path}")
+            return {
+                'path': normalized_path,
+                'items': items,
+                'next_cursor': next_cursor,
+                'has_more': has_more
+            }
         except Exception as e:
             eprint(f"Error listing directory {path}: {e}")
-            return []
+            return None
+    
+    def count_directory(self, path: str = '/') -> Optional[Dict[str, Any]]:
+        """Count a directory's children without listing them; None if it does not exist."""
+        try:
+            normalized_path = self._normalize_path(path)
+            
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT 1 FROM virtual_files WHERE path = ? AND is_directory = 1', (normalized_path,))
+                if not cursor.fetchone():
+                    return None
+                
+                # Answered from idx_virtual_files_listing alone
+                cursor.execute('''
+                    SELECT is_directory, COUNT(*) FROM virtual_files 
+                    WHERE parent_path = ? 
+                    GROUP BY is_directory
+                ''', (normalized_path,))
+                counts = dict(cursor.fetchall())
+            
+            directories, files = counts.get(1, 0), counts.get(0, 0)
+            return {
+                'path': normalized_path,
+                'total': directories + files,
+                'directories': directories,
+                'files': files
+            }
+        except Exception as e:
+            eprint(f"Error counting directory {path}: {e}")
+            return None
+    
+    def _encode_list_cursor(self, is_directory: int, sort_value: Any, name: str) -> str:
+        """Opaque cursor for the listing position after the given item."""
+        token = json.dumps([int(is_directory), sort_value, name], separators=(',', ':'))
+        return base64.urlsafe_b64encode(token.encode('utf-8')).decode('ascii')
+    
+    def _decode_list_cursor(self, cursor: str) -> Tuple[int, Any, str]:
+        """Parse a cursor made by _encode_list_cursor; raises ValueError if it is malformed."""
+        try:
+            is_directory, sort_value, name = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (ValueError, TypeError, UnicodeError) as e:
+            raise ValueError('Malformed listing cursor') from e
+        if is_directory not in (0, 1) or not isinstance(name, str):
+            raise ValueError('Malformed listing cursor')
+        return is_directory, sort_value, name
     
     def read_file(self, path: str) -> Optional[Dict[str, Any]]:
         """Read a file and return its content and metadata, handling both chunked and traditional storage."""
         try:
             normalized_path = self._normalize_path(path)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.cursor()
+                
+                if self.cache.peek_version(normalized_path):
+                    # Only the version is needed to tell whether the cached copy is current
+                    cursor.execute('''
+                        SELECT hash, id, accessed_at, updated_at FROM virtual_files
+                        WHERE path = ? AND is_directory = 0
+                    ''', (normalized_path,))
+                    row = cursor.fetchone()
+                    if not row:
+                        self.cache.invalidate(normalized_path)
+                        return None
+                    
+                    content_hash, file_id, accessed_at, updated_at = row
+                    result = self.cache.get(normalized_path, (file_id, content_hash, updated_at))
+                    if result:
+                        self.access_times.record(file_id, accessed_at, updated_at)
+                        result['accessed_at'] = accessed_at
+                        return result
+                
                 cursor.execute('''
-                    SELECT path, name, is_directory, size, content, mime_type, hash, created_at, updated_at, accessed_at, is_chunked, id
-                    FROM virtual_files 
-                    WHERE path = ? AND is_directory = 0
+                    SELECT vf.path, vf.name, vf.is_directory, vf.size, COALESCE(vf.content, b.data), vf.mime_type, vf.hash,
+                           vf.created_at, vf.updated_at, vf.accessed_at, vf.is_chunked, vf.id, b.codec
+                    FROM virtual_files vf
+                    LEFT JOIN blobs b ON b.hash = vf.blob_hash
+                    WHERE vf.path = ? AND vf.is_directory = 0
                 ''', (normalized_path,))
                 
                 row = cursor.fetchone()
                 if not row:
                     return None
                 
-                path, name, is_directory, size, content, mime_type, content_hash, created_at, updated_at, accessed_at, is_chunked, file_id = row
+                path, name, is_directory, size, content, mime_type, content_hash, created_at, updated_at, accessed_at, is_chunked, file_id, codec = row
                 
                 # Handle chunked vs traditional storage
                 if is_chunked:
                     print(f"📖 Reading chunked file: {normalized_path}")
                     # Reconstruct content from chunks
                     cursor.execute('''
-                        SELECT chunk_data FROM file_chunks 
-                        WHERE file_id = ? 
-                        ORDER BY chunk_index
+                        SELECT b.data, b.codec FROM file_chunks fc
+                        JOIN blobs b ON b.hash = fc.blob_hash
+                        WHERE fc.file_id = ? 
+                        ORDER BY fc.chunk_index
                     ''', (file_id,))
                     
                     chunk_rows = cursor.fetchall()
-                    content_chunks = [row[0] for row in chunk_rows]
+                    content_chunks = [self._decode_blob(*row) for row in chunk_rows]
                     content = b''.join(content_chunks)
                     print(f"📦 Reconstructed content from {len(content_chunks)} chunks")
                 else:
                     print(f"📄 Reading traditional file: {normalized_path}")
+                    content = self._decode_blob(content, codec)
                 
                 # Update access time
-                cursor.execute('''
-                    UPDATE virtual_files 
-                    SET accessed_at = CURRENT_TIMESTAMP 
-                    WHERE path = ?
-                ''', (normalized_path,))
-                conn.commit()
+                self.access_times.record(file_id, accessed_at, updated_at)
                 
-                return {
+                result = {
                     'path': path,
                     'name': name,
                     'is_directory': bool(is_directory),
@@ -635,6 +1890,12 @@ class VirtualFileManager:
                     'accessed_at': accessed_at,
                     'is_chunked': bool(is_chunked) if is_chunked is not None else False
                 }
+                
+                # Chunked content is read in several statements, so only inline
+                # content is known to match the hash read alongside it
+                if not is_chunked:
+                    self.cache.put(normalized_path, (file_id, content_hash, updated_at), result)
+                return result
         except Exception as e:
             eprint(f"❌ Error reading file {path}: {e}")
             import traceback
@@ -646,7 +1907,7 @@ class VirtualFileManager:
         try:
             normalized_path = self._normalize_path(path)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT name, is_directory, size, mime_type, hash, created_at, updated_at, accessed_at, is_chunked, id
@@ -661,12 +1922,7 @@ class VirtualFileManager:
                 name, is_directory, size, mime_type, content_hash, created_at, updated_at, accessed_at, is_chunked, file_id = row
                 
                 # Update access time
-                cursor.execute('''
-                    UPDATE virtual_files 
-                    SET accessed_at = CURRENT_TIMESTAMP 
-                    WHERE path = ?
-                ''', (normalized_path,))
-                conn.commit()
+                self.access_times.record(file_id, accessed_at, updated_at)
                 
                 # Return metadata and content generator
                 metadata = {
@@ -686,42 +1942,52 @@ class VirtualFileManager:
                     """Generator that yields file content in chunks."""
                     if is_chunked:
                         print(f"📺 Streaming chunked file: {normalized_path} ({size} bytes)")
-                        # Stream chunks from database
-                        with sqlite3.connect(self.db_path) as stream_conn:
-                            stream_cursor = stream_conn.cursor()
-                            stream_cursor.execute('''
-                                SELECT chunk_data FROM file_chunks 
-                                WHERE file_id = ? 
-                                ORDER BY chunk_index
-                            ''', (file_id,))
-                            
-                            chunk_count = 0
-                            for chunk_row in stream_cursor:
-                                chunk_data = chunk_row[0]
-                                chunk_count += 1
-                                print(f"  📦 Streaming chunk {chunk_count}: {len(chunk_data)} bytes")
-                                yield chunk_data
-                            
-                            print(f"✅ Streamed {chunk_count} chunks for chunked file")
+                        # Look up the chunk layout first, then fetch one chunk per query so
+                        # no pooled connection stays checked out while the client reads.
+                        # Every query checks the file's version, so a write in between
+                        # aborts the stream instead of mixing old and new chunks
+                        chunk_layout = self._chunk_layout(file_id, content_hash, updated_at, size, normalized_path)
+                        
+                        chunk_count = 0
+                        for chunk_index, chunk_size in chunk_layout:
+                            chunk_row = self._fetch_chunk('b.data', (), file_id, chunk_index, chunk_size,
+                                                          content_hash, updated_at, normalized_path)
+                            chunk_data = self._decode_blob(*chunk_row)
+                            chunk_count += 1
+                            print(f"  📦 Streaming chunk {chunk_count}: {len(chunk_data)} bytes")
+                            yield chunk_data
+                        
+                        print(f"✅ Streamed {chunk_count} chunks for chunked file")
                     else:
                         print(f"📺 Streaming traditional file: {normalized_path} ({size} bytes)")
-                        # Stream traditional file in chunks
-                        with sqlite3.connect(self.db_path) as stream_conn:
-                            stream_cursor = stream_conn.cursor()
-                            stream_cursor.execute('''
-                                SELECT content FROM virtual_files 
-                                WHERE path = ? AND is_directory = 0
-                            ''', (normalized_path,))
-                            
-                            content_row = stream_cursor.fetchone()
-                            if content_row and content_row[0]:
-                                content = content_row[0]
-                                # Yield in 64KB chunks for optimal streaming
-                                chunk_size = 64 * 1024  # 64KB
-                                for i in range(0, len(content), chunk_size):
-                                    yield content[i:i + chunk_size]
+                        version = (file_id, content_hash, updated_at)
+                        cached = self.cache.get(normalized_path, version)
+                        if cached:
+                            content = cached['content']
+                        else:
+                            # Stream traditional file in chunks
+                            with self._connection() as stream_conn:
+                                stream_cursor = stream_conn.cursor()
+                                stream_cursor.execute('''
+                                    SELECT COALESCE(vf.content, b.data), b.codec, vf.id, vf.hash, vf.updated_at
+                                    FROM virtual_files vf
+                                    LEFT JOIN blobs b ON b.hash = vf.blob_hash
+                                    WHERE vf.path = ? AND vf.is_directory = 0
+                                ''', (normalized_path,))
+                                content_row = stream_cursor.fetchone()
                             
-                            print(f"✅ Streamed traditional file in chunks")
+                            if not content_row or tuple(content_row[2:]) != version:
+                                raise FileChangedError(normalized_path)
+                            content = self._decode_blob(*content_row[:2]) if content_row[0] else b''
+                            self.cache.put(normalized_path, version, dict(metadata, content=content))
+                        
+                        if content:
+                            # Yield in 64KB chunks for optimal streaming
+                            chunk_size = 64 * 1024  # 64KB
+                            for i in range(0, len(content), chunk_size):
+                                yield content[i:i + chunk_size]
+                        
+                        print(f"✅ Streamed traditional file in chunks")
                 
                 return metadata, content_generator()
                 
@@ -731,101 +1997,1126 @@ class VirtualFileManager:
             traceback.print_exc()
             return None
     
-    def write_file(self, path: str, content: bytes) -> bool:
-        """Write content to a file."""
-        with self.lock:
-            try:
-                normalized_path = self._normalize_path(path)
-                
-                # Check if file exists
-                if not self._path_exists(normalized_path):
-                    return False
+    def read_file_range(self, path: str, start: int, stop: int):
+        """
+        Return a generator over bytes [start, stop) of a file, or None if the file
+        does not exist. Chunked files seek straight to the chunks that overlap the
+        range and uncompressed blobs are sliced inside SQLite, so only the requested
+        bytes are read; compressed blobs are decompressed and sliced in Python.
+        The generator raises FileChangedError if the file is written meanwhile.
+        """
+        try:
+            normalized_path = self._normalize_path(path)
+            
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, size, is_chunked, hash, updated_at FROM virtual_files 
+                    WHERE path = ? AND is_directory = 0
+                ''', (normalized_path,))
+                
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                
+                file_id, size, is_chunked, content_hash, updated_at = row
+                start = max(0, start)
+                stop = min(stop, size)
+            
+            # Chunk sizes are not uniform (streamed uploads can leave a short chunk
+            # where they switched to chunked storage), so locate chunks by offset
+            chunk_spans = []
+            if is_chunked:
+                offset = 0
+                for chunk_index, chunk_size in self._chunk_layout(file_id, content_hash, updated_at,
+                                                                  size, normalized_path):
+                    chunk_start, offset = offset, offset + chunk_size
+                    if offset > start and chunk_start < stop:
+                        chunk_spans.append((chunk_index, chunk_size, max(start - chunk_start, 0),
+                                            min(stop, offset) - max(start, chunk_start)))
+            
+            def range_generator():
+                """Generator that yields the requested byte range."""
+                if start >= stop:
+                    return
+                
+                if is_chunked:
+                    for chunk_index, chunk_size, chunk_offset, length in chunk_spans:
+                        chunk_row = self._fetch_chunk(self._BLOB_SLICE_SQL, (chunk_offset + 1, length),
+                                                      file_id, chunk_index, chunk_size,
+                                                      content_hash, updated_at, normalized_path)
+                        yield self._slice_blob(*chunk_row, chunk_offset, length)
+                else:
+                    with self._connection() as range_conn:
+                        content_row = range_conn.execute(f'''
+                            SELECT COALESCE(vf.content, {self._BLOB_SLICE_SQL}), b.codec FROM virtual_files vf
+                            LEFT JOIN blobs b ON b.hash = vf.blob_hash
+                            WHERE vf.id = ? AND vf.hash IS ? AND vf.updated_at IS ?
+                        ''', (start + 1, stop - start, file_id, content_hash, updated_at)).fetchone()
+                    
+                    if not content_row or not content_row[0]:
+                        raise FileChangedError(normalized_path)
+                    content = self._slice_blob(*content_row, start, stop - start)
+                    # Yield in 64KB chunks for optimal streaming
+                    chunk_size = 64 * 1024  # 64KB
+                    for i in range(0, len(content), chunk_size):
+                        yield content[i:i + chunk_size]
+            
+            return range_generator()
+            
+        except FileChangedError as e:
+            eprint(f"❌ Error reading range of file {path}: {e}")
+            return None
+        except Exception as e:
+            eprint(f"❌ Error reading range of file {path}: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+    
+    def _chunk_layout(self, file_id: int, content_hash: str, updated_at: str, size: int,
+                      path: str) -> List[Tuple[int, int]]:
+        """
+        (chunk_index, chunk_size) of each chunk of a file, in order, as long as the
+        file still has the given version. Raises FileChangedError otherwise.
+        """
+        with self._connection() as conn:
+            layout = conn.execute('''
+                SELECT fc.chunk_index, fc.chunk_size FROM file_chunks fc
+                JOIN virtual_files vf ON vf.id = fc.file_id
+                WHERE fc.file_id = ? AND vf.hash IS ? AND vf.updated_at IS ?
+                ORDER BY fc.chunk_index
+            ''', (file_id, content_hash, updated_at)).fetchall()
+        if sum(chunk_size for _, chunk_size in layout) != size:
+            raise FileChangedError(path)
+        return layout
+    
+    def _fetch_chunk(self, data_sql: str, data_params: Tuple, file_id: int, chunk_index: int,
+                     chunk_size: int, content_hash: str, updated_at: str, path: str) -> Tuple[bytes, Optional[str]]:
+        """
+        (data, codec) of one chunk, selected with data_sql, in a single statement that
+        also checks the file still has the version and chunk layout it was opened
+        with. Raises FileChangedError if it does not or the chunk is gone.
+        """
+        with self._connection() as conn:
+            chunk_row = conn.execute(f'''
+                SELECT {data_sql}, b.codec FROM file_chunks fc
+                JOIN virtual_files vf ON vf.id = fc.file_id
+                JOIN blobs b ON b.hash = fc.blob_hash
+                WHERE fc.file_id = ? AND fc.chunk_index = ? AND fc.chunk_size = ?
+                  AND vf.hash IS ? AND vf.updated_at IS ?
+            ''', data_params + (file_id, chunk_index, chunk_size, content_hash, updated_at)).fetchone()
+        if not chunk_row or chunk_row[0] is None:
+            raise FileChangedError(path)
+        return chunk_row
+    
+    def read_file_stored(self, path: str, codecs) -> Optional[Tuple[str, bytes]]:
+        """
+        Return (codec, stored bytes) for a file kept in a single blob compressed
+        with one of codecs, so the bytes can be sent as-is to a client that accepts
+        that encoding. None if the file is missing, chunked, empty or stored otherwise.
+        """
+        codecs = list(codecs)
+        if not codecs:
+            return None
+        
+        try:
+            normalized_path = self._normalize_path(path)
+            
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT b.codec, b.data, vf.id, vf.accessed_at, vf.updated_at FROM virtual_files vf
+                    JOIN blobs b ON b.hash = vf.blob_hash
+                    WHERE vf.path = ? AND vf.is_directory = 0 AND vf.is_chunked = 0
+                      AND b.codec IN ({', '.join('?' * len(codecs))})
+                ''', (normalized_path, *codecs))
+                
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                codec, data, file_id, accessed_at, updated_at = row
+                
+                # Update access time
+                self.access_times.record(file_id, accessed_at, updated_at)
+                
+                return codec, data
+        except Exception as e:
+            eprint(f"❌ Error reading stored content of {path}: {e}")
+            return None
+    
+    def write_file(self, path: str, content: bytes) -> bool:
+        """Write content to a file."""
+        with self._path_lock(path):
+            try:
+                normalized_path = self._normalize_path(path)
                 
                 # Calculate hash
                 content_hash = hashlib.sha256(content).hexdigest()
                 
-                with sqlite3.connect(self.db_path) as conn:
+                with self._write_transaction() as conn:
                     cursor = conn.cursor()
+                    
+                    # Check if file exists
+                    cursor.execute('SELECT id, size FROM virtual_files WHERE path = ? AND is_directory = 0',
+                                   (normalized_path,))
+                    row = cursor.fetchone()
+                    if not row:
+                        return False
+                    file_id, old_size = row
+                    
+                    self._adjust_usage(cursor, normalized_path, size=len(content) - (old_size or 0))
+                    self._replace_content(cursor, file_id, content)
                     cursor.execute('''
                         UPDATE virtual_files 
-                        SET content = ?, size = ?, hash = ?, updated_at = CURRENT_TIMESTAMP 
-                        WHERE path = ? AND is_directory = 0
-                    ''', (content, len(content), content_hash, normalized_path))
+                        SET size = ?, hash = ?, updated_at = CURRENT_TIMESTAMP 
+                        WHERE id = ?
+                    ''', (len(content), content_hash, file_id))
+                    self._index_content(cursor, file_id, content)
                     conn.commit()
                 
-                return cursor.rowcount > 0
+                self.cache.invalidate(normalized_path)
+                self._emit_change('write', normalized_path, hash=content_hash, size=len(content))
+                
+                return True
+            except QuotaExceededError:
+                raise
             except Exception as e:
                 eprint(f"Error writing file {path}: {e}")
                 return False
     
+    def patch_file(self, path: str, data: bytes, offset: Optional[int] = None,
+                   length: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Replace `length` bytes at `offset` with data and return the file's new size,
+        hash and the number of chunks written, or None on failure.
+        
+        offset defaults to the end of the file (append) and length defaults to
+        len(data) (overwrite in place, extending the file if needed). Chunked files
+        only rewrite the chunks the patch overlaps; files move between inline and
+        chunked storage when they cross CHUNK_SIZE.
+        """
+        with self._path_lock(path):
+            try:
+                normalized_path = self._normalize_path(path)
+                
+                with self._write_transaction() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT id, size, is_chunked FROM virtual_files 
+                        WHERE path = ? AND is_directory = 0
+                    ''', (normalized_path,))
+                    
+                    row = cursor.fetchone()
+                    if not row:
+                        print(f"Patch failed: file {normalized_path} does not exist")
+                        return None
+                    
+                    file_id, size, is_chunked = row
+                    if offset is None:
+                        offset, length = size, 0
+                    elif length is None:
+                        length = len(data)
+                    
+                    if offset < 0 or offset > size or length < 0:
+                        print(f"Patch failed: offset {offset} is outside {normalized_path} ({size} bytes)")
+                        return None
+                    
+                    end = min(offset + length, size)
+                    new_size = size - (end - offset) + len(data)
+                    self._adjust_usage(cursor, normalized_path, size=new_size - size)
+                    
+                    if is_chunked and new_size >= self.CHUNK_SIZE:
+                        chunks_written = self._patch_chunks(cursor, file_id, size, offset, end, data)
+                        content_hash = self._hash_chunks(cursor, file_id)
+                        content = None
+                    else:
+                        # Inline files (and chunked files shrinking below CHUNK_SIZE) are
+                        # small enough to rebuild; _replace_content chunks them if they grew
+                        content = self._read_content(cursor, file_id, is_chunked)
+                        content = content[:offset] + data + content[end:]
+                        is_chunked = self._replace_content(cursor, file_id, content)
+                        chunks_written = (len(content) + self.CHUNK_SIZE - 1) // self.CHUNK_SIZE if is_chunked else 0
+                        content_hash = hashlib.sha256(content).hexdigest()
+                    
+                    cursor.execute('''
+                        UPDATE virtual_files 
+                        SET size = ?, hash = ?, updated_at = CURRENT_TIMESTAMP 
+                        WHERE id = ?
+                    ''', (new_size, content_hash, file_id))
+                    
+                    # Appends past the indexed prefix leave the search index as it is
+                    if offset < self.MAX_INDEXED_CONTENT:
+                        self._index_content(cursor, file_id, content)
+                    conn.commit()
+                
+                self.cache.invalidate(normalized_path)
+                self._emit_change('write', normalized_path, hash=content_hash, size=new_size)
+                
+                print(f"Patched {normalized_path} at {offset}: {size} -> {new_size} bytes, {chunks_written} chunks written")
+                return {
+                    'path': normalized_path,
+                    'size': new_size,
+                    'hash': content_hash,
+                    'is_chunked': bool(is_chunked),
+                    'chunks_written': chunks_written
+                }
+            except QuotaExceededError:
+                raise
+            except Exception as e:
+                eprint(f"Error patching file {path}: {e}")
+                import traceback
+                traceback.print_exc()
+                return None
+    
+    def _read_content(self, cursor, file_id: int, is_chunked: bool) -> bytes:
+        """Read a file's whole content inside the caller's transaction."""
+        if is_chunked:
+            cursor.execute('''
+                SELECT b.data, b.codec FROM file_chunks fc
+                JOIN blobs b ON b.hash = fc.blob_hash
+                WHERE fc.file_id = ?
+                ORDER BY fc.chunk_index
+            ''', (file_id,))
+            return b''.join(self._decode_blob(*row) for row in cursor.fetchall())
+        
+        cursor.execute('''
+            SELECT COALESCE(vf.content, b.data), b.codec FROM virtual_files vf
+            LEFT JOIN blobs b ON b.hash = vf.blob_hash
+            WHERE vf.id = ?
+        ''', (file_id,))
+        row = cursor.fetchone()
+        return (self._decode_blob(*row) or b'') if row else b''
+    
+    def _hash_chunks(self, cursor, file_id: int) -> str:
+        """SHA-256 of a chunked file's content, reading one chunk at a time."""
+        cursor.execute('''
+            SELECT blob_hash FROM file_chunks WHERE file_id = ? ORDER BY chunk_index
+        ''', (file_id,))
+        return self._hash_blobs(cursor, [row[0] for row in cursor.fetchall()])
+    
+    def _hash_blobs(self, cursor, blob_hashes: List[str]) -> str:
+        """SHA-256 of the concatenation of the given blobs, reading one blob at a time."""
+        content_hash = hashlib.sha256()
+        for blob_hash in blob_hashes:
+            cursor.execute('SELECT data, codec FROM blobs WHERE hash = ?', (blob_hash,))
+            content_hash.update(self._decode_blob(*cursor.fetchone()))
+        return content_hash.hexdigest()
+    
+    def _patch_chunks(self, cursor, file_id: int, size: int, start: int, end: int, data: bytes) -> int:
+        """
+        Replace bytes [start, end) of a chunked file with data by rewriting only the
+        run of chunks the patch overlaps and shifting the indexes of later chunks.
+        Returns the number of chunks written.
+        """
+        cursor.execute('''
+            SELECT chunk_index, chunk_size, blob_hash FROM file_chunks
+            WHERE file_id = ?
+            ORDER BY chunk_index
+        ''', (file_id,))
+        chunks = cursor.fetchall()
+        count = len(chunks)
+        
+        # offsets[i] is where chunk i starts; offsets[count] is the file size
+        offsets = [0]
+        for _, chunk_size, _ in chunks:
+            offsets.append(offsets[-1] + chunk_size)
+        
+        # Chunk holding `start` (count when appending at the end)
+        position = count
+        for index in range(count):
+            if offsets[index] <= start < offsets[index + 1]:
+                position = index
+                break
+        
+        if start == end and offsets[position] == start:
+            # Pure insertion at a chunk boundary: top up the previous chunk if it has
+            # room, otherwise insert new chunks without touching existing ones
+            if position > 0 and chunks[position - 1][1] < self.CHUNK_SIZE:
+                first = last = position - 1
+            else:
+                first, last = position, position - 1
+        else:
+            first = last = position
+            while last + 1 < count and offsets[last + 1] < end:
+                last += 1
+        
+        span_start = offsets[first]
+        cursor.execute('''
+            SELECT b.data, b.codec FROM file_chunks fc
+            JOIN blobs b ON b.hash = fc.blob_hash
+            WHERE fc.file_id = ? AND fc.chunk_index BETWEEN ? AND ?
+            ORDER BY fc.chunk_index
+        ''', (file_id, first, last))
+        old_bytes = b''.join(self._decode_blob(*row) for row in cursor.fetchall())
+        new_bytes = old_bytes[:start - span_start] + data + old_bytes[end - span_start:]
+        pieces = [new_bytes[i:i + self.CHUNK_SIZE] for i in range(0, len(new_bytes), self.CHUNK_SIZE)]
+        
+        # Drop the replaced chunks and their blob references
+        replaced = {}
+        for _, _, blob_hash in chunks[first:last + 1]:
+            replaced[blob_hash] = replaced.get(blob_hash, 0) + 1
+        cursor.execute('''
+            DELETE FROM file_chunks WHERE file_id = ? AND chunk_index BETWEEN ? AND ?
+        ''', (file_id, first, last))
+        
+        # Shift later chunks; going through negative indexes keeps UNIQUE(file_id, chunk_index)
+        # satisfied while rows move
+        delta = len(pieces) - (last - first + 1)
+        if delta:
+            cursor.execute('''
+                UPDATE file_chunks SET chunk_index = -(chunk_index + ?) - 1
+                WHERE file_id = ? AND chunk_index > ?
+            ''', (delta, file_id, last))
+            cursor.execute('''
+                UPDATE file_chunks SET chunk_index = -chunk_index - 1
+                WHERE file_id = ? AND chunk_index < 0
+            ''', (file_id,))
+        
+        codec = self._file_codec(cursor, file_id)
+        for index, piece in enumerate(pieces):
+            self._add_chunk(cursor, file_id, first + index, piece, codec)
+        
+        # Release after adding so unchanged pieces keep their blob
+        self._drop_blob_refs(cursor, list(replaced.items()))
+        return len(pieces)
+    
     def delete_path(self, path: str) -> bool:
         """Delete a file or directory recursively."""
-        with self.lock:
+        with self._path_lock(path):
             try:
                 normalized_path = self._normalize_path(path)
                 
-                # Check if path exists
-                if not self._path_exists(normalized_path):
-                    return False
-                
-                # If it's a directory, delete all children first
-                if self._is_directory(normalized_path):
-                    children = self._get_all_children(normalized_path)
-                    for child in children:
-                        self._delete_single_path(child)
+                with self._write_transaction() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('SELECT is_directory FROM virtual_files WHERE path = ?', (normalized_path,))
+                    row = cursor.fetchone()
+                    
+                    # Nothing matched - the path does not exist
+                    if not row:
+                        return False
+                    
+                    chunks_deleted, metadata_deleted, files_deleted, blobs_freed = self._delete_subtree(cursor, normalized_path)
+                    conn.commit()
                 
-                # Delete the path itself
-                return self._delete_single_path(normalized_path)
+                print(f"Deleted {normalized_path}: {files_deleted} items, {chunks_deleted} chunks, "
+                      f"{metadata_deleted} metadata rows, {blobs_freed} blobs freed")
+                self._emit_change('delete', normalized_path, is_directory=bool(row[0]), items=files_deleted)
+                return True
             except Exception as e:
                 eprint(f"Error deleting path {path}: {e}")
                 return False
     
-    def _is_directory(self, path: str) -> bool:
-        """Check if a path is a directory."""
-        with sqlite3.connect(self.db_path) as conn:
+    def _delete_subtree(self, cursor, path: str) -> Tuple[int, int, int, int]:
+        """
+        Delete a path, all of its descendants and their chunk/metadata rows.
+        Runs inside the caller's transaction.
+        
+        Returns:
+            tuple: (chunks_deleted, metadata_deleted, files_deleted, blobs_freed)
+        """
+        params = (path,) + self._subtree_range(path)
+        size, files, directories = self._subtree_usage(cursor, path)
+        self._adjust_usage(cursor, path, size=-size, files=-files, directories=-directories)
+        self.cache.invalidate(path, subtree=True)
+        self._unindex(cursor, self._SUBTREE_IDS_SQL, params)
+        blobs_freed = self._release_content(cursor, self._SUBTREE_IDS_SQL, params)
+        
+        cursor.execute(f'DELETE FROM file_chunks WHERE file_id IN ({self._SUBTREE_IDS_SQL})', params)
+        chunks_deleted = cursor.rowcount
+        
+        cursor.execute(f'DELETE FROM file_metadata WHERE file_id IN ({self._SUBTREE_IDS_SQL})', params)
+        metadata_deleted = cursor.rowcount
+        
+        cursor.execute(f'DELETE FROM virtual_files WHERE id IN ({self._SUBTREE_IDS_SQL})', params)
+        files_deleted = cursor.rowcount
+        
+        return chunks_deleted, metadata_deleted, files_deleted, blobs_freed
+    
+    def _index_paths(self, cursor, ids_sql: str, params: tuple):
+        """(Re)index the names and paths of the files selected by ids_sql."""
+        if not self.search_available:
+            return
+        cursor.execute(f'DELETE FROM search_names WHERE rowid IN ({ids_sql})', params)
+        cursor.execute(f'''
+            INSERT INTO search_names (rowid, name, path)
+            SELECT id, name, path FROM virtual_files WHERE id IN ({ids_sql})
+        ''', params)
+    
+    def _index_content(self, cursor, file_id: int, content: Optional[bytes] = None):
+        """
+        (Re)index the leading MAX_INDEXED_CONTENT bytes of a text file. Pass the
+        new content when the caller has it, otherwise it is read back from storage.
+        """
+        if not self.search_available:
+            return
+        cursor.execute('DELETE FROM search_content WHERE rowid = ?', (file_id,))
+        
+        cursor.execute('SELECT mime_type, is_chunked FROM virtual_files WHERE id = ?', (file_id,))
+        row = cursor.fetchone()
+        if not row or not (is_text_mime(row[0]) or (row[0] or 'application/octet-stream') == 'application/octet-stream'):
+            return
+        
+        if content is None:
+            content = self._read_content_prefix(cursor, file_id, row[1], self.MAX_INDEXED_CONTENT)
+        content = content[:self.MAX_INDEXED_CONTENT]
+        
+        if is_text_mime(row[0]):
+            text = content.decode('utf-8', errors='ignore')
+        else:
+            # Untyped content is only indexed if it is really text
+            try:
+                text = content.decode('utf-8')
+            except UnicodeDecodeError as e:
+                # A multi-byte character cut off by the size cap is fine
+                if e.start < len(content) - 3:
+                    return
+                text = content[:e.start].decode('utf-8')
+            if '\x00' in text:
+                return
+        
+        if text.strip():
+            cursor.execute('INSERT INTO search_content (rowid, content) VALUES (?, ?)', (file_id, text))
+    
+    def _unindex(self, cursor, ids_sql: str, params: tuple):
+        """Drop the files selected by ids_sql from the search index."""
+        if not self.search_available:
+            return
+        cursor.execute(f'DELETE FROM search_names WHERE rowid IN ({ids_sql})', params)
+        cursor.execute(f'DELETE FROM search_content WHERE rowid IN ({ids_sql})', params)
+    
+    def _read_content_prefix(self, cursor, file_id: int, is_chunked: bool, limit: int) -> bytes:
+        """Read up to limit leading bytes of a file, touching only the chunks they span."""
+        if not is_chunked:
+            return self._read_content(cursor, file_id, False)[:limit]
+        
+        cursor.execute('''
+            SELECT chunk_index, chunk_size FROM file_chunks WHERE file_id = ? ORDER BY chunk_index
+        ''', (file_id,))
+        needed, covered = [], 0
+        for chunk_index, chunk_size in cursor.fetchall():
+            if covered >= limit:
+                break
+            needed.append(chunk_index)
+            covered += chunk_size
+        
+        pieces = []
+        for chunk_index in needed:
+            cursor.execute('''
+                SELECT b.data, b.codec FROM file_chunks fc
+                JOIN blobs b ON b.hash = fc.blob_hash
+                WHERE fc.file_id = ? AND fc.chunk_index = ?
+            ''', (file_id, chunk_index))
+            pieces.append(self._decode_blob(*cursor.fetchone()))
+        return b''.join(pieces)[:limit]
+    
+    def _put_blob(self, cursor, data: bytes, blob_hash: Optional[str] = None, codec: Optional[str] = None) -> str:
+        """
+        Take a reference to the blob holding data, storing the bytes only if no
+        identical blob exists yet. New blobs are compressed with codec when that
+        pays off. Returns the blob's SHA-256 hash (of the uncompressed data).
+        """
+        blob_hash = blob_hash or hashlib.sha256(data).hexdigest()
+        cursor.execute('UPDATE blobs SET ref_count = ref_count + 1 WHERE hash = ?', (blob_hash,))
+        if cursor.rowcount == 0:
+            stored, codec = self._encode_blob(data, codec)
+            if codec:
+                cursor.execute('''
+                    INSERT INTO blobs (hash, size, ref_count, data, codec) 
+                    VALUES (?, ?, 1, ?, ?)
+                ''', (blob_hash, len(data), stored, codec))
+            else:
+                cursor.execute('''
+                    INSERT INTO blobs (hash, size, ref_count, data) 
+                    VALUES (?, ?, 1, ?)
+                ''', (blob_hash, len(data), data))
+        return blob_hash
+    
+    def _encode_blob(self, data: bytes, codec: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """Compress data for storage; returns the bytes to store and the codec actually used."""
+        if not codec or len(data) < self.MIN_COMPRESS_SIZE:
+            return data, None
+        compressed = STORAGE_CODECS[codec][0](data)
+        if len(compressed) > len(data) * 0.9:
+            return data, None
+        return compressed, codec
+    
+    def _decode_blob(self, data: Optional[bytes], codec: Optional[str]) -> Optional[bytes]:
+        """Original bytes of a stored blob."""
+        if not codec or data is None:
+            return data
+        if codec not in STORAGE_CODECS:
+            raise ValueError(f"Blob codec {codec} is not available (is its package installed?)")
+        return STORAGE_CODECS[codec][1](data)
+    
+    def _slice_blob(self, data: bytes, codec: Optional[str], offset: int, length: int) -> bytes:
+        """Finish a _BLOB_SLICE_SQL read: decompress and slice compressed blobs."""
+        if not codec:
+            return data
+        return self._decode_blob(data, codec)[offset:offset + length]
+    
+    def _codec_for(self, mime_type: Optional[str], name: Optional[str] = None) -> Optional[str]:
+        """Codec for new content of a MIME type (guessed from name if missing), or None to store it as-is."""
+        if not self.compression:
+            return None
+        if not mime_type and name:
+            mime_type, _ = mimetypes.guess_type(name)
+        mime_type = (mime_type or 'application/octet-stream').split(';')[0].strip().lower()
+        if is_text_mime(mime_type) or mime_type == 'application/octet-stream':
+            return self.compression
+        return None
+    
+    def _file_codec(self, cursor, file_id: int) -> Optional[str]:
+        """Codec for new content of an existing file, chosen by its MIME type."""
+        cursor.execute('SELECT mime_type, name FROM virtual_files WHERE id = ?', (file_id,))
+        row = cursor.fetchone()
+        return self._codec_for(*row) if row else None
+    
+    def _add_chunk(self, cursor, file_id: int, chunk_index: int, data: bytes, codec: Optional[str] = None):
+        """Append one chunk to a chunked file, backed by a deduplicated blob."""
+        blob_hash = self._put_blob(cursor, data, codec=codec)
+        cursor.execute('''
+            INSERT INTO file_chunks 
+            (file_id, chunk_index, blob_hash, chunk_size) 
+            VALUES (?, ?, ?, ?)
+        ''', (file_id, chunk_index, blob_hash, len(data)))
+    
+    def _store_content(self, cursor, file_id: int, content: bytes) -> bool:
+        """
+        Point a file that holds no content yet at blobs for content. Content of
+        CHUNK_SIZE or more is split into chunks, smaller content becomes a single
+        blob and empty content stays inline. Returns whether the file is chunked.
+        """
+        codec = self._file_codec(cursor, file_id)
+        if len(content) >= self.CHUNK_SIZE:
+            for chunk_index, offset in enumerate(range(0, len(content), self.CHUNK_SIZE)):
+                self._add_chunk(cursor, file_id, chunk_index, content[offset:offset + self.CHUNK_SIZE], codec)
+            cursor.execute('''
+                UPDATE virtual_files SET content = NULL, blob_hash = NULL, is_chunked = 1 WHERE id = ?
+            ''', (file_id,))
+            return True
+        
+        if content:
+            cursor.execute('''
+                UPDATE virtual_files SET content = NULL, blob_hash = ?, is_chunked = 0 WHERE id = ?
+            ''', (self._put_blob(cursor, content, codec=codec), file_id))
+        else:
+            cursor.execute('''
+                UPDATE virtual_files SET content = ?, blob_hash = NULL, is_chunked = 0 WHERE id = ?
+            ''', (b'', file_id))
+        return False
+    
+    def _replace_content(self, cursor, file_id: int, content: bytes) -> bool:
+        """Swap a file's content for new content, releasing the blobs it held."""
+        self._release_content(cursor, '?', (file_id,))
+        cursor.execute('DELETE FROM file_chunks WHERE file_id = ?', (file_id,))
+        return self._store_content(cursor, file_id, content)
+    
+    def _release_content(self, cursor, ids_sql: str, params: tuple) -> int:
+        """
+        Drop the blob references held by the files selected by ids_sql and delete
+        blobs that are no longer referenced. The caller deletes the referencing
+        chunk/file rows itself. Returns the number of blobs deleted.
+        """
+        return self._drop_blob_refs(cursor, self._count_blob_refs(cursor, ids_sql, params))
+    
+    def _count_blob_refs(self, cursor, ids_sql: str, params: tuple) -> List[Tuple[str, int]]:
+        """(hash, count) pairs for the blob references held by the files selected by ids_sql."""
+        cursor.execute(f'''
+            SELECT blob_hash, COUNT(*) FROM (
+                SELECT blob_hash FROM file_chunks WHERE file_id IN ({ids_sql})
+                UNION ALL
+                SELECT blob_hash FROM virtual_files WHERE id IN ({ids_sql}) AND blob_hash IS NOT NULL
+            )
+            GROUP BY blob_hash
+        ''', params + params)
+        return cursor.fetchall()
+    
+    def _drop_blob_refs(self, cursor, released: List[Tuple[str, int]]) -> int:
+        """Decrement blob reference counts by (hash, count) pairs and delete blobs that reach zero."""
+        if not released:
+            return 0
+        
+        cursor.executemany('UPDATE blobs SET ref_count = ref_count - ? WHERE hash = ?',
+                           [(count, blob_hash) for blob_hash, count in released])
+        cursor.executemany('DELETE FROM blobs WHERE hash = ? AND ref_count <= 0',
+                           [(blob_hash,) for blob_hash, _ in released])
+        return cursor.rowcount
+    
+    def _recount_blobs(self, cursor) -> int:
+        """Recompute every blob's reference count and delete unreferenced blobs."""
+        cursor.execute('''
+            UPDATE blobs SET ref_count = 
+                (SELECT COUNT(*) FROM file_chunks fc WHERE fc.blob_hash = blobs.hash) +
+                (SELECT COUNT(*) FROM virtual_files vf WHERE vf.blob_hash = blobs.hash) +
+                (SELECT COUNT(*) FROM upload_chunks uc WHERE uc.blob_hash = blobs.hash)
+        ''')
+        cursor.execute('DELETE FROM blobs WHERE ref_count <= 0')
+        return cursor.rowcount
+    
+    def _delete_orphans(self, cursor) -> Tuple[int, int]:
+        """Delete chunk and metadata rows whose file no longer exists."""
+        cursor.execute('''
+            DELETE FROM file_chunks
+            WHERE NOT EXISTS (SELECT 1 FROM virtual_files vf WHERE vf.id = file_chunks.file_id)
+        ''')
+        chunks_deleted = cursor.rowcount
+        
+        cursor.execute('''
+            DELETE FROM file_metadata
+            WHERE NOT EXISTS (SELECT 1 FROM virtual_files vf WHERE vf.id = file_metadata.file_id)
+        ''')
+        metadata_deleted = cursor.rowcount
+        
+        return chunks_deleted, metadata_deleted
+    
+    def _count_missing_blobs(self, cursor) -> int:
+        """
+        Count file and chunk rows whose blob does not exist. Commits touching both
+        databases are atomic per file only, so a crash mid-commit can leave these.
+        """
+        cursor.execute('''
+            SELECT COUNT(*) FROM (
+                SELECT blob_hash FROM file_chunks
+                UNION ALL
+                SELECT blob_hash FROM virtual_files WHERE blob_hash IS NOT NULL
+            ) r
+            WHERE NOT EXISTS (SELECT 1 FROM blobs b WHERE b.hash = r.blob_hash)
+        ''')
+        return cursor.fetchone()[0]
+    
+    def sweep_orphans(self) -> Dict[str, int]:
+        """
+        Remove chunk and metadata rows left behind by files that no longer exist,
+        then garbage-collect blobs whose recomputed reference count is zero.
+        Also reports references to blobs that are missing from the blob database.
+        """
+        try:
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
+                chunks_deleted, metadata_deleted = self._delete_orphans(cursor)
+                blobs_deleted = self._recount_blobs(cursor)
+                if self.search_available:
+                    for table in ('search_names', 'search_content'):
+                        cursor.execute(f'DELETE FROM {table} WHERE rowid NOT IN (SELECT id FROM virtual_files)')
+                missing_blobs = self._count_missing_blobs(cursor)
+                conn.commit()
+            
+            return {'chunks_deleted': chunks_deleted, 'metadata_deleted': metadata_deleted,
+                    'blobs_deleted': blobs_deleted, 'missing_blobs': missing_blobs}
+        except Exception as e:
+            eprint(f"Error sweeping orphaned chunks: {e}")
+            return {'chunks_deleted': 0, 'metadata_deleted': 0, 'blobs_deleted': 0, 'missing_blobs': 0}
+    
+    def _schema_storage_stats(self, conn, schema: str) -> Dict[str, Any]:
+        """Page usage and WAL size of one attached database file."""
+        page_size = conn.execute(f'PRAGMA {schema}.page_size').fetchone()[0]
+        page_count = conn.execute(f'PRAGMA {schema}.page_count').fetchone()[0]
+        freelist_count = conn.execute(f'PRAGMA {schema}.freelist_count').fetchone()[0]
+        auto_vacuum = conn.execute(f'PRAGMA {schema}.auto_vacuum').fetchone()[0]
+        
+        try:
+            wal_size = os.path.getsize(f'{self.databases[schema]}-wal')
+        except OSError:
+            wal_size = 0
+        
+        return {
+            'path': self.databases[schema],
+            'page_size': page_size,
+            'page_count': page_count,
+            'freelist_count': freelist_count,
+            'file_size': page_count * page_size,
+            'used_size': (page_count - freelist_count) * page_size,
+            'free_size': freelist_count * page_size,
+            'auto_vacuum': self.AUTO_VACUUM_MODES[auto_vacuum] if 0 <= auto_vacuum < 3 else auto_vacuum,
+            'wal_size': wal_size
+        }
+    
+    def get_storage_stats(self) -> Dict[str, Any]:
+        """
+        Page usage of the database files: how much of them holds live data, how
+        much is free pages waiting to be vacuumed, and the current size of the WALs.
+        Totals cover the metadata and blob databases; 'databases' has each one.
+        auto_vacuum is 'incremental' only once every database uses it.
+        """
+        with self._connection() as conn:
+            databases = {schema: self._schema_storage_stats(conn, schema) for schema in self.databases}
+        
+        totals = {key: sum(stats[key] for stats in databases.values())
+                  for key in ('page_count', 'freelist_count', 'file_size', 'used_size', 'free_size', 'wal_size')}
+        modes = [stats['auto_vacuum'] for stats in databases.values()]
+        return {
+            'page_size': databases['main']['page_size'],
+            **totals,
+            'free_ratio': round(totals['freelist_count'] / totals['page_count'], 4) if totals['page_count'] else 0.0,
+            'auto_vacuum': next((mode for mode in modes if mode != 'incremental'), 'incremental'),
+            'databases': databases
+        }
+    
+    def incremental_vacuum(self, max_pages: int = 256) -> int:
+        """
+        Return up to max_pages free pages to the filesystem, taking them from the
+        metadata and blob databases in turn, each in one short write transaction.
+        Does nothing for a database whose auto_vacuum is not INCREMENTAL.
+        Must not be called inside a transaction. Returns the number of pages released.
+        """
+        max_pages = max(1, int(max_pages))
+        released = 0
+        with self._connection() as conn:
+            # executescript() below commits whatever is open on this connection first
+            if conn.in_transaction or getattr(self._batch, 'active', False):
+                raise RuntimeError("incremental_vacuum cannot run inside an open transaction")
+            
+            for schema in self.databases:
+                remaining = max_pages - released
+                if remaining <= 0:
+                    break
+                before = conn.execute(f'PRAGMA {schema}.freelist_count').fetchone()[0]
+                if before:
+                    # The pragma frees one page per step and execute() only steps it once;
+                    # executescript runs it to completion
+                    conn.executescript(f'PRAGMA {schema}.incremental_vacuum({remaining});')
+                released += before - conn.execute(f'PRAGMA {schema}.freelist_count').fetchone()[0]
+        return released
+    
+    def enable_incremental_vacuum(self) -> bool:
+        """
+        Switch databases created without auto_vacuum to INCREMENTAL. This needs a
+        full VACUUM, which rewrites the file and blocks writers while it runs, so it
+        is a one-off step for existing installs. Returns True if every database
+        has the mode set.
+        """
+        try:
+            with self._connection() as conn:
+                for schema in self.databases:
+                    if conn.execute(f'PRAGMA {schema}.auto_vacuum').fetchone()[0] == 2:
+                        continue
+                    conn.execute(f'PRAGMA {schema}.auto_vacuum=INCREMENTAL')
+                    conn.execute(f'VACUUM {schema}')
+                return all(conn.execute(f'PRAGMA {schema}.auto_vacuum').fetchone()[0] == 2
+                           for schema in self.databases)
+        except Exception as e:
+            eprint(f"Error enabling incremental vacuum: {e}")
+            return False
+    
+    def checkpoint_wal(self, mode: str = 'PASSIVE', busy_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Copy WAL frames back into the metadata and blob databases. TRUNCATE also
+        resets the WAL files to zero bytes, but has to wait for readers and holds
+        off writers while it does; busy_timeout (seconds) bounds that wait for this
+        call. Returns {'busy', 'wal_pages', 'checkpointed_pages'} summed over both.
+        """
+        mode = mode.upper()
+        if mode not in self.CHECKPOINT_MODES:
+            raise ValueError(f"Unknown checkpoint mode: {mode}")
+        
+        with self._connection() as conn:
+            if busy_timeout is not None:
+                conn.execute(f'PRAGMA busy_timeout={int(busy_timeout * 1000)}')
+            try:
+                busy, wal_pages, checkpointed = 0, 0, 0
+                for schema in self.databases:
+                    result = conn.execute(f'PRAGMA {schema}.wal_checkpoint({mode})').fetchone()
+                    busy, wal_pages, checkpointed = busy or result[0], wal_pages + result[1], checkpointed + result[2]
+            finally:
+                if busy_timeout is not None:
+                    conn.execute(f'PRAGMA busy_timeout={int(self.pool.timeout * 1000)}')
+        
+        return {'busy': bool(busy), 'wal_pages': wal_pages, 'checkpointed_pages': checkpointed}
+    
+    def quick_check(self, max_errors: int = 100) -> List[str]:
+        """
+        Run PRAGMA quick_check (structure checks without the index cross-checks of
+        integrity_check) over the metadata and blob databases. Returns the problems
+        found; an empty list means both are ok.
+        """
+        with self._connection() as conn:
+            rows = conn.execute(f'PRAGMA quick_check({max(1, int(max_errors))})').fetchall()
+        problems = [row[0] for row in rows]
+        return [] if problems == ['ok'] else problems
+    
+    def create_upload_session(self, path: str, total_size: int, expected_hash: Optional[str] = None,
+                              mime_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Start a resumable upload of total_size bytes to path. The file is sent as
+        CHUNK_SIZE chunks through put_upload_chunk, in any order and in parallel,
+        and created by commit_upload_session. Raises ValueError if the upload
+        cannot target path.
+        """
+        normalized_path = self._normalize_path(path)
+        parent_path = self._get_parent_path(normalized_path) or '/'
+        
+        if normalized_path == '/':
+            raise ValueError('Cannot upload to the root directory')
+        if total_size < 0:
+            raise ValueError('size must be a non-negative integer')
+        if expected_hash is not None:
+            expected_hash = expected_hash.lower()
+            if len(expected_hash) != 64 or any(c not in '0123456789abcdef' for c in expected_hash):
+                raise ValueError('sha256 must be a hex-encoded SHA-256 digest')
+        
+        try:
+            with self._write_transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT 1 FROM virtual_files WHERE path = ?', (normalized_path,))
+                if cursor.fetchone():
+                    raise ValueError(f'Path {normalized_path} already exists')
+                cursor.execute('SELECT 1 FROM virtual_files WHERE path = ? AND is_directory = 1', (parent_path,))
+                if not cursor.fetchone():
+                    raise ValueError(f'Parent directory {parent_path} does not exist')
+                
+                # Fail before any chunk is sent if the finished file could not fit
+                self._check_quotas(cursor, self._ancestors(normalized_path), total_size, 1)
+                
+                expired = self._discard_upload_sessions(
+                    cursor, "updated_at < datetime('now', ?)", (f'-{self.UPLOAD_SESSION_TTL_HOURS} hours',))
+                if expired:
+                    print(f"🧹 Discarded {expired} expired upload sessions")
+                
+                session_id = uuid.uuid4().hex
+                chunk_count = (total_size + self.CHUNK_SIZE - 1) // self.CHUNK_SIZE
+                cursor.execute('''
+                    INSERT INTO upload_sessions 
+                    (id, path, total_size, chunk_size, chunk_count, expected_hash, mime_type) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (session_id, normalized_path, total_size, self.CHUNK_SIZE, chunk_count, expected_hash, mime_type))
+                conn.commit()
+            
+            print(f"📤 Upload session {session_id}: {normalized_path}, {total_size} bytes in {chunk_count} chunks")
+            return self.get_upload_session(session_id)
+        except ValueError:
+            raise
+        except Exception as e:
+            eprint(f"Error creating upload session for {path}: {e}")
+            return None
+    
+    def get_upload_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get an upload session with the chunks received so far, or None if it does not exist."""
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT path, total_size, chunk_size, chunk_count, expected_hash, mime_type, created_at, updated_at
+                    FROM upload_sessions WHERE id = ?
+                ''', (session_id,))
+                
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                
+                path, total_size, chunk_size, chunk_count, expected_hash, mime_type, created_at, updated_at = row
+                cursor.execute('''
+                    SELECT chunk_index, chunk_size FROM upload_chunks 
+                    WHERE session_id = ? ORDER BY chunk_index
+                ''', (session_id,))
+                received = cursor.fetchall()
+            
+            received_indexes = [index for index, _ in received]
+            received_set = set(received_indexes)
+            return {
+                'session_id': session_id,
+                'path': path,
+                'size': total_size,
+                'chunk_size': chunk_size,
+                'chunk_count': chunk_count,
+                'expected_hash': expected_hash,
+                'mime_type': mime_type,
+                'received_chunks': received_indexes,
+                'missing_chunks': [index for index in range(chunk_count) if index not in received_set],
+                'bytes_received': sum(size for _, size in received),
+                'created_at': created_at,
+                'updated_at': updated_at
+            }
+        except Exception as e:
+            eprint(f"Error getting upload session {session_id}: {e}")
+            return None
+    
+    def put_upload_chunk(self, session_id: str, chunk_index: int, data: bytes,
+                         expected_chunk_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Store one chunk of an upload session, replacing any earlier copy of it.
+        Runs in its own short transaction without the VFS lock so chunks can be
+        uploaded in parallel. Returns None if the session does not exist and
+        raises ValueError if the chunk does not fit the session.
+        """
+        # Hash before touching the database so the write transaction stays short
+        chunk_hash = hashlib.sha256(data).hexdigest()
+        if expected_chunk_hash and expected_chunk_hash.lower() != chunk_hash:
+            raise ValueError(f'Chunk {chunk_index} hash mismatch (received {chunk_hash})')
+        
+        with self._write_transaction() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT is_directory FROM virtual_files WHERE path = ?', (path,))
-            result = cursor.fetchone()
-            return result[0] if result else False
-    
-    def _get_all_children(self, path: str) -> List[str]:
-        """Get all children of a directory recursively."""
-        children = []
-        with sqlite3.connect(self.db_path) as conn:
+            
+            # BEGIN IMMEDIATE takes SQLite's write lock up front, so a concurrent
+            # commit/abort cannot remove the session between the checks and the insert
+            cursor.execute('''
+                UPDATE upload_sessions SET updated_at = CURRENT_TIMESTAMP WHERE id = ?
+            ''', (session_id,))
+            if cursor.rowcount == 0:
+                return None
+            
+            cursor.execute('''
+                SELECT total_size, chunk_size, chunk_count, path, mime_type FROM upload_sessions WHERE id = ?
+            ''', (session_id,))
+            total_size, chunk_size, chunk_count, path, mime_type = cursor.fetchone()
+            
+            if not 0 <= chunk_index < chunk_count:
+                raise ValueError(f'Chunk index {chunk_index} is outside 0..{chunk_count - 1}')
+            expected_size = chunk_size if chunk_index < chunk_count - 1 else total_size - chunk_size * (chunk_count - 1)
+            if len(data) != expected_size:
+                raise ValueError(f'Chunk {chunk_index} must be {expected_size} bytes, got {len(data)}')
+            
+            cursor.execute('''
+                SELECT blob_hash FROM upload_chunks WHERE session_id = ? AND chunk_index = ?
+            ''', (session_id, chunk_index))
+            previous = cursor.fetchone()
+            
+            self._put_blob(cursor, data, chunk_hash, self._codec_for(mime_type, self._get_name_from_path(path)))
+            cursor.execute('''
+                INSERT OR REPLACE INTO upload_chunks 
+                (session_id, chunk_index, blob_hash, chunk_size) 
+                VALUES (?, ?, ?, ?)
+            ''', (session_id, chunk_index, chunk_hash, len(data)))
+            if previous:
+                self._drop_blob_refs(cursor, [(previous[0], 1)])
+            
+            conn.commit()
+        
+        return {'chunk_index': chunk_index, 'size': len(data), 'hash': chunk_hash}
+    
+    def commit_upload_session(self, session_id: str, expected_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Create the session's file from its uploaded chunks. Chunk blob references
+        move to the file without copying data. Returns the new file's info, None
+        if the session does not exist, and raises ValueError if chunks are missing,
+        the content hash does not match or the target path is no longer free.
+        """
+        session = self.get_upload_session(session_id)
+        if not session:
+            return None
+        if session['missing_chunks']:
+            raise ValueError(f"Upload is missing {len(session['missing_chunks'])} of {session['chunk_count']} chunks")
+        
+        expected_hash = (expected_hash or session['expected_hash'] or '').lower() or None
+        normalized_path = session['path']
+        
+        # Verify the assembled content before taking the path lock
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                WITH RECURSIVE children AS (
-                    SELECT path FROM virtual_files WHERE parent_path = ?
-                    UNION ALL
-                    SELECT vf.path FROM virtual_files vf
-                    INNER JOIN children c ON vf.parent_path = c.path
-                )
-                SELECT path FROM children
-            ''', (path,))
+                SELECT blob_hash FROM upload_chunks WHERE session_id = ? ORDER BY chunk_index
+            ''', (session_id,))
+            chunk_hashes = [row[0] for row in cursor.fetchall()]
+            content_hash = self._hash_blobs(cursor, chunk_hashes)
+        
+        if expected_hash and content_hash != expected_hash:
+            raise ValueError(f'Upload hash mismatch: expected {expected_hash}, got {content_hash}')
+        
+        with self._path_lock(normalized_path):
+            self._finish_upload(session_id, normalized_path, session['size'], session['mime_type'],
+                                chunk_hashes, content_hash)
+        
+        print(f"✅ Upload session {session_id} committed: {normalized_path} ({session['size']} bytes)")
+        return self.get_file_info(normalized_path)
+    
+    def _finish_upload(self, session_id: str, normalized_path: str, total_size: int, mime_type: Optional[str],
+                       chunk_hashes: List[str], content_hash: str):
+        """
+        Create a file from an upload session's verified chunks in one short write
+        transaction. Chunk blob references move to the file without copying data.
+        Raises ValueError if the chunks changed or the target path is no longer free.
+        """
+        parent_path = self._get_parent_path(normalized_path) or '/'
+        name = self._get_name_from_path(normalized_path)
+        if not mime_type:
+            mime_type, _ = mimetypes.guess_type(name)
+            if not mime_type:
+                mime_type = 'application/octet-stream'
+        
+        with self._write_transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Chunks re-sent while hashing would invalidate the verified hash
+            cursor.execute('''
+                SELECT blob_hash FROM upload_chunks WHERE session_id = ? ORDER BY chunk_index
+            ''', (session_id,))
+            if [row[0] for row in cursor.fetchall()] != chunk_hashes:
+                raise ValueError('Upload chunks changed during commit')
+            
+            cursor.execute('SELECT 1 FROM virtual_files WHERE path = ?', (normalized_path,))
+            if cursor.fetchone():
+                raise ValueError(f'Path {normalized_path} already exists')
+            cursor.execute('SELECT 1 FROM virtual_files WHERE path = ? AND is_directory = 1', (parent_path,))
+            if not cursor.fetchone():
+                raise ValueError(f'Parent directory {parent_path} does not exist')
+            
+            cursor.execute('''
+                INSERT INTO virtual_files 
+                (path, name, parent_path, is_directory, size, mime_type, hash) 
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (normalized_path, name, parent_path, False, total_size, mime_type, content_hash))
+            file_id = cursor.lastrowid
+            self._adjust_usage(cursor, normalized_path, size=total_size, files=1)
+            
+            if total_size >= self.CHUNK_SIZE:
+                cursor.execute('''
+                    INSERT INTO file_chunks (file_id, chunk_index, blob_hash, chunk_size)
+                    SELECT ?, chunk_index, blob_hash, chunk_size FROM upload_chunks WHERE session_id = ?
+                ''', (file_id, session_id))
+                cursor.execute('UPDATE virtual_files SET is_chunked = 1 WHERE id = ?', (file_id,))
+            elif chunk_hashes:
+                cursor.execute('''
+                    UPDATE virtual_files SET blob_hash = ?, is_chunked = 0 WHERE id = ?
+                ''', (chunk_hashes[0], file_id))
+            else:
+                cursor.execute('''
+                    UPDATE virtual_files SET content = ?, is_chunked = 0 WHERE id = ?
+                ''', (b'', file_id))
             
-            for row in cursor.fetchall():
-                children.append(row[0])
+            self._index_paths(cursor, '?', (file_id,))
+            self._index_content(cursor, file_id)
+            
+            # The file now owns the chunk references
+            cursor.execute('DELETE FROM upload_chunks WHERE session_id = ?', (session_id,))
+            cursor.execute('DELETE FROM upload_sessions WHERE id = ?', (session_id,))
+            conn.commit()
         
-        return children
+        self._emit_change('create', normalized_path, hash=content_hash, size=total_size)
     
-    def _delete_single_path(self, path: str) -> bool:
-        """Delete a single path from the database."""
+    def abort_upload_session(self, session_id: str) -> bool:
+        """Discard an upload session and release the chunks it holds."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._write_transaction() as conn:
                 cursor = conn.cursor()
-                cursor.execute('DELETE FROM virtual_files WHERE path = ?', (path,))
+                discarded = self._discard_upload_sessions(cursor, 'id = ?', (session_id,))
                 conn.commit()
-            return cursor.rowcount > 0
+            return discarded > 0
         except Exception as e:
-            eprint(f"Error deleting single path {path}: {e}")
+            eprint(f"Error aborting upload session {session_id}: {e}")
             return False
     
+    def _discard_upload_sessions(self, cursor, where_sql: str, params: tuple) -> int:
+        """Delete the upload sessions matching where_sql and drop their chunk blob references."""
+        sessions_sql = f'SELECT id FROM upload_sessions WHERE {where_sql}'
+        cursor.execute(f'''
+            SELECT blob_hash, COUNT(*) FROM upload_chunks 
+            WHERE session_id IN ({sessions_sql})
+            GROUP BY blob_hash
+        ''', params)
+        released = cursor.fetchall()
+        
+        cursor.execute(f'DELETE FROM upload_chunks WHERE session_id IN ({sessions_sql})', params)
+        cursor.execute(f'DELETE FROM upload_sessions WHERE {where_sql}', params)
+        discarded = cursor.rowcount
+        
+        self._drop_blob_refs(cursor, released)
+        return discarded
+    
     def get_file_info(self, path: str) -> Optional[Dict[str, Any]]:
         """Get file information without reading content."""
         try:
             normalized_path = self._normalize_path(path)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT path, name, parent_path, is_directory, size, mime_type, hash, created_at, updated_at, accessed_at
@@ -856,128 +3147,1048 @@ class VirtualFileManager:
             return None
     
     def get_directory_size(self, path: str) -> int:
-        """Calculate the total size of a directory and its contents."""
+        """Get the total size of a directory's contents from its usage counters."""
+        usage = self.get_usage(path)
+        return usage['size'] if usage else 0
+    
+    def get_usage(self, path: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the size, file count and directory count of everything below a
+        directory, read from counters kept on its row, plus the quota that applies
+        to it if there is one. Returns None if path is not a directory.
+        """
         try:
             normalized_path = self._normalize_path(path)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    WITH RECURSIVE children AS (
-                        SELECT path, size FROM virtual_files WHERE parent_path = ?
-                        UNION ALL
-                        SELECT vf.path, vf.size FROM virtual_files vf
-                        INNER JOIN children c ON vf.parent_path = c.path
-                    )
-                    SELECT COALESCE(SUM(size), 0) FROM children WHERE size IS NOT NULL
+                    SELECT subtree_size, subtree_files, subtree_dirs FROM virtual_files
+                    WHERE path = ? AND is_directory = 1
                 ''', (normalized_path,))
+                row = cursor.fetchone()
+            
+            if not row:
+                return None
+            
+            usage = {'path': normalized_path, 'size': row[0], 'files': row[1], 'directories': row[2],
+                     'quota': None}
+            if normalized_path in self._quotas:
+                max_bytes, max_items = self._quotas[normalized_path]
+                usage['quota'] = {'max_bytes': max_bytes, 'max_items': max_items}
+            return usage
+        except Exception as e:
+            eprint(f"Error getting usage of {path}: {e}")
+            return None
+    
+    def get_quotas(self) -> List[Dict[str, Any]]:
+        """List every quota with the current usage of its directory."""
+        quotas = []
+        for path in sorted(self._quotas):
+            max_bytes, max_items = self._quotas[path]
+            usage = self.get_usage(path)
+            quotas.append({
+                'path': path,
+                'max_bytes': max_bytes,
+                'max_items': max_items,
+                'used_bytes': usage['size'] if usage else 0,
+                'used_items': usage['files'] + usage['directories'] if usage else 0
+            })
+        return quotas
+    
+    def set_quota(self, path: str, max_bytes: Optional[int] = None, max_items: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Limit the total size (max_bytes) and/or number of files and directories
+        (max_items) below path, such as a top-level tree or an app's directory.
+        The directory does not have to exist yet. Limits apply to later writes;
+        content already stored is never removed. Raises ValueError for bad limits.
+        """
+        normalized_path = self._normalize_path(path)
+        if normalized_path == '/':
+            raise ValueError('Quotas apply to directories below the root')
+        if max_bytes is None and max_items is None:
+            raise ValueError('max_bytes or max_items is required')
+        for name, value in (('max_bytes', max_bytes), ('max_items', max_items)):
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+                raise ValueError(f'{name} must be a non-negative integer')
+        
+        with self._write_transaction() as conn:
+            conn.execute('''
+                INSERT INTO quotas (path, max_bytes, max_items) VALUES (?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET max_bytes = excluded.max_bytes, max_items = excluded.max_items
+            ''', (normalized_path, max_bytes, max_items))
+            conn.commit()
+        
+        self._quotas[normalized_path] = (max_bytes, max_items)
+        print(f"Set quota on {normalized_path}: max_bytes={max_bytes}, max_items={max_items}")
+        return {'path': normalized_path, 'max_bytes': max_bytes, 'max_items': max_items}
+    
+    def remove_quota(self, path: str) -> bool:
+        """Remove the quota on path. Returns False if it had none."""
+        normalized_path = self._normalize_path(path)
+        with self._write_transaction() as conn:
+            cursor = conn.execute('DELETE FROM quotas WHERE path = ?', (normalized_path,))
+            conn.commit()
+        self._quotas.pop(normalized_path, None)
+        return cursor.rowcount > 0
+    
+    def _ancestors(self, path: str) -> List[str]:
+        """Every directory above path, from the root down."""
+        if path == '/':
+            return []
+        parts = path.strip('/').split('/')[:-1]
+        return ['/'] + ['/' + '/'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+    
+    def _subtree_usage(self, cursor, path: str) -> Tuple[int, int, int]:
+        """(size, files, directories) of path itself plus everything below it."""
+        cursor.execute('''
+            SELECT is_directory, size, subtree_size, subtree_files, subtree_dirs
+            FROM virtual_files WHERE path = ?
+        ''', (path,))
+        row = cursor.fetchone()
+        if not row:
+            return 0, 0, 0
+        is_directory, size, subtree_size, subtree_files, subtree_dirs = row
+        if is_directory:
+            return subtree_size or 0, subtree_files or 0, (subtree_dirs or 0) + 1
+        return size or 0, 1, 0
+    
+    def _adjust_usage(self, cursor, path: str, size: int = 0, files: int = 0, directories: int = 0,
+                      check_self: bool = False):
+        """
+        Add to the usage counters of every directory above path inside the caller's
+        transaction, then enforce the quotas of those directories (and of path
+        itself with check_self, for subtrees moved or copied onto a quota path).
+        Raises QuotaExceededError, leaving the transaction to be rolled back.
+        """
+        if not (size or files or directories):
+            return
+        
+        ancestors = self._ancestors(path)
+        self._add_usage(cursor, ancestors, size, files, directories)
+        
+        # Shrinking never breaks a quota, even one that is already exceeded
+        if size > 0 or files > 0 or directories > 0:
+            self._check_quotas(cursor, ancestors + [path] if check_self else ancestors)
+    
+    def _move_usage(self, cursor, old_path: str, new_path: str, usage: Tuple[int, int, int]):
+        """
+        Move a subtree's usage from the directories above old_path to those above
+        new_path. Directories above both keep their counters (and their quotas are
+        not re-checked), so moves inside a tree that is over quota still work.
+        """
+        old_ancestors = self._ancestors(old_path)
+        new_ancestors = self._ancestors(new_path)
+        shared = set(old_ancestors) & set(new_ancestors)
+        size, files, directories = usage
+        
+        self._add_usage(cursor, [path for path in old_ancestors if path not in shared],
+                        -size, -files, -directories)
+        gained = [path for path in new_ancestors if path not in shared]
+        self._add_usage(cursor, gained, size, files, directories)
+        self._check_quotas(cursor, gained + [new_path])
+    
+    def _add_usage(self, cursor, directories: List[str], size: int, files: int, subdirectories: int):
+        """Add to the usage counters of the given directories."""
+        if not directories or not (size or files or subdirectories):
+            return
+        cursor.execute(f'''
+            UPDATE virtual_files 
+            SET subtree_size = subtree_size + ?, subtree_files = subtree_files + ?, 
+                subtree_dirs = subtree_dirs + ?
+            WHERE path IN ({', '.join('?' * len(directories))})
+        ''', (size, files, subdirectories, *directories))
+    
+    def _check_quotas(self, cursor, paths: List[str], extra_size: int = 0, extra_items: int = 0):
+        """Raise QuotaExceededError if any quota among paths is over its limits (plus the extra usage)."""
+        limited = [path for path in paths if path in self._quotas]
+        if not limited:
+            return
+        
+        cursor.execute(f'''
+            SELECT path, subtree_size, subtree_files + subtree_dirs FROM virtual_files
+            WHERE path IN ({', '.join('?' * len(limited))}) AND is_directory = 1
+        ''', limited)
+        for quota_path, used_size, used_items in cursor.fetchall():
+            max_bytes, max_items = self._quotas[quota_path]
+            if max_bytes is not None and used_size + extra_size > max_bytes:
+                raise QuotaExceededError(quota_path, f'Quota exceeded on {quota_path}: '
+                                         f'{used_size + extra_size} of {max_bytes} bytes')
+            if max_items is not None and used_items + extra_items > max_items:
+                raise QuotaExceededError(quota_path, f'Quota exceeded on {quota_path}: '
+                                         f'{used_items + extra_items} of {max_items} items')
+    
+    def list_subtree(self, path: str, files_only: bool = False, min_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        List every descendant of a directory with a single path range scan.
+        
+        Args:
+            path: Directory whose subtree should be listed
+            files_only: Skip directories
+            min_size: Only include entries at least this many bytes
+            
+        Returns:
+            List of {path, name, parent_path, is_directory, size, updated_at} dicts ordered by path
+        """
+        try:
+            normalized_path = self._normalize_path(path)
+            conditions = ['path >= ? AND path < ? AND path != ?']
+            params = list(self._subtree_range(normalized_path)) + [normalized_path]
+            
+            if files_only:
+                conditions.append('is_directory = 0')
+            if min_size is not None:
+                conditions.append('size >= ?')
+                params.append(min_size)
+            
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT path, name, parent_path, is_directory, size, updated_at
+                    FROM virtual_files
+                    WHERE {' AND '.join(conditions)}
+                    ORDER BY path
+                ''', params)
                 
-                result = cursor.fetchone()
-                return result[0] if result else 0
+                return [{
+                    'path': row[0],
+                    'name': row[1],
+                    'parent_path': row[2],
+                    'is_directory': bool(row[3]),
+                    'size': row[4],
+                    'updated_at': row[5]
+                } for row in cursor.fetchall()]
         except Exception as e:
-            eprint(f"Error calculating directory size {path}: {e}")
-            return 0
+            eprint(f"Error listing subtree {path}: {e}")
+            return []
     
     def rename_path(self, old_path: str, new_path: str) -> bool:
         """
         Rename a file or directory by updating its path in the database.
         This is more efficient than copy-then-delete for large files/directories.
         """
+        return self.rename_path_with_stats(old_path, new_path) is not None
+    
+    def rename_path_with_stats(self, old_path: str, new_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Rename a file or directory and return rowcount/timing stats, or None on failure.
+        A directory's descendants are rewritten by prefix replacement in a single UPDATE.
+        """
         try:
+            started = time.perf_counter()
             old_normalized = self._normalize_path(old_path)
             new_normalized = self._normalize_path(new_path)
             
             print(f"VFS Rename: {old_normalized} -> {new_normalized}")
             
-            # Check if source exists
-            if not self._path_exists(old_normalized):
-                print(f"Rename failed: source path {old_normalized} does not exist")
-                return False
+            if old_normalized == '/':
+                print("Rename failed: cannot rename the root directory")
+                return None
             
-            # Check if destination already exists
-            if self._path_exists(new_normalized):
-                print(f"Rename failed: destination path {new_normalized} already exists")
-                return False
+            # A directory cannot be moved into its own subtree
+            if new_normalized.startswith(old_normalized + '/'):
+                print(f"Rename failed: {new_normalized} is inside {old_normalized}")
+                return None
             
             # Get new parent path and name
             new_parent_path = self._get_parent_path(new_normalized)
             new_name = self._get_name_from_path(new_normalized)
             
-            # Ensure parent directory exists
-            if new_parent_path != '/' and not self._path_exists(new_parent_path):
-                print(f"Rename failed: parent directory {new_parent_path} does not exist")
-                return False
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Check if this is a directory - if so, we need to update all children paths too
-                cursor.execute('SELECT is_directory FROM virtual_files WHERE path = ?', (old_normalized,))
-                result = cursor.fetchone()
-                is_directory = bool(result[0]) if result else False
-                
-                if is_directory:
-                    print(f"Renaming directory and all children...")
+            with self._path_lock(old_normalized, new_normalized):
+                with self._write_transaction() as conn:
+                    cursor = conn.cursor()
                     
-                    # Get all files/directories that need to be updated
-                    cursor.execute('''
-                        SELECT path FROM virtual_files 
-                        WHERE path = ? OR path LIKE ?
-                        ORDER BY LENGTH(path) DESC
-                    ''', (old_normalized, old_normalized + '/%'))
+                    # Check if source exists
+                    cursor.execute('SELECT is_directory FROM virtual_files WHERE path = ?', (old_normalized,))
+                    result = cursor.fetchone()
+                    if not result:
+                        print(f"Rename failed: source path {old_normalized} does not exist")
+                        return None
+                    is_directory = bool(result[0])
                     
-                    paths_to_update = cursor.fetchall()
-                    print(f"Found {len(paths_to_update)} items to update")
+                    # Check if destination already exists
+                    cursor.execute('SELECT 1 FROM virtual_files WHERE path = ?', (new_normalized,))
+                    if cursor.fetchone():
+                        print(f"Rename failed: destination path {new_normalized} already exists")
+                        return None
+                    
+                    # Ensure parent directory exists
+                    if new_parent_path != '/':
+                        cursor.execute('SELECT 1 FROM virtual_files WHERE path = ? AND is_directory = 1',
+                                       (new_parent_path,))
+                        if not cursor.fetchone():
+                            print(f"Rename failed: parent directory {new_parent_path} does not exist")
+                            return None
+                    
+                    updated_at = datetime.now().isoformat()
+                    usage = self._subtree_usage(cursor, old_normalized)
                     
-                    # Update each path
-                    for (path_to_update,) in paths_to_update:
-                        if path_to_update == old_normalized:
-                            # This is the directory itself
-                            new_item_path = new_normalized
-                            new_item_parent = new_parent_path
-                            new_item_name = new_name
-                        else:
-                            # This is a child - replace the old prefix with the new prefix
-                            relative_part = path_to_update[len(old_normalized):]  # Get the part after old path
-                            new_item_path = new_normalized + relative_part
-                            new_item_parent = self._get_parent_path(new_item_path)
-                            new_item_name = self._get_name_from_path(new_item_path)
-                        
-                        print(f"Updating: {path_to_update} -> {new_item_path}")
-                        
-                        cursor.execute('''
-                            UPDATE virtual_files 
-                            SET path = ?, name = ?, parent_path = ?, updated_at = ?
-                            WHERE path = ?
-                        ''', (new_item_path, new_item_name, new_item_parent, datetime.now().isoformat(), path_to_update))
-                else:
-                    print(f"Renaming single file...")
-                    # Just update the single file
                     cursor.execute('''
                         UPDATE virtual_files 
                         SET path = ?, name = ?, parent_path = ?, updated_at = ?
                         WHERE path = ?
-                    ''', (new_normalized, new_name, new_parent_path, datetime.now().isoformat(), old_normalized))
-                
-                # Check if any rows were affected
-                if cursor.rowcount == 0:
-                    print(f"Rename failed: no rows updated for path {old_normalized}")
-                    return False
+                    ''', (new_normalized, new_name, new_parent_path, updated_at, old_normalized))
+                    
+                    # Check if any rows were affected
+                    if cursor.rowcount == 0:
+                        print(f"Rename failed: no rows updated for path {old_normalized}")
+                        return None
+                    
+                    descendants = 0
+                    if is_directory:
+                        # Names are unchanged below the renamed directory, only the prefix of
+                        # path and parent_path moves. Every descendant's parent_path lies inside
+                        # the subtree too, so the same substr offset applies to both columns.
+                        offset = len(old_normalized) + 1
+                        cursor.execute('''
+                            UPDATE virtual_files 
+                            SET path = ? || substr(path, ?),
+                                parent_path = ? || substr(parent_path, ?),
+                                updated_at = ?
+                            WHERE path >= ? AND path < ?
+                        ''', (new_normalized, offset, new_normalized, offset, updated_at)
+                             + self._subtree_range(old_normalized))
+                        descendants = cursor.rowcount
+                    
+                    self._move_usage(cursor, old_normalized, new_normalized, usage)
+                    self._index_paths(cursor, self._SUBTREE_IDS_SQL,
+                                      (new_normalized,) + self._subtree_range(new_normalized))
+                    conn.commit()
                 
-                conn.commit()
-                print(f"Successfully renamed {old_normalized} to {new_normalized} ({cursor.rowcount} total updates)")
-                return True
+                self.cache.invalidate(old_normalized, subtree=True)
+                self._emit_change('rename', new_normalized, is_directory=is_directory, old_path=old_normalized)
+            
+            stats = {
+                'old_path': old_normalized,
+                'new_path': new_normalized,
+                'is_directory': is_directory,
+                'rows_updated': 1 + descendants,
+                'descendants_updated': descendants,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3)
+            }
+            print(f"Successfully renamed {old_normalized} to {new_normalized} "
+                  f"({stats['rows_updated']} rows in {stats['duration_ms']}ms)")
+            return stats
                 
+        except QuotaExceededError:
+            raise
         except Exception as e:
             eprint(f"Error renaming {old_path} to {new_path}: {e}")
             import traceback
             traceback.print_exc()
-            return False
+            return None
+    
+    def copy_path(self, source_path: str, destination_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Copy a file or directory subtree and return rowcount/timing stats, or None on failure.
+        
+        Rows are duplicated with INSERT ... SELECT and copies share the source's
+        blobs (only reference counts change), so no content passes through Python.
+        """
+        try:
+            started = time.perf_counter()
+            source_normalized = self._normalize_path(source_path)
+            destination_normalized = self._normalize_path(destination_path)
+            
+            print(f"VFS Copy: {source_normalized} -> {destination_normalized}")
+            
+            if source_normalized == '/':
+                print("Copy failed: cannot copy the root directory")
+                return None
+            
+            # A directory cannot be copied into its own subtree
+            if destination_normalized == source_normalized or destination_normalized.startswith(source_normalized + '/'):
+                print(f"Copy failed: {destination_normalized} is inside {source_normalized}")
+                return None
+            
+            destination_parent = self._get_parent_path(destination_normalized)
+            destination_name = self._get_name_from_path(destination_normalized)
+            subtree_params = (source_normalized,) + self._subtree_range(source_normalized)
+            
+            # Maps a source path onto the destination (params: destination, len(source) + 1)
+            mapped_path = '? || substr(src.path, ?)'
+            offset = len(source_normalized) + 1
+            
+            with self._path_lock(source_normalized, destination_normalized):
+                with self._write_transaction() as conn:
+                    cursor = conn.cursor()
+                    
+                    # Check if source exists
+                    cursor.execute('SELECT is_directory FROM virtual_files WHERE path = ?', (source_normalized,))
+                    result = cursor.fetchone()
+                    if not result:
+                        print(f"Copy failed: source path {source_normalized} does not exist")
+                        return None
+                    is_directory = bool(result[0])
+                    
+                    # Check if destination already exists
+                    cursor.execute('SELECT 1 FROM virtual_files WHERE path = ?', (destination_normalized,))
+                    if cursor.fetchone():
+                        print(f"Copy failed: destination path {destination_normalized} already exists")
+                        return None
+                    
+                    # Ensure parent directory exists
+                    cursor.execute('SELECT 1 FROM virtual_files WHERE path = ? AND is_directory = 1',
+                                   (destination_parent,))
+                    if not cursor.fetchone():
+                        print(f"Copy failed: parent directory {destination_parent} does not exist")
+                        return None
+                    
+                    # The copied item itself gets a new name and parent
+                    cursor.execute('''
+                        INSERT INTO virtual_files 
+                        (path, name, parent_path, is_directory, size, content, mime_type, hash, is_chunked, blob_hash,
+                         subtree_size, subtree_files, subtree_dirs) 
+                        SELECT ?, ?, ?, is_directory, size, content, mime_type, hash, is_chunked, blob_hash,
+                               subtree_size, subtree_files, subtree_dirs
+                        FROM virtual_files WHERE path = ?
+                    ''', (destination_normalized, destination_name, destination_parent, source_normalized))
+                    items_copied = cursor.rowcount
+                    self._adjust_usage(cursor, destination_normalized,
+                                       *self._subtree_usage(cursor, source_normalized), check_self=True)
+                    
+                    # Descendants keep their names; path and parent_path move to the new prefix
+                    if is_directory:
+                        cursor.execute(f'''
+                            INSERT INTO virtual_files 
+                            (path, name, parent_path, is_directory, size, content, mime_type, hash, is_chunked, blob_hash,
+                             subtree_size, subtree_files, subtree_dirs) 
+                            SELECT {mapped_path}, src.name, ? || substr(src.parent_path, ?), src.is_directory, src.size,
+                                   src.content, src.mime_type, src.hash, src.is_chunked, src.blob_hash,
+                                   src.subtree_size, src.subtree_files, src.subtree_dirs
+                            FROM virtual_files src
+                            WHERE src.path >= ? AND src.path < ?
+                        ''', (destination_normalized, offset, destination_normalized, offset)
+                             + self._subtree_range(source_normalized))
+                        items_copied += cursor.rowcount
+                    
+                    cursor.execute(f'''
+                        INSERT INTO file_chunks (file_id, chunk_index, blob_hash, chunk_size)
+                        SELECT dst.id, fc.chunk_index, fc.blob_hash, fc.chunk_size
+                        FROM file_chunks fc
+                        JOIN virtual_files src ON src.id = fc.file_id
+                        JOIN virtual_files dst ON dst.path = {mapped_path}
+                        WHERE src.path = ? OR (src.path >= ? AND src.path < ?)
+                    ''', (destination_normalized, offset) + subtree_params)
+                    chunks_copied = cursor.rowcount
+                    
+                    cursor.execute(f'''
+                        INSERT INTO file_metadata (file_id, key, value)
+                        SELECT dst.id, fm.key, fm.value
+                        FROM file_metadata fm
+                        JOIN virtual_files src ON src.id = fm.file_id
+                        JOIN virtual_files dst ON dst.path = {mapped_path}
+                        WHERE src.path = ? OR (src.path >= ? AND src.path < ?)
+                    ''', (destination_normalized, offset) + subtree_params)
+                    
+                    destination_params = (destination_normalized,) + self._subtree_range(destination_normalized)
+                    self._index_paths(cursor, self._SUBTREE_IDS_SQL, destination_params)
+                    if self.search_available:
+                        cursor.execute(f'''
+                            INSERT INTO search_content (rowid, content)
+                            SELECT dst.id, sc.content
+                            FROM search_content sc
+                            JOIN virtual_files src ON src.id = sc.rowid
+                            JOIN virtual_files dst ON dst.path = {mapped_path}
+                            WHERE src.path = ? OR (src.path >= ? AND src.path < ?)
+                        ''', (destination_normalized, offset) + subtree_params)
+                    
+                    # The copies now share every blob the source subtree references
+                    shared = self._count_blob_refs(cursor, self._SUBTREE_IDS_SQL, subtree_params)
+                    cursor.executemany('UPDATE blobs SET ref_count = ref_count + ? WHERE hash = ?',
+                                       [(count, blob_hash) for blob_hash, count in shared])
+                    
+                    conn.commit()
+            
+            stats = {
+                'source_path': source_normalized,
+                'destination_path': destination_normalized,
+                'is_directory': is_directory,
+                'items_copied': items_copied,
+                'chunks_copied': chunks_copied,
+                'blobs_shared': len(shared),
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3)
+            }
+            print(f"Successfully copied {source_normalized} to {destination_normalized} "
+                  f"({items_copied} items, {chunks_copied} chunks in {stats['duration_ms']}ms)")
+            self._emit_change('create', destination_normalized, is_directory=is_directory,
+                              items=items_copied, copied_from=source_normalized)
+            return stats
+                
+        except QuotaExceededError:
+            raise
+        except Exception as e:
+            eprint(f"Error copying {source_path} to {destination_path}: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+    
+    def apply_batch(self, operations: List[Dict[str, Any]], atomic: bool = True) -> Dict[str, Any]:
+        """
+        Apply many mkdir/create/write/delete/rename operations in a single write
+        transaction and return a result for each one.
+        
+        Operations are dicts with an 'op' (see BATCH_OPERATIONS) and a 'path';
+        create/write take 'content' bytes (create also an optional 'mime_type') and
+        rename takes 'new_path'. Each operation runs in its own savepoint. With
+        atomic=True the first failure rolls the whole batch back and the remaining
+        operations are skipped; otherwise only the failed operation is undone.
+        """
+        started = time.perf_counter()
+        results = []
+        committed = False
+        failed = False
+        
+        # All path locks are taken before the transaction starts, in the same
+        # lock -> transaction order the single-operation writers use
+        paths = [operation.get(key) for operation in operations
+                 for key in ('path', 'new_path') if isinstance(operation.get(key), str)]
+        
+        try:
+            with self._path_lock(*paths):
+                with self._write_transaction() as conn:
+                    self._batch.active = True
+                    self._batch.events = []
+                    try:
+                        for index, operation in enumerate(operations):
+                            if atomic and failed:
+                                results.append({'index': index, 'op': operation.get('op'),
+                                                'path': operation.get('path'), 'success': False,
+                                                'error': 'Skipped after an earlier failure'})
+                                continue
+                            
+                            conn.execute('SAVEPOINT vfs_batch_op')
+                            result = self._apply_batch_operation(index, operation)
+                            if not result['success']:
+                                failed = True
+                                conn.execute('ROLLBACK TO SAVEPOINT vfs_batch_op')
+                            conn.execute('RELEASE SAVEPOINT vfs_batch_op')
+                            results.append(result)
+                    finally:
+                        self._batch.active = False
+                    
+                    succeeded = sum(1 for result in results if result['success'])
+                    if succeeded == len(results) or (succeeded and not atomic):
+                        conn.commit()
+                        committed = True
+        except Exception as e:
+            eprint(f"Error applying VFS batch: {e}")
+            import traceback
+            traceback.print_exc()
+            committed = False
+        
+        # Changes held back during the batch only happened if it committed
+        events, self._batch.events = getattr(self._batch, 'events', []), []
+        if committed:
+            for event in events:
+                self.changes.publish(event)
+        
+        if not committed:
+            for result in results:
+                if result['success']:
+                    result.update(success=False, error='Rolled back with the rest of the batch')
+        
+        succeeded = sum(1 for result in results if result['success'])
+        stats = {
+            'success': committed and succeeded == len(operations),
+            'committed': committed,
+            'operations': len(operations),
+            'succeeded': succeeded,
+            'failed': len(operations) - succeeded,
+            'results': results,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+        print(f"VFS batch: {succeeded}/{len(operations)} operations applied "
+              f"({'committed' if committed else 'rolled back'}) in {stats['duration_ms']}ms")
+        return stats
+    
+    def _apply_batch_operation(self, index: int, operation: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one apply_batch operation inside the batch transaction."""
+        op = operation.get('op')
+        path = operation.get('path')
+        result = {'index': index, 'op': op, 'path': path, 'success': False}
+        
+        if op not in self.BATCH_OPERATIONS:
+            result['error'] = f"Unknown operation '{op}'"
+            return result
+        if not isinstance(path, str) or not path:
+            result['error'] = 'path is required'
+            return result
+        
+        try:
+            if op == 'mkdir':
+                result['success'] = self.create_directory(path)
+            elif op == 'create':
+                result['success'] = self.create_file(path, operation.get('content', b''), operation.get('mime_type'))
+            elif op == 'write':
+                result['success'] = self.write_file(path, operation.get('content', b''))
+            elif op == 'delete':
+                result['success'] = self.delete_path(path)
+            elif op == 'rename':
+                new_path = operation.get('new_path')
+                if not isinstance(new_path, str) or not new_path:
+                    result['error'] = 'new_path is required'
+                    return result
+                result['new_path'] = new_path
+                result['success'] = self.rename_path(path, new_path)
+        except QuotaExceededError as e:
+            result['error'] = str(e)
+            result['quota_exceeded'] = True
+            return result
+        
+        if not result['success']:
+            result['error'] = f'{op} failed for {path}'
+        return result
+    
+    def export_archive(self, path: str, archive_format: str = 'tar'):
+        """
+        Stream a file or directory subtree as a tar or zip archive.
+        
+        Returns a generator of archive bytes, or None if path does not exist.
+        Members are named relative to the parent of path (so exporting /docs
+        gives docs/...). Each file is copied from read_file_streaming chunks as
+        the archive is consumed, so memory use does not grow with the subtree.
+        Raises ValueError for an unknown format.
+        """
+        if archive_format not in self.ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format '{archive_format}' (expected one of {', '.join(self.ARCHIVE_FORMATS)})")
+        
+        normalized_path = self._normalize_path(path)
+        info = self.get_file_info(normalized_path)
+        if not info:
+            return None
+        
+        entries = [info] if normalized_path != '/' else []
+        if info['is_directory']:
+            entries += self.list_subtree(normalized_path)
+        base = '' if normalized_path == '/' else (self._get_parent_path(normalized_path) or '/').rstrip('/')
+        
+        writer = self._export_tar if archive_format == 'tar' else self._export_zip
+        return writer(normalized_path, entries, base)
+    
+    def _export_entries(self, entries: List[Dict[str, Any]], base: str):
+        """Yield (member name, entry, content chunks or None) for each exported entry."""
+        for entry in entries:
+            name = entry['path'][len(base):].lstrip('/')
+            if entry['is_directory']:
+                yield name, entry, None
+                continue
+            
+            stream = self.read_file_streaming(entry['path'])
+            if stream is None:
+                # Deleted since the listing was taken
+                continue
+            yield name, stream[0], stream[1]
+    
+    def _exact_chunks(self, chunks, size: int, path: str):
+        """Yield exactly size bytes from chunks, in case the file changed while being exported."""
+        remaining = size
+        for chunk in chunks:
+            if remaining <= 0:
+                break
+            yield chunk[:remaining]
+            remaining -= min(len(chunk), remaining)
+        if remaining > 0:
+            eprint(f"⚠️ {path} shrank while being exported, padding {remaining} bytes")
+            yield bytes(remaining)
+    
+    @staticmethod
+    def _entry_mtime(entry: Dict[str, Any]) -> float:
+        """Modification time of an entry as a Unix timestamp (now if it cannot be parsed)."""
+        try:
+            updated = datetime.fromisoformat(str(entry.get('updated_at')).replace(' ', 'T')[:26])
+            return updated.replace(tzinfo=updated.tzinfo or timezone.utc).timestamp()
+        except ValueError:
+            return time.time()
+    
+    def _export_tar(self, root: str, entries: List[Dict[str, Any]], base: str):
+        """Generate a PAX tar archive of entries."""
+        written = 0
+        count = 0
+        for name, entry, chunks in self._export_entries(entries, base):
+            member = tarfile.TarInfo(name)
+            member.mtime = int(self._entry_mtime(entry))
+            if chunks is None:
+                member.type = tarfile.DIRTYPE
+                member.mode = 0o755
+            else:
+                member.size = entry['size']
+                member.mode = 0o644
+            header = member.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+            written += len(header)
+            yield header
+            
+            if chunks is not None:
+                for chunk in self._exact_chunks(chunks, member.size, entry['path']):
+                    written += len(chunk)
+                    yield chunk
+                padding = -member.size % tarfile.BLOCKSIZE
+                written += padding
+                yield bytes(padding)
+            count += 1
+        
+        # Two zero blocks end the archive, which is padded to a whole record
+        end = 2 * tarfile.BLOCKSIZE
+        end += -(written + end) % tarfile.RECORDSIZE
+        yield bytes(end)
+        print(f"Exported {count} entries from {root} as tar ({written + end} bytes)")
+    
+    def _export_zip(self, root: str, entries: List[Dict[str, Any]], base: str):
+        """Generate a zip archive of entries, deflating text and storing everything else."""
+        sink = _ArchiveSink()
+        count = 0
+        with zipfile.ZipFile(sink, 'w', allowZip64=True) as archive:
+            for name, entry, chunks in self._export_entries(entries, base):
+                date_time = time.gmtime(max(self._entry_mtime(entry), 315532800))[:6]  # zip dates start in 1980
+                if chunks is None:
+                    archive.writestr(zipfile.ZipInfo(name + '/', date_time), b'')
+                else:
+                    member = zipfile.ZipInfo(name, date_time)
+                    member.file_size = entry['size']
+                    member.compress_type = (zipfile.ZIP_DEFLATED if is_text_mime(entry.get('mime_type'))
+                                            else zipfile.ZIP_STORED)
+                    with archive.open(member, 'w', force_zip64=entry['size'] >= zipfile.ZIP64_LIMIT) as dest:
+                        for chunk in self._exact_chunks(chunks, entry['size'], entry['path']):
+                            dest.write(chunk)
+                            yield sink.take()
+                yield sink.take()
+                count += 1
+        yield sink.take()
+        print(f"Exported {count} entries from {root} as zip")
+    
+    def import_archive(self, path: str, fileobj, archive_format: str = 'tar',
+                       overwrite: bool = False) -> Dict[str, Any]:
+        """
+        Unpack a tar (optionally compressed) or zip archive into the directory at
+        path in a single write transaction, streaming each member into chunk
+        storage without holding it in memory. Missing parent directories are
+        created and existing directories are merged into; an existing file is
+        replaced only with overwrite. Symlinks and other special members are
+        skipped. An archive that cannot seek (such as a request body) is spooled
+        to a temporary file first, so a slow upload never holds the write lock.
+        
+        Returns import statistics. Raises ValueError (nothing is imported) for an
+        unknown format, a missing target, an unsafe or invalid member name, a
+        conflicting path or an unreadable archive.
+        """
+        if archive_format not in self.ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format '{archive_format}' (expected one of {', '.join(self.ARCHIVE_FORMATS)})")
+        
+        started = time.perf_counter()
+        target = self._normalize_path(path)
+        stats = {'path': target, 'directories_created': 0, 'files_created': 0, 'files_replaced': 0,
+                 'bytes_imported': 0, 'skipped': 0}
+        events = []
+        
+        spool = None
+        try:
+            if not (hasattr(fileobj, 'seekable') and fileobj.seekable()):
+                spool = tempfile.TemporaryFile()
+                while True:
+                    block = fileobj.read(self.CHUNK_SIZE)
+                    if not block:
+                        break
+                    spool.write(block)
+                spool.seek(0)
+                fileobj = spool
+            
+            with self._path_lock(target):
+                with self._write_transaction() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('SELECT 1 FROM virtual_files WHERE path = ? AND is_directory = 1', (target,))
+                    if not cursor.fetchone():
+                        raise ValueError(f'Directory {target} does not exist')
+                    
+                    directories = {target}
+                    for name, is_directory, mtime, stream in self._archive_members(fileobj, archive_format):
+                        if name is None:
+                            stats['skipped'] += 1
+                            continue
+                        member_path = self._archive_member_path(target, name)
+                        self._import_parents(cursor, member_path, directories, stats, events)
+                        if is_directory:
+                            self._import_directory(cursor, member_path, mtime, directories, stats, events)
+                        else:
+                            self._import_file(cursor, member_path, stream, mtime, overwrite, stats, events)
+                    
+                    conn.commit()
+        except (tarfile.TarError, zipfile.BadZipFile, EOFError, zlib.error, lzma.LZMAError, OSError) as e:
+            raise ValueError(f'Could not read {archive_format} archive: {e}') from e
+        finally:
+            if spool is not None:
+                spool.close()
+        
+        for event in events:
+            self._emit_change(**event)
+        
+        stats['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        print(f"Imported {archive_format} archive into {target}: {stats['files_created']} files, "
+              f"{stats['directories_created']} directories, {stats['bytes_imported']} bytes in {stats['duration_ms']}ms")
+        return stats
+    
+    def _archive_members(self, fileobj, archive_format: str):
+        """Yield (name, is_directory, mtime, stream) per member; name is None for skipped members."""
+        if archive_format == 'tar':
+            with tarfile.open(fileobj=fileobj, mode='r|*') as archive:
+                for member in archive:
+                    if member.isdir():
+                        yield member.name, True, member.mtime, None
+                    elif member.isreg():
+                        yield member.name, False, member.mtime, archive.extractfile(member)
+                    else:
+                        yield None, False, None, None
+        else:
+            with zipfile.ZipFile(fileobj) as archive:
+                for member in archive.infolist():
+                    mtime = calendar.timegm(member.date_time + (0, 0, 0))  # Written in UTC by export_archive
+                    if member.is_dir():
+                        yield member.filename, True, mtime, None
+                    else:
+                        with archive.open(member) as stream:
+                            yield member.filename, False, mtime, stream
+    
+    def _archive_member_path(self, target: str, name: str) -> str:
+        """VFS path for an archive member name; raises ValueError for names that are unsafe or invalid."""
+        parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.')]
+        if not parts:
+            raise ValueError(f"Invalid archive member name '{name}'")
+        for part in parts:
+            if part == '..':
+                raise ValueError(f"Archive member '{name}' points outside the target directory")
+            is_valid, error_message = validate_filename(part)
+            if not is_valid:
+                raise ValueError(f"Invalid archive member name '{name}': {error_message}")
+        return target.rstrip('/') + '/' + '/'.join(parts)
+    
+    @staticmethod
+    def _archive_timestamp(mtime) -> Optional[str]:
+        """An archive member's mtime in CURRENT_TIMESTAMP format, or None if it has none."""
+        if not mtime:
+            return None
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(mtime))
+    
+    def _import_parents(self, cursor, member_path: str, directories: set, stats: Dict[str, Any],
+                        events: List[Dict[str, Any]]):
+        """Create any missing directories above an imported member."""
+        parent_path = self._get_parent_path(member_path) or '/'
+        missing = []
+        while parent_path not in directories:
+            missing.append(parent_path)
+            parent_path = self._get_parent_path(parent_path) or '/'
+        for directory in reversed(missing):
+            self._import_directory(cursor, directory, None, directories, stats, events)
+    
+    def _import_directory(self, cursor, path: str, mtime, directories: set, stats: Dict[str, Any],
+                          events: List[Dict[str, Any]]):
+        """Create an imported directory, or reuse it if it already exists."""
+        if path in directories:
+            return
+        
+        cursor.execute('SELECT is_directory FROM virtual_files WHERE path = ?', (path,))
+        row = cursor.fetchone()
+        if row and not row[0]:
+            raise ValueError(f'{path} is a file in the VFS but a directory in the archive')
+        if not row:
+            timestamp = self._archive_timestamp(mtime)
+            cursor.execute('''
+                INSERT INTO virtual_files 
+                (path, name, parent_path, is_directory, size, created_at, updated_at) 
+                VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP))
+            ''', (path, self._get_name_from_path(path), self._get_parent_path(path) or '/', True, 0,
+                  timestamp, timestamp))
+            self._index_paths(cursor, '?', (cursor.lastrowid,))
+            self._adjust_usage(cursor, path, directories=1)
+            stats['directories_created'] += 1
+            events.append({'change_type': 'create', 'path': path, 'is_directory': True})
+        directories.add(path)
+    
+    def _import_file(self, cursor, path: str, stream, mtime, overwrite: bool, stats: Dict[str, Any],
+                     events: List[Dict[str, Any]]):
+        """Create an imported file from a member stream, one chunk in memory at a time."""
+        cursor.execute('SELECT is_directory FROM virtual_files WHERE path = ?', (path,))
+        row = cursor.fetchone()
+        if row:
+            if row[0] or not overwrite:
+                raise ValueError(f'{path} already exists')
+            self._delete_subtree(cursor, path)
+            stats['files_replaced'] += 1
+        
+        name = self._get_name_from_path(path)
+        mime_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        timestamp = self._archive_timestamp(mtime)
+        cursor.execute('''
+            INSERT INTO virtual_files 
+            (path, name, parent_path, is_directory, size, mime_type, hash, created_at, updated_at) 
+            VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP))
+        ''', (path, name, self._get_parent_path(path) or '/', False, 0, mime_type, '', timestamp, timestamp))
+        file_id = cursor.lastrowid
+        self._adjust_usage(cursor, path, files=1)
+        
+        def read_chunk():
+            # Member streams may return short reads, so fill a whole chunk
+            data = bytearray()
+            while len(data) < self.CHUNK_SIZE:
+                block = stream.read(self.CHUNK_SIZE - len(data))
+                if not block:
+                    break
+                data += block
+            return bytes(data)
+        
+        content_hash = hashlib.sha256()
+        size = 0
+        data = read_chunk()
+        if len(data) < self.CHUNK_SIZE:
+            self._adjust_usage(cursor, path, size=len(data))
+            self._store_content(cursor, file_id, data)
+            content_hash.update(data)
+            size = len(data)
+        else:
+            codec = self._codec_for(mime_type, name)
+            chunk_index = 0
+            while data:
+                # Counted chunk by chunk so an oversized member fails as soon as it passes the quota
+                self._adjust_usage(cursor, path, size=len(data))
+                self._add_chunk(cursor, file_id, chunk_index, data, codec)
+                content_hash.update(data)
+                size += len(data)
+                chunk_index += 1
+                data = read_chunk()
+            cursor.execute('UPDATE virtual_files SET content = NULL, blob_hash = NULL, is_chunked = 1 WHERE id = ?',
+                           (file_id,))
+        
+        file_hash = content_hash.hexdigest() if size else ''
+        cursor.execute('UPDATE virtual_files SET size = ?, hash = ? WHERE id = ?', (size, file_hash, file_id))
+        self._index_paths(cursor, '?', (file_id,))
+        self._index_content(cursor, file_id)
+        
+        stats['files_created'] += 1
+        stats['bytes_imported'] += size
+        events.append({'change_type': 'write' if row else 'create', 'path': path, 'hash': file_hash, 'size': size})
+    
+    def search(self, query: str, mode: str = 'name', path: str = '/', limit: int = 50,
+               offset: int = 0) -> Optional[Dict[str, Any]]:
+        """
+        Search the VFS index and return a ranked page of matches.
+        
+        Modes: 'name' matches names containing query, 'prefix' names starting with
+        it (both case-insensitive, exact and prefix matches ranked first), 'glob'
+        matches a shell pattern against names, or against paths if the pattern
+        holds a '/', and 'content' finds text files containing every word of query
+        (as word prefixes) ranked by BM25 with a highlighted snippet. Results are
+        limited to the subtree at path. Returns None if search is unavailable and
+        raises ValueError for an unknown mode or an empty query.
+        """
+        if mode not in self.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}' (expected one of {', '.join(self.SEARCH_MODES)})")
+        query = (query or '').strip()
+        if not query:
+            raise ValueError('query is required')
+        if limit < 1 or offset < 0:
+            raise ValueError('limit must be positive and offset non-negative')
+        if not self.search_available:
+            return None
+        
+        try:
+            normalized_path = self._normalize_path(path)
+            where = ['vf.path != ?']
+            params = ['/']
+            if normalized_path != '/':
+                where.append('vf.path >= ? AND vf.path < ?')
+                params += list(self._subtree_range(normalized_path))
+            
+            columns = 'vf.path, vf.name, vf.is_directory, vf.size, vf.mime_type, vf.updated_at'
+            if mode == 'content':
+                # Every word must appear, each as a token prefix
+                words = re.findall(r'\w+', query)
+                if not words:
+                    raise ValueError('query has no searchable words')
+                sql = f'''
+                    SELECT {columns}, snippet(search_content, 0, '[', ']', '…', 12), bm25(search_content)
+                    FROM search_content
+                    JOIN virtual_files vf ON vf.id = search_content.rowid
+                    WHERE search_content MATCH ? AND {' AND '.join(where)}
+                    ORDER BY bm25(search_content)
+                '''
+                params = [' '.join(f'"{word}"*' for word in words)] + params
+            else:
+                column = 'path' if mode == 'glob' and '/' in query else 'name'
+                if mode == 'glob':
+                    # The LIKE form of the pattern narrows candidates through the
+                    # trigram index, GLOB then applies its exact (case-sensitive) rules
+                    like = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                    like = re.sub(r'\[[^\]]*\]', '_', like)
+                    like = like.replace('*', '%').replace('?', '_')
+                    match = f"sn.{column} LIKE ? ESCAPE '\\' AND vf.{column} GLOB ?"
+                    match_params = [like, query]
+                    order = 'length(vf.path), vf.path'
+                    order_params = []
+                else:
+                    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                    pattern = escaped + '%' if mode == 'prefix' else '%' + escaped + '%'
+                    match = "sn.name LIKE ? ESCAPE '\\'"
+                    match_params = [pattern]
+                    order = "lower(vf.name) = lower(?) DESC, vf.name LIKE ? ESCAPE '\\' DESC, length(vf.name), vf.path"
+                    order_params = [query, escaped + '%']
+                if '%' not in query and '_' not in query and '\\' not in query:
+                    # Without escapes the trigram index can serve the LIKE directly
+                    match = match.replace(" ESCAPE '\\'", '')
+                    order = order.replace(" ESCAPE '\\'", '')
+                sql = f'''
+                    SELECT {columns}, NULL, NULL
+                    FROM search_names sn
+                    JOIN virtual_files vf ON vf.id = sn.rowid
+                    WHERE {match} AND {' AND '.join(where)}
+                    ORDER BY {order}
+                '''
+                params = match_params + params + order_params
+            
+            # One extra row tells whether another page follows
+            sql += ' LIMIT ? OFFSET ?'
+            params += [limit + 1, offset]
+            
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(sql, params)
+                except sqlite3.OperationalError as e:
+                    raise ValueError(f'Invalid search query: {e}') from e
+                rows = cursor.fetchall()
+            
+            results = []
+            for item_path, name, is_directory, size, mime_type, updated_at, snippet, score in rows[:limit]:
+                result = {
+                    'path': item_path,
+                    'name': name,
+                    'is_directory': bool(is_directory),
+                    'size': size,
+                    'mime_type': mime_type,
+                    'updated_at': updated_at
+                }
+                if mode == 'content':
+                    # Snippets are cut at tokens, which can be arbitrarily long
+                    result['snippet'] = snippet[:self.MAX_SNIPPET_LENGTH]
+                    result['score'] = round(-score, 4)
+                results.append(result)
+            
+            print(f"VFS search ({mode}) for {query!r} in {normalized_path}: {len(results)} results")
+            return {
+                'query': query,
+                'mode': mode,
+                'path': normalized_path,
+                'results': results,
+                'offset': offset,
+                'has_more': len(rows) > limit
+            }
+        except ValueError:
+            raise
+        except Exception as e:
+            eprint(f"Error searching VFS for {query}: {e}")
+            return None
     
     def get_system_stats(self) -> Dict[str, Any]:
         """Get virtual file system statistics."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 
                 # Single query for all file/directory stats
@@ -993,19 +4204,39 @@ class VirtualFileManager:
                 stats_row = cursor.fetchone()
                 total_items, total_directories, total_files, total_size = stats_row
                 
-                # Get database size
-                cursor.execute('PRAGMA page_count')
-                page_count = cursor.fetchone()[0]
-                cursor.execute('PRAGMA page_size')
-                page_size = cursor.fetchone()[0]
-                db_size = page_count * page_size
+                # Unique content after deduplication, and the bytes it takes once compressed
+                cursor.execute('''
+                    SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(length(data)), 0),
+                           COALESCE(SUM(codec IS NOT NULL), 0)
+                    FROM blobs
+                ''')
+                blob_count, unique_size, stored_size, compressed_blobs = cursor.fetchone()
+                
+                # Database size counts live pages only; free pages are reported apart
+                storage = self.get_storage_stats()
                 
                 return {
                     'total_items': total_items,
                     'total_directories': total_directories,
                     'total_files': total_files,
                     'total_size': total_size,
-                    'database_size': db_size,
+                    'stored_size': stored_size,
+                    'blob_count': blob_count,
+                    'dedup_savings': max(total_size - unique_size, 0),
+                    'compression': self.compression,
+                    'compressed_blobs': compressed_blobs,
+                    'compression_savings': max(unique_size - stored_size, 0),
+                    'database_size': storage['used_size'],
+                    'database_file_size': storage['file_size'],
+                    'database_free_size': storage['free_size'],
+                    'wal_size': storage['wal_size'],
+                    'metadata_database_size': storage['databases']['main']['used_size'],
+                    'blob_database_size': storage['databases'][self.BLOB_SCHEMA]['used_size'],
+                    'connection_pool': self.pool.get_stats(),
+                    'locks': self.locks.get_stats(),
+                    'access_times': self.access_times.get_stats(),
+                    'cache': self.cache.get_stats(),
+                    'change_feed': self.changes.get_stats(),
                     'last_updated': datetime.now().isoformat()
                 }
         except Exception as e:
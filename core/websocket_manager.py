@@ -7,6 +7,9 @@ from datetime import datetime
 from core.system_boot_manager import get_system_boot_manager
 
 class WebSocketManager:
+    # Joining room 'vfs:<directory>' watches that directory and everything below it
+    VFS_ROOM_PREFIX = 'vfs:'
+    
     def __init__(self, logs_manager=None):
         self.logs_manager = logs_manager
         print("WebSocketManager: Initializing...")
@@ -336,6 +339,47 @@ class WebSocketManager:
             return True
         return False
 
+    def broadcast_vfs_changes(self, events):
+        """
+        Fan a batch of VFS change events out to the watch rooms they fall under.
+        Each room gets one 'vfs_changes' message holding its events in order.
+        """
+        if not self.socketio:
+            return False
+        
+        watched = {room[len(self.VFS_ROOM_PREFIX):] for room in list(self.rooms)
+                   if room.startswith(self.VFS_ROOM_PREFIX)}
+        if not watched:
+            return True
+        
+        room_events = {}
+        for event in events:
+            # A rename is seen by watchers of both its old and new location
+            directories = set()
+            for path in (event['path'], event.get('old_path')):
+                if path:
+                    directories |= self._vfs_ancestors(path) & watched
+            for directory in directories:
+                room_events.setdefault(directory, []).append(event)
+        
+        for directory, directory_events in room_events.items():
+            room = self.VFS_ROOM_PREFIX + directory
+            self.socketio.emit('vfs_changes', {
+                'room': room,
+                'path': directory,
+                'events': directory_events
+            }, room=room)
+        return True
+    
+    @staticmethod
+    def _vfs_ancestors(path):
+        """A VFS path and every directory above it, e.g. /a/b -> {'/', '/a', '/a/b'}."""
+        ancestors = {'/'}
+        parts = [part for part in path.split('/') if part]
+        for depth in range(1, len(parts) + 1):
+            ancestors.add('/' + '/'.join(parts[:depth]))
+        return ancestors
+
     def get_connected_clients_count(self):
         """Get the number of connected clients."""
         return len(self.connected_clients)
@@ -101,7 +101,7 @@ def register_system_routes(app, managers):
                 eprint(f"    Warning: Could not clear VFS instance: {e}")
             
             # Try to connect and immediately close to flush any WAL files
-            for db_file in ['data/user_preferences.db', 'data/virtual_files.db']:
+            for db_file in ['data/user_preferences.db', 'data/virtual_files.db', 'data/virtual_files_blobs.db', 'data/logs.db']:
                 if os.path.exists(db_file):
                     try:
                         print(f"    - Checkpointing {db_file}...")
@@ -128,7 +128,9 @@ def register_system_routes(app, managers):
                 # Create temporary database files with seeded data
                 temp_db_files = {
                     'data/user_preferences.db': 'temp_prefs.db',
-                    'data/virtual_files.db': 'temp_vfs.db'
+                    'data/virtual_files.db': 'temp_vfs.db',
+                    'data/virtual_files_blobs.db': 'temp_vfs_blobs.db',  # Created next to temp_vfs.db
+                    'data/logs.db': 'temp_logs.db'
                 }
                 
                 print("  - Creating temporary seeded databases...")
@@ -147,7 +149,7 @@ def register_system_routes(app, managers):
                 
                 # Create temp instances with temp database files
                 temp_vfs = VirtualFileManager(db_path='temp_vfs.db')
-                temp_logs = LogsManager(temp_vfs)
+                temp_logs = LogsManager(temp_vfs, db_path='temp_logs.db')
                 temp_prefs = UserPreferences(temp_logs, db_path='temp_prefs.db')
                 temp_boot = SystemBootManager(db_path='temp_prefs.db')  # Uses same DB as preferences
                 temp_websocket = WebSocketManager(temp_logs)
@@ -170,11 +172,24 @@ def register_system_routes(app, managers):
                 from config.app_config import seed_first_boot
                 seed_first_boot(temp_managers)
                 
-                # Close temp database connections
+                # Stop the temp log writer and close the temp database connections, which
+                # also checkpoints their WALs into the files that are copied below
+                temp_logs.shutdown()
+                temp_logs.pool.close_all()
+                temp_vfs.close()
                 del temp_vfs, temp_prefs, temp_logs, temp_websocket, temp_boot
                 import gc
                 gc.collect()
                 
+                # Let the live log writer drain and drop the live managers' idle pooled
+                # connections, so none keeps a stale view of the files being replaced
+                if managers.get('logs_manager'):
+                    managers['logs_manager'].flush(timeout=5)
+                    managers['logs_manager'].pool.close_all()
+                if managers.get('virtual_file_manager'):
+                    managers['virtual_file_manager'].pool.close_all()
+                    managers['virtual_file_manager'].cache.clear()
+                
                 # Copy temp databases over existing ones (this is the key - no deletion!)
                 print("  - Copying seeded databases over existing ones...")
                 copied_files = []
@@ -208,7 +223,7 @@ def register_system_routes(app, managers):
                 eprint(f"❌ Reset attempt {attempt + 1} failed: {e}")
                 
                 # Clean up temp files on error
-                for temp_db in ['temp_prefs.db', 'temp_vfs.db']:
+                for temp_db in ['temp_prefs.db', 'temp_vfs.db', 'temp_vfs_blobs.db', 'temp_logs.db']:
                     if os.path.exists(temp_db):
                         try:
                             os.remove(temp_db)
@@ -229,7 +244,7 @@ def register_system_routes(app, managers):
                 eprint(f"❌ Unexpected error during reset: {e}")
                 
                 # Clean up temp files on error
-                for temp_db in ['temp_prefs.db', 'temp_vfs.db']:
+                for temp_db in ['temp_prefs.db', 'temp_vfs.db', 'temp_vfs_blobs.db', 'temp_logs.db']:
                     if os.path.exists(temp_db):
                         try:
                             os.remove(temp_db)
@@ -1,10 +1,173 @@
 """
 Virtual file system routes for the Sypnex OS application
 """
+import base64
+import binascii
+import gzip
+import hashlib
+import uuid
+from datetime import datetime, timezone
 from flask import request, jsonify, Response
-from core.virtual_file_manager import validate_filename
+from core.virtual_file_manager import QuotaExceededError, is_text_mime, validate_filename
 from utils.performance_utils import monitor_performance, monitor_critical_performance
 
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import cbor2
+    CBOR_AVAILABLE = True
+except ImportError:
+    CBOR_AVAILABLE = False
+
+# Requests asking for more ranges than this get the whole file instead
+MAX_BYTE_RANGES = 16
+
+# Largest page a directory listing returns when a limit is given
+MAX_LIST_PAGE_SIZE = 5000
+
+# Largest page of search results
+MAX_SEARCH_RESULTS = 200
+
+# Largest number of operations accepted by one batch request
+MAX_BATCH_OPERATIONS = 1000
+
+# Read formats selectable with ?format= or the Accept header (first entry is the default)
+READ_FORMATS = {
+    'application/json': 'json',
+    'application/octet-stream': 'raw',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/cbor': 'cbor'
+}
+
+# Responses smaller than this are not worth compressing; raw reads larger than
+# MAX_COMPRESS_SIZE are streamed uncompressed instead of buffered for compression
+MIN_COMPRESS_SIZE = 1024
+MAX_COMPRESS_SIZE = 16 * 1024 * 1024
+
+# VFS storage codecs whose stored bytes are a valid HTTP Content-Encoding
+STORED_CONTENT_ENCODINGS = {'gzip': 'gzip', 'zstd': 'zstd'}
+
+
+def _parse_timestamp(value):
+    """Parse a stored VFS timestamp into an aware UTC datetime (second precision)."""
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.replace(microsecond=0)
+
+
+def _is_not_modified(etag, last_modified):
+    """Evaluate If-None-Match / If-Modified-Since against the file's validators."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def _if_range_matches(etag, last_modified):
+    """A Range request only applies if its If-Range validator (if any) still matches."""
+    if_range = request.if_range
+    if if_range.etag:
+        return if_range.etag == etag
+    if if_range.date:
+        return last_modified is not None and if_range.date == last_modified
+    return True
+
+
+def _resolve_byte_ranges(range_header, size):
+    """
+    Turn a parsed Range header into sorted, merged (start, stop) pairs.
+    Returns None when the header should be ignored and [] when no range is satisfiable.
+    """
+    if range_header.units != 'bytes' or len(range_header.ranges) > MAX_BYTE_RANGES:
+        return None
+    
+    resolved = []
+    for start, stop in range_header.ranges:
+        if start < 0:
+            # Suffix range: the last N bytes
+            start, stop = max(size + start, 0), size
+        else:
+            stop = size if stop is None else min(stop, size)
+        if start < stop:
+            resolved.append((start, stop))
+    
+    merged = []
+    for start, stop in sorted(resolved):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _negotiate_read_format():
+    """Pick the read format from ?format= or, failing that, the Accept header."""
+    requested = request.args.get('format')
+    if requested:
+        return requested.lower()
+    best = request.accept_mimetypes.best_match(list(READ_FORMATS), default='application/json')
+    return READ_FORMATS[best]
+
+
+def _compress_response(response, compressible=True):
+    """Compress a buffered response with brotli or gzip when the client accepts it."""
+    response.vary.add('Accept-Encoding')
+    if not compressible or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_SIZE:
+        return response
+    
+    if BROTLI_AVAILABLE and request.accept_encodings['br']:
+        body, encoding = brotli.compress(body, quality=5), 'br'
+    elif request.accept_encodings['gzip']:
+        body, encoding = gzip.compress(body, compresslevel=6), 'gzip'
+    else:
+        return response
+    
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def _stored_encoding_response(vfs, file_path, mimetype):
+    """
+    Response carrying a file's compressed stored bytes unchanged when the client
+    accepts their encoding, or None if the file has to be sent decompressed.
+    """
+    accepted = [codec for codec, encoding in STORED_CONTENT_ENCODINGS.items() if request.accept_encodings[encoding]]
+    stored = vfs.read_file_stored(file_path, accepted)
+    if not stored:
+        return None
+    
+    codec, data = stored
+    response = Response(data, mimetype=mimetype)
+    response.headers['Content-Encoding'] = STORED_CONTENT_ENCODINGS[codec]
+    return response
+
+
+def _quota_exceeded_response(error):
+    """507 Insufficient Storage for a write refused by a directory quota."""
+    return jsonify({'error': str(error), 'quota_path': error.quota_path}), 507
+
+
 def register_virtual_file_routes(app, managers):
     """Register virtual file system routes"""
     
@@ -20,25 +183,100 @@ def register_virtual_file_routes(app, managers):
 
     @app.route('/api/virtual-files/list', methods=['GET'])
     def list_virtual_files():
-        """List files and directories in a path"""
+        """
+        List files and directories in a path.
+        
+        Optional query parameters: sort (name, size, mtime), order (asc, desc),
+        limit and cursor for pagination (next_cursor continues a listing), fields
+        (comma-separated columns to return) and count_only=true for child counts.
+        """
         try:
             path = request.args.get('path', '/')
+            vfs = managers['virtual_file_manager']
             print(f"Listing files for path: {path}")
             
-            items = managers['virtual_file_manager'].list_directory(path)
-            print(f"Found {len(items)} items: {items}")
+            if request.args.get('count_only', 'false').lower() == 'true':
+                counts = vfs.count_directory(path)
+                if counts is None:
+                    return jsonify({'error': f'Directory {path} not found'}), 404
+                return jsonify(counts)
             
-            return jsonify({
+            limit = request.args.get('limit', type=int)
+            if limit is not None and not 1 <= limit <= MAX_LIST_PAGE_SIZE:
+                return jsonify({'error': f'limit must be between 1 and {MAX_LIST_PAGE_SIZE}'}), 400
+            fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+            
+            try:
+                page = vfs.list_directory_page(
+                    path,
+                    sort=request.args.get('sort', 'name'),
+                    descending=request.args.get('order', 'asc').lower() == 'desc',
+                    limit=limit,
+                    cursor=request.args.get('cursor') or None,
+                    fields=fields or None
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            # Missing directories list as empty, as they always have
+            items = page['items'] if page else []
+            print(f"Found {len(items)} items")
+            
+            result = {
                 'path': path,
                 'items': items,
-                'total': len(items)
-            })
+                'total': len(items),
+                'next_cursor': page['next_cursor'] if page else None,
+                'has_more': page['has_more'] if page else False
+            }
+            if page and (limit is not None or request.args.get('cursor')):
+                # A page only holds part of the directory, so report its full size
+                result['total'] = vfs.count_directory(path)['total']
+            return jsonify(result)
         except Exception as e:
             eprint(f"Error listing virtual files: {e}")
             import traceback
             traceback.print_exc()
             return jsonify({'error': 'Failed to list virtual files'}), 500
 
+    @app.route('/api/virtual-files/search', methods=['GET'])
+    def search_virtual_files():
+        """
+        Search files by name or content.
+        
+        Query parameters: q (required), mode (name, prefix, glob, content),
+        path to limit the search to a subtree, and limit/offset for pagination.
+        """
+        try:
+            vfs = managers['virtual_file_manager']
+            if not vfs.search_available:
+                return jsonify({'error': 'Search index is not available'}), 503
+            
+            limit = request.args.get('limit', 50, type=int)
+            offset = request.args.get('offset', 0, type=int)
+            if not 1 <= limit <= MAX_SEARCH_RESULTS:
+                return jsonify({'error': f'limit must be between 1 and {MAX_SEARCH_RESULTS}'}), 400
+            
+            try:
+                result = vfs.search(
+                    request.args.get('q', ''),
+                    mode=request.args.get('mode', 'name'),
+                    path=request.args.get('path', '/'),
+                    limit=limit,
+                    offset=offset
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            if result is None:
+                return jsonify({'error': 'Search failed'}), 500
+            return jsonify(result)
+        except Exception as e:
+            eprint(f"Error searching virtual files: {e}")
+            import traceback
+            traceback.print_exc()
+            return jsonify({'error': 'Failed to search virtual files'}), 500
+
     @app.route('/api/virtual-files/create-folder', methods=['POST'])
     def create_virtual_folder():
         """Create a new folder"""
@@ -75,6 +313,8 @@ def register_virtual_file_routes(app, managers):
                 })
             else:
                 return jsonify({'error': f'Failed to create folder {folder_name}'}), 400
+        except QuotaExceededError as e:
+            return _quota_exceeded_response(e)
         except Exception as e:
             eprint(f"Error creating virtual folder: {e}")
             import traceback
@@ -115,6 +355,8 @@ def register_virtual_file_routes(app, managers):
                 })
             else:
                 return jsonify({'error': f'Failed to create file {file_name}'}), 400
+        except QuotaExceededError as e:
+            return _quota_exceeded_response(e)
         except Exception as e:
             eprint(f"Error creating virtual file: {e}")
             return jsonify({'error': 'Failed to create file'}), 500
@@ -162,6 +404,8 @@ def register_virtual_file_routes(app, managers):
                 })
             else:
                 return jsonify({'error': f'Failed to upload file {file_name}'}), 400
+        except QuotaExceededError as e:
+            return _quota_exceeded_response(e)
         except Exception as e:
             eprint(f"Error uploading virtual file: {e}")
             import traceback
@@ -223,75 +467,316 @@ def register_virtual_file_routes(app, managers):
             else:
                 return jsonify({'error': f'Failed to upload file {file_name}'}), 400
                 
+        except QuotaExceededError as e:
+            return _quota_exceeded_response(e)
         except Exception as e:
             eprint(f"Error uploading virtual file (streaming): {e}")
             import traceback
             traceback.print_exc()
             return jsonify({'error': 'Failed to upload file'}), 500
 
+    @app.route('/api/virtual-files/uploads', methods=['POST'])
+    def create_upload_session():
+        """Start a resumable chunked upload"""
+        try:
+            data = request.json or {}
+            file_name = data.get('filename', '')
+            parent_path = data.get('parent_path', '/')
+            total_size = data.get('size')
+            
+            # Validate file name
+            is_valid, error_message = validate_filename(file_name)
+            if not is_valid:
+                return jsonify({'error': error_message}), 400
+            
+            if not isinstance(total_size, int) or isinstance(total_size, bool) or total_size < 0:
+                return jsonify({'error': 'size must be a non-negative integer'}), 400
+            
+            # Construct full path
+            if parent_path == '/':
+                full_path = f'/{file_name}'
+            else:
+                full_path = f'{parent_path}/{file_name}'
+            
+            session = managers['virtual_file_manager'].create_upload_session(
+                full_path, total_size, data.get('sha256'), data.get('mime_type'))
+            if not session:
+                return jsonify({'error': 'Failed to create upload session'}), 500
+            
+            return jsonify(session), 201
+        except QuotaExceededError as e:
+            return _quota_exceeded_response(e)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            eprint(f"Error creating upload session: {e}")
+            return jsonify({'error': 'Failed to create upload session'}), 500
+
+    @app.route('/api/virtual-files/uploads/<session_id>', methods=['GET'])
+    def get_upload_session(session_id):
+        """Get upload progress, including which chunks still need to be sent"""
+        try:
+            session = managers['virtual_file_manager'].get_upload_session(session_id)
+            if not session:
+                return jsonify({'error': 'Upload session not found'}), 404
+            return jsonify(session)
+        except Exception as e:
+            eprint(f"Error getting upload session: {e}")
+            return jsonify({'error': 'Failed to get upload session'}), 500
+
+    @app.route('/api/virtual-files/uploads/<session_id>/chunks/<int:chunk_index>', methods=['PUT'])
+    def put_upload_chunk(session_id, chunk_index):
+        """Upload one chunk (raw request body); chunks may arrive in any order or in parallel"""
+        try:
+            result = managers['virtual_file_manager'].put_upload_chunk(
+                session_id, chunk_index, request.get_data(), request.headers.get('X-Chunk-SHA256'))
+            if not result:
+                return jsonify({'error': 'Upload session not found'}), 404
+            return jsonify(result)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            eprint(f"Error storing upload chunk: {e}")
+            return jsonify({'error': 'Failed to store chunk'}), 500
+
+    @app.route('/api/virtual-files/uploads/<session_id>/commit', methods=['POST'])
+    def commit_upload_session(session_id):
+        """Verify the uploaded chunks and create the file"""
+        try:
+            data = request.get_json(silent=True) or {}
+            file_info = managers['virtual_file_manager'].commit_upload_session(session_id, data.get('sha256'))
+            if not file_info:
+                return jsonify({'error': 'Upload session not found'}), 404
+            
+            return jsonify({
+                'message': f"File {file_info['name']} uploaded successfully",
+                'path': file_info['path'],
+                'size': file_info['size'],
+                'hash': file_info['hash']
+            })
+        except QuotaExceededError as e:
+            return _quota_exceeded_response(e)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 409
+        except Exception as e:
+            eprint(f"Error committing upload session: {e}")
+            import traceback
+            traceback.print_exc()
+            return jsonify({'error': 'Failed to commit upload'}), 500
+
+    @app.route('/api/virtual-files/uploads/<session_id>', methods=['DELETE'])
+    def abort_upload_session(session_id):
+        """Abort an upload and discard its chunks"""
+        try:
+            if not managers['virtual_file_manager'].abort_upload_session(session_id):
+                return jsonify({'error': 'Upload session not found'}), 404
+            return jsonify({'message': f'Upload session {session_id} aborted'})
+        except Exception as e:
+            eprint(f"Error aborting upload session: {e}")
+            return jsonify({'error': 'Failed to abort upload'}), 500
+
     @app.route('/api/virtual-files/read/<path:file_path>', methods=['GET'])
     @monitor_performance(threshold=0.5)  # File reads should be fast
     def read_virtual_file(file_path):
-        """Read a file's content"""
+        """
+        Read a file's content.
+        
+        The format comes from ?format= or the Accept header: json (default),
+        raw (the bytes as application/octet-stream with metadata in X-VFS-*
+        headers), msgpack or cbor (binary-safe, needs the optional package).
+        Text responses are gzip/brotli compressed when the client accepts it.
+        """
         try:
             # Ensure path starts with /
             if not file_path.startswith('/'):
                 file_path = '/' + file_path
             
-            file_data = managers['virtual_file_manager'].read_file(file_path)
+            read_format = _negotiate_read_format()
+            if read_format not in READ_FORMATS.values():
+                return jsonify({'error': f'Unsupported format {read_format}'}), 400
+            if (read_format == 'msgpack' and not MSGPACK_AVAILABLE) or (read_format == 'cbor' and not CBOR_AVAILABLE):
+                return jsonify({'error': f'{read_format} responses are not available on this server'}), 406
+            
+            vfs = managers['virtual_file_manager']
+            
+            if read_format == 'raw':
+                metadata = vfs.get_file_info(file_path)
+                if not metadata or metadata['is_directory']:
+                    return jsonify({'error': 'File not found'}), 404
+                
+                etag = metadata['hash'] or hashlib.sha256(b'').hexdigest()
+                compressible = is_text_mime(metadata['mime_type']) and metadata['size'] <= MAX_COMPRESS_SIZE
+                
+                if _is_not_modified(etag, _parse_timestamp(metadata['updated_at'])):
+                    response = Response(status=304)
+                elif compressible:
+                    response = _stored_encoding_response(vfs, file_path, 'application/octet-stream')
+                    if response is None:
+                        file_data = vfs.read_file(file_path)
+                        if not file_data:
+                            return jsonify({'error': 'File not found'}), 404
+                        response = Response(file_data['content'] or b'', mimetype='application/octet-stream')
+                    response = _compress_response(response)
+                else:
+                    stream_result = vfs.read_file_streaming(file_path)
+                    if not stream_result:
+                        return jsonify({'error': 'File not found'}), 404
+                    response = Response(stream_result[1], mimetype='application/octet-stream')
+                    response.headers['Content-Length'] = str(metadata['size'])
+                    response.vary.add('Accept-Encoding')
+                
+                response.set_etag(etag, weak='Content-Encoding' in response.headers)
+                response.vary.add('Accept')
+                response.headers['X-VFS-Path'] = metadata['path']
+                response.headers['X-VFS-Size'] = str(metadata['size'])
+                response.headers['X-VFS-Mime-Type'] = metadata['mime_type'] or 'application/octet-stream'
+                response.headers['X-VFS-Created-At'] = str(metadata['created_at'])
+                response.headers['X-VFS-Updated-At'] = str(metadata['updated_at'])
+                return response
+            
+            file_data = vfs.read_file(file_path)
             if not file_data:
                 return jsonify({'error': 'File not found'}), 404
             
-            # Convert content to string for JSON response
-            content = file_data['content'].decode('utf-8') if file_data['content'] else ''
-            
-            return jsonify({
+            result = {
                 'path': file_data['path'],
                 'name': file_data['name'],
-                'content': content,
+                'content': file_data['content'] or b'',
                 'size': file_data['size'],
                 'mime_type': file_data['mime_type'],
                 'created_at': file_data['created_at'],
                 'updated_at': file_data['updated_at']
-            })
+            }
+            compressible = is_text_mime(file_data['mime_type'])
+            
+            if read_format == 'msgpack':
+                response = Response(msgpack.packb(result, use_bin_type=True), mimetype='application/msgpack')
+            elif read_format == 'cbor':
+                response = Response(cbor2.dumps(result), mimetype='application/cbor')
+            else:
+                # JSON carries text; content that is not UTF-8 is sent base64-encoded
+                try:
+                    result['content'] = result['content'].decode('utf-8')
+                except UnicodeDecodeError:
+                    result['content'] = base64.b64encode(result['content']).decode('ascii')
+                    result['encoding'] = 'base64'
+                response = jsonify(result)
+                compressible = True
+            
+            response.vary.add('Accept')
+            return _compress_response(response, compressible)
         except Exception as e:
             eprint(f"Error reading virtual file: {e}")
             return jsonify({'error': 'Failed to read file'}), 500
 
     @app.route('/api/virtual-files/serve/<path:file_path>', methods=['GET'])
     def serve_virtual_file(file_path):
-        """Serve a file directly to the browser with memory-efficient streaming"""
+        """Serve a file directly to the browser with byte ranges, conditional requests and streaming"""
         try:
             # Ensure path starts with /
             if not file_path.startswith('/'):
                 file_path = '/' + file_path
 
-            # Use streaming read for memory efficiency
-            stream_result = managers['virtual_file_manager'].read_file_streaming(file_path)
-            if not stream_result:
+            vfs = managers['virtual_file_manager']
+            metadata = vfs.get_file_info(file_path)
+            if not metadata or metadata['is_directory']:
                 return jsonify({'error': 'File not found'}), 404
 
-            metadata, content_generator = stream_result
             mime_type = metadata['mime_type'] or 'application/octet-stream'
+            size = metadata['size']
+
+            # The stored SHA-256 is the entity tag (empty files are stored without one)
+            etag = metadata['hash'] or hashlib.sha256(b'').hexdigest()
+            last_modified = _parse_timestamp(metadata['updated_at'])
 
             # Check if this is a download request
             download = request.args.get('download', 'false').lower() == 'true'
 
-            print(f"🎯 Serving file: {file_path} ({metadata['size']} bytes, chunked={metadata['is_chunked']})")
+            def finish(response):
+                """Attach the headers shared by every response for this file."""
+                # Compressed bodies are a different representation, so their tag is weak
+                response.set_etag(etag, weak='Content-Encoding' in response.headers)
+                response.vary.add('Accept-Encoding')
+                if download:
+                    response.headers['Content-Disposition'] = f'attachment; filename="{metadata["name"]}"'
+                else:
+                    response.headers['Content-Disposition'] = f'inline; filename="{metadata["name"]}"'
+                if last_modified:
+                    response.last_modified = last_modified
+                response.headers['Cache-Control'] = 'no-cache'
+                response.headers['Accept-Ranges'] = 'bytes'
+                return response
 
-            # Create streaming response
-            response = Response(content_generator, mimetype=mime_type)
-            
-            if download:
-                response.headers['Content-Disposition'] = f'attachment; filename="{metadata["name"]}"'
-            else:
-                response.headers['Content-Disposition'] = f'inline; filename="{metadata["name"]}"'
-            
-            response.headers['Content-Length'] = str(metadata['size'])
-            response.headers['Cache-Control'] = 'no-cache'
-            response.headers['Accept-Ranges'] = 'bytes'
-            
-            return response
+            if _is_not_modified(etag, last_modified):
+                return finish(Response(status=304))
+
+            ranges = None
+            if request.range and _if_range_matches(etag, last_modified):
+                ranges = _resolve_byte_ranges(request.range, size)
+
+            if ranges == []:
+                response = finish(Response(status=416))
+                response.headers['Content-Range'] = f'bytes */{size}'
+                return response
+
+            if not ranges:
+                # Content stored compressed goes out as-is when the client accepts its encoding
+                response = _stored_encoding_response(vfs, file_path, mime_type)
+                if response is not None:
+                    print(f"🎯 Serving stored {response.headers['Content-Encoding']} bytes of {file_path}")
+                    return finish(response)
+
+                # Use streaming read for memory efficiency
+                stream_result = vfs.read_file_streaming(file_path)
+                if not stream_result:
+                    return jsonify({'error': 'File not found'}), 404
+
+                metadata, content_generator = stream_result
+                print(f"🎯 Serving file: {file_path} ({metadata['size']} bytes, chunked={metadata['is_chunked']})")
+
+                # Create streaming response
+                response = Response(content_generator, mimetype=mime_type)
+                response.headers['Content-Length'] = str(metadata['size'])
+                return finish(response)
+
+            if len(ranges) == 1:
+                start, stop = ranges[0]
+                range_generator = vfs.read_file_range(file_path, start, stop)
+                if range_generator is None:
+                    return jsonify({'error': 'File not found'}), 404
+
+                print(f"🎯 Serving range {start}-{stop - 1}/{size} of {file_path}")
+
+                response = Response(range_generator, status=206, mimetype=mime_type)
+                response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+                response.headers['Content-Length'] = str(stop - start)
+                return finish(response)
+
+            # Several ranges: multipart/byteranges body
+            boundary = uuid.uuid4().hex
+            part_headers = [
+                (f'--{boundary}\r\nContent-Type: {mime_type}\r\n'
+                 f'Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n').encode()
+                for start, stop in ranges
+            ]
+            closing = f'--{boundary}--\r\n'.encode()
+            content_length = sum(len(header) + (stop - start) + 2
+                                 for header, (start, stop) in zip(part_headers, ranges)) + len(closing)
+
+            def multipart_generator():
+                """Yield each requested range wrapped in its part headers."""
+                for header, (start, stop) in zip(part_headers, ranges):
+                    yield header
+                    yield from vfs.read_file_range(file_path, start, stop) or ()
+                    yield b'\r\n'
+                yield closing
+
+            print(f"🎯 Serving {len(ranges)} ranges of {file_path}")
+
+            response = Response(multipart_generator(), status=206,
+                                content_type=f'multipart/byteranges; boundary={boundary}')
+            response.headers['Content-Length'] = str(content_length)
+            return finish(response)
             
         except Exception as e:
             eprint(f"❌ Error serving virtual file: {e}")
@@ -351,21 +836,269 @@ def register_virtual_file_routes(app, managers):
             if dest_info:
                 return jsonify({'error': f'Destination path {new_path} already exists'}), 400
             
-            success = managers['virtual_file_manager'].rename_path(old_path, new_path)
-            if success:
+            stats = managers['virtual_file_manager'].rename_path_with_stats(old_path, new_path)
+            if stats:
                 return jsonify({
                     'message': f'Successfully renamed {old_path} to {new_path}',
                     'old_path': old_path,
-                    'new_path': new_path
+                    'new_path': new_path,
+                    'items_updated': stats['rows_updated'],
+                    'duration_ms': stats['duration_ms']
                 })
             else:
                 return jsonify({'error': f'Failed to rename {old_path} to {new_path}'}), 500
+        except QuotaExceededError as e:
+            return _quota_exceeded_response(e)
         except Exception as e:
             eprint(f"Error renaming virtual item: {e}")
             import traceback
             traceback.print_exc()
             return jsonify({'error': 'Failed to rename item'}), 500
 
+    @app.route('/api/virtual-files/copy', methods=['POST'])
+    def copy_virtual_item():
+        """Copy a file or directory subtree on the server"""
+        try:
+            data = request.json
+            source_path = data.get('source_path')
+            destination_path = data.get('destination_path')
+            
+            if not source_path or not destination_path:
+                return jsonify({'error': 'Both source_path and destination_path are required'}), 400
+            
+            # Ensure paths start with /
+            if not source_path.startswith('/'):
+                source_path = '/' + source_path
+            if not destination_path.startswith('/'):
+                destination_path = '/' + destination_path
+            
+            # Extract the new filename from the destination path and validate it
+            new_filename = destination_path.split('/')[-1]
+            is_valid, error_message = validate_filename(new_filename)
+            if not is_valid:
+                return jsonify({'error': error_message}), 400
+            
+            # Check if source exists
+            source_info = managers['virtual_file_manager'].get_file_info(source_path)
+            if not source_info:
+                return jsonify({'error': f'Source path {source_path} does not exist'}), 404
+            
+            # Check if destination already exists
+            dest_info = managers['virtual_file_manager'].get_file_info(destination_path)
+            if dest_info:
+                return jsonify({'error': f'Destination path {destination_path} already exists'}), 400
+            
+            stats = managers['virtual_file_manager'].copy_path(source_path, destination_path)
+            if stats:
+                return jsonify({
+                    'message': f'Successfully copied {source_path} to {destination_path}',
+                    'source_path': source_path,
+                    'destination_path': destination_path,
+                    'items_copied': stats['items_copied'],
+                    'chunks_copied': stats['chunks_copied'],
+                    'duration_ms': stats['duration_ms']
+                }), 201
+            else:
+                return jsonify({'error': f'Failed to copy {source_path} to {destination_path}'}), 400
+        except QuotaExceededError as e:
+            return _quota_exceeded_response(e)
+        except Exception as e:
+            eprint(f"Error copying virtual item: {e}")
+            import traceback
+            traceback.print_exc()
+            return jsonify({'error': 'Failed to copy item'}), 500
+
+    @app.route('/api/virtual-files/export', methods=['GET'])
+    def export_virtual_files():
+        """Download a file or directory subtree as a tar or zip archive, generated while streaming"""
+        try:
+            path = request.args.get('path', '/')
+            archive_format = request.args.get('format', 'tar').lower()
+            
+            try:
+                archive = managers['virtual_file_manager'].export_archive(path, archive_format)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if archive is None:
+                return jsonify({'error': f'Path {path} not found'}), 404
+            
+            name = path.rstrip('/').split('/')[-1] or 'vfs'
+            response = Response(archive,
+                                mimetype='application/zip' if archive_format == 'zip' else 'application/x-tar')
+            response.headers['Content-Disposition'] = f'attachment; filename="{name}.{archive_format}"'
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+        except Exception as e:
+            eprint(f"Error exporting virtual files: {e}")
+            import traceback
+            traceback.print_exc()
+            return jsonify({'error': 'Failed to export files'}), 500
+
+    @app.route('/api/virtual-files/import', methods=['POST'])
+    @monitor_performance(threshold=5.0)
+    def import_virtual_files():
+        """
+        Unpack a tar (.tar, .tar.gz, ...) or zip archive into a directory in one transaction.
+        The body is received in full before the transaction starts.
+        
+        The archive is sent as the 'file' field of a multipart form or as the raw
+        request body. Query/form parameters: path (target directory, default /),
+        format (tar or zip; guessed from the uploaded file name, tar otherwise)
+        and overwrite=true to replace existing files.
+        """
+        try:
+            params = request.form if request.files else request.args
+            path = params.get('path') or request.args.get('path', '/')
+            overwrite = str(params.get('overwrite') or request.args.get('overwrite', 'false')).lower() == 'true'
+            archive_format = params.get('format') or request.args.get('format')
+            
+            if request.files:
+                if 'file' not in request.files:
+                    return jsonify({'error': 'No file provided'}), 400
+                upload = request.files['file']
+                stream = upload.stream
+                if not archive_format:
+                    archive_format = 'zip' if (upload.filename or '').lower().endswith('.zip') else 'tar'
+            else:
+                stream = request.stream
+            archive_format = (archive_format or 'tar').lower()
+            
+            try:
+                stats = managers['virtual_file_manager'].import_archive(path, stream, archive_format, overwrite=overwrite)
+            except QuotaExceededError as e:
+                return _quota_exceeded_response(e)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            return jsonify({
+                'message': f"Imported {stats['files_created']} files into {stats['path']}",
+                **stats
+            }), 201
+        except Exception as e:
+            eprint(f"Error importing virtual files: {e}")
+            import traceback
+            traceback.print_exc()
+            return jsonify({'error': 'Failed to import archive'}), 500
+
+    @app.route('/api/virtual-files/batch', methods=['POST'])
+    @monitor_performance(threshold=2.0)
+    def batch_virtual_files():
+        """Apply many mkdir/create/write/delete/rename operations in one transaction"""
+        try:
+            data = request.json or {}
+            operations = data.get('operations')
+            atomic = data.get('atomic', True)
+            
+            if not isinstance(operations, list) or not operations:
+                return jsonify({'error': 'operations must be a non-empty list'}), 400
+            if len(operations) > MAX_BATCH_OPERATIONS:
+                return jsonify({'error': f'A batch can contain at most {MAX_BATCH_OPERATIONS} operations'}), 400
+            if not isinstance(atomic, bool):
+                return jsonify({'error': 'atomic must be true or false'}), 400
+            
+            batch = []
+            for index, operation in enumerate(operations):
+                if not isinstance(operation, dict):
+                    return jsonify({'error': f'Operation {index} must be an object'}), 400
+                operation = dict(operation)
+                
+                # Ensure paths start with /
+                for key in ('path', 'new_path'):
+                    value = operation.get(key)
+                    if isinstance(value, str) and value and not value.startswith('/'):
+                        operation[key] = '/' + value
+                
+                # New names are validated like the single-item endpoints do
+                op = operation.get('op')
+                new_name_path = operation.get('new_path') if op == 'rename' else operation.get('path')
+                if op in ('mkdir', 'create', 'rename') and isinstance(new_name_path, str):
+                    is_valid, error_message = validate_filename(new_name_path.split('/')[-1])
+                    if not is_valid:
+                        return jsonify({'error': f'Operation {index}: {error_message}'}), 400
+                
+                # Binary content is sent base64-encoded
+                if op in ('create', 'write'):
+                    content = operation.get('content', '')
+                    if not isinstance(content, str):
+                        return jsonify({'error': f'Operation {index}: content must be a string'}), 400
+                    if operation.pop('encoding', None) == 'base64':
+                        try:
+                            operation['content'] = base64.b64decode(content, validate=True)
+                        except (binascii.Error, ValueError):
+                            return jsonify({'error': f'Operation {index}: content is not valid base64'}), 400
+                    else:
+                        operation['content'] = content.encode('utf-8')
+                
+                batch.append(operation)
+            
+            result = managers['virtual_file_manager'].apply_batch(batch, atomic=atomic)
+            status = 200 if result['committed'] else 400
+            if not result['committed'] and any(op.get('quota_exceeded') for op in result['results']):
+                status = 507
+            return jsonify(result), status
+                
+        except Exception as e:
+            eprint(f"Error applying virtual file batch: {e}")
+            import traceback
+            traceback.print_exc()
+            return jsonify({'error': f'Failed to apply batch: {str(e)}'}), 500
+
+    @app.route('/api/virtual-files/usage', methods=['GET'])
+    def get_virtual_usage():
+        """Get the total size and item counts below a directory, and its quota if it has one"""
+        try:
+            path = request.args.get('path', '/')
+            usage = managers['virtual_file_manager'].get_usage(path)
+            if not usage:
+                return jsonify({'error': f'Directory {path} not found'}), 404
+            return jsonify(usage)
+        except Exception as e:
+            eprint(f"Error getting virtual usage: {e}")
+            return jsonify({'error': 'Failed to get usage'}), 500
+    
+    @app.route('/api/virtual-files/quotas', methods=['GET'])
+    def list_virtual_quotas():
+        """List directory quotas with their current usage"""
+        try:
+            return jsonify({'quotas': managers['virtual_file_manager'].get_quotas()})
+        except Exception as e:
+            eprint(f"Error listing virtual quotas: {e}")
+            return jsonify({'error': 'Failed to list quotas'}), 500
+    
+    @app.route('/api/virtual-files/quotas', methods=['PUT'])
+    def set_virtual_quota():
+        """Set the quota of a directory (max_bytes and/or max_items; null means unlimited)"""
+        try:
+            data = request.json or {}
+            path = data.get('path')
+            if not path:
+                return jsonify({'error': 'path is required'}), 400
+            if not path.startswith('/'):
+                path = '/' + path
+            
+            try:
+                quota = managers['virtual_file_manager'].set_quota(path, data.get('max_bytes'), data.get('max_items'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify(quota)
+        except Exception as e:
+            eprint(f"Error setting virtual quota: {e}")
+            return jsonify({'error': 'Failed to set quota'}), 500
+    
+    @app.route('/api/virtual-files/quotas', methods=['DELETE'])
+    def remove_virtual_quota():
+        """Remove the quota of a directory"""
+        try:
+            path = request.args.get('path')
+            if not path:
+                return jsonify({'error': 'path is required'}), 400
+            if not managers['virtual_file_manager'].remove_quota(path):
+                return jsonify({'error': f'No quota set on {path}'}), 404
+            return jsonify({'message': f'Quota removed from {path}'})
+        except Exception as e:
+            eprint(f"Error removing virtual quota: {e}")
+            return jsonify({'error': 'Failed to remove quota'}), 500
+    
     @app.route('/api/virtual-files/info/<path:item_path>', methods=['GET'])
     def get_virtual_item_info(item_path):
         """Get information about a file or directory"""
@@ -418,12 +1151,68 @@ def register_virtual_file_routes(app, managers):
             else:
                 return jsonify({'error': f'Failed to {operation.rstrip("d")} file {file_path}'}), 500
                 
+        except QuotaExceededError as e:
+            return _quota_exceeded_response(e)
         except Exception as e:
             eprint(f"Error writing virtual file: {e}")
             import traceback
             traceback.print_exc()
             return jsonify({'error': f'Failed to write file: {str(e)}'}), 500
 
+    @app.route('/api/virtual-files/write/<path:file_path>', methods=['PATCH'])
+    @monitor_critical_performance(threshold=0.3)  # VFS writes should be under 300ms
+    def patch_virtual_file(file_path):
+        """Patch part of a file: replace `length` bytes at `offset`, or append when no offset is given"""
+        try:
+            # Ensure path starts with /
+            if not file_path.startswith('/'):
+                file_path = '/' + file_path
+            
+            data = request.json or {}
+            if not isinstance(data, dict):
+                return jsonify({'error': 'Request body must be a JSON object'}), 400
+            content = data.get('content', '')
+            offset = data.get('offset')
+            length = data.get('length')
+            
+            if not isinstance(content, str):
+                return jsonify({'error': 'content must be a string'}), 400
+            
+            # Binary patches are sent base64-encoded
+            if data.get('encoding') == 'base64':
+                try:
+                    content_bytes = base64.b64decode(content, validate=True)
+                except (binascii.Error, ValueError):
+                    return jsonify({'error': 'content is not valid base64'}), 400
+            else:
+                content_bytes = content.encode('utf-8')
+            
+            for name, value in (('offset', offset), ('length', length)):
+                if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+                    return jsonify({'error': f'{name} must be a non-negative integer'}), 400
+            if offset is None and length is not None:
+                return jsonify({'error': 'length requires an offset'}), 400
+            
+            if not managers['virtual_file_manager'].get_file_info(file_path):
+                return jsonify({'error': f'File {file_path} not found'}), 404
+            
+            result = managers['virtual_file_manager'].patch_file(file_path, content_bytes, offset, length)
+            if not result:
+                return jsonify({'error': f'Failed to patch file {file_path}'}), 400
+            
+            return jsonify({
+                'message': f'File {file_path} patched successfully',
+                **result
+            })
+                
+        except QuotaExceededError as e:
+            return _quota_exceeded_response(e)
+        except Exception as e:
+            eprint(f"Error patching virtual file: {e}")
+            import traceback
+            traceback.print_exc()
+            return jsonify({'error': f'Failed to patch file: {str(e)}'}), 500
+
     @app.route('/api/virtual-files/write-test/<path:file_path>', methods=['PUT'])
     def write_virtual_file_test(file_path):
         """Test endpoint for writing/updating file content"""
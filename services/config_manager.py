@@ -64,10 +64,8 @@ class ServiceConfigManager:
             
         config_path = self.get_config_path(service_id)
         
-        if not self.vfs_manager.get_file_info(config_path):
-            return {}
-        
         try:
+            # read_file returns None for a missing config, so no separate existence check
             file_data = self.vfs_manager.read_file(config_path)
             if file_data and file_data['content']:
                 content = file_data['content'].decode('utf-8')
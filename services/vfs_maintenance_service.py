@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+VFS Maintenance Service - Keeps the VFS database compact and healthy
+"""
+
+import time
+from services.base_service import ServiceBase
+
+
+class VFSMaintenanceService(ServiceBase):
+    """
+    VFS Maintenance Service that reclaims free pages, checkpoints the WALs and
+    checks the VFS metadata and blob databases for corruption while the system
+    is running.
+    
+    Free pages are returned with incremental_vacuum in small steps, sleeping
+    between steps for a multiple of the time each one took, so the short write
+    transactions never hold off foreground writers for long.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.total_runs = 0
+        self.pages_vacuumed = 0
+        self.bytes_reclaimed = 0
+        self.checkpoints = 0
+        self.busy_checkpoints = 0
+        self.quick_checks = 0
+        self.quick_check_problems = []
+        self.orphan_sweeps = 0
+        self.missing_blobs = 0
+        self.converted_to_incremental = False
+        self.last_run_time = None
+        self.last_checkpoint_time = 0
+        self.last_quick_check_time = 0
+        self.last_sweep_time = 0
+        self.last_storage_stats = {}
+    
+    def on_start(self):
+        """Called when service starts."""
+        self._log('info', "VFS Maintenance Service starting up...")
+    
+    def on_stop(self):
+        """Called when service stops."""
+        self._log('info', "VFS Maintenance Service shutting down...")
+    
+    def get_stats(self):
+        """Return service-specific statistics."""
+        storage = self.last_storage_stats
+        return {
+            'total_runs': self.total_runs,
+            'pages_vacuumed': self.pages_vacuumed,
+            'bytes_reclaimed': self.bytes_reclaimed,
+            'checkpoints': self.checkpoints,
+            'busy_checkpoints': self.busy_checkpoints,
+            'quick_checks': self.quick_checks,
+            'quick_check_ok': not self.quick_check_problems,
+            'orphan_sweeps': self.orphan_sweeps,
+            'missing_blobs': self.missing_blobs,
+            'converted_to_incremental': self.converted_to_incremental,
+            'last_run_time': self.last_run_time,
+            'database_file_size': storage.get('file_size', 0),
+            'database_used_size': storage.get('used_size', 0),
+            'database_free_size': storage.get('free_size', 0),
+            'free_ratio': storage.get('free_ratio', 0.0),
+            'wal_size': storage.get('wal_size', 0),
+            'auto_vacuum': storage.get('auto_vacuum'),
+            'databases': storage.get('databases', {})
+        }
+    
+    def _log(self, level, message, details=None):
+        """Log through the logs manager, falling back to stderr."""
+        if self.logs_manager:
+            try:
+                self.logs_manager.log(
+                    level=level,
+                    message=message,
+                    component='services',
+                    source='vfs_maintenance_service',
+                    details=details
+                )
+                return
+            except Exception as e:
+                eprint(f"Failed to log: {e}")
+        eprint(f"VFS Maintenance Service: {message}")
+    
+    def _checkpoint(self, storage):
+        """Truncate the WAL on schedule, or early once it grows past the threshold."""
+        checkpoint_interval = self.config.get('checkpoint_interval', 300)
+        wal_threshold = self.config.get('wal_truncate_threshold_mb', 64) * 1024 * 1024
+        
+        due = time.time() - self.last_checkpoint_time >= checkpoint_interval
+        if not due and storage['wal_size'] < wal_threshold:
+            return
+        
+        # A short busy timeout: if readers keep the WAL pinned, try again next run
+        result = self.vfs_manager.checkpoint_wal(
+            'TRUNCATE', busy_timeout=self.config.get('checkpoint_busy_timeout', 2)
+        )
+        self.checkpoints += 1
+        self.last_checkpoint_time = time.time()
+        if result['busy']:
+            self.busy_checkpoints += 1
+            self._log('debug', "WAL checkpoint could not complete, database busy",
+                      details={'wal_size': storage['wal_size'], **result})
+        else:
+            self._log('debug', "WAL checkpoint completed",
+                      details={'wal_size_before': storage['wal_size'], **result})
+    
+    def _convert_to_incremental(self, storage):
+        """One-off VACUUM that enables incremental vacuum on databases created without it."""
+        if not self.config.get('convert_to_incremental', True):
+            return False
+        if storage['free_ratio'] < self.config.get('convert_min_free_ratio', 0.25):
+            return False
+        
+        self._log('info', "Rebuilding VFS database to enable incremental vacuum",
+                  details={'file_size': storage['file_size'], 'free_size': storage['free_size']})
+        
+        start_time = time.time()
+        if not self.vfs_manager.enable_incremental_vacuum():
+            self._log('error', "Failed to enable incremental vacuum")
+            return False
+        
+        self.converted_to_incremental = True
+        after = self.vfs_manager.get_storage_stats()
+        self.bytes_reclaimed += max(storage['file_size'] - after['file_size'], 0)
+        self._log('info', "VFS database rebuilt with incremental vacuum", details={
+            'file_size_before': storage['file_size'],
+            'file_size_after': after['file_size'],
+            'duration_seconds': round(time.time() - start_time, 2)
+        })
+        return True
+    
+    def _vacuum(self, storage):
+        """Release free pages in throttled steps until few enough remain."""
+        min_free = self.config.get('vacuum_min_free_mb', 4) * 1024 * 1024
+        if storage['free_size'] < min_free:
+            return
+        
+        if storage['auto_vacuum'] != 'incremental':
+            self._convert_to_incremental(storage)
+            return
+        
+        pages_per_step = self.config.get('vacuum_pages_per_step', 256)
+        max_pages = self.config.get('vacuum_max_pages_per_run', 25600)
+        # Fraction of wall time spent vacuuming while a run is in progress
+        duty_cycle = min(max(self.config.get('vacuum_duty_cycle', 0.1), 0.01), 1.0)
+        
+        freed_total = 0
+        start_time = time.time()
+        while freed_total < max_pages and not self.should_stop():
+            step_start = time.time()
+            freed = self.vfs_manager.incremental_vacuum(min(pages_per_step, max_pages - freed_total))
+            if not freed:
+                break
+            freed_total += freed
+            step_duration = time.time() - step_start
+            time.sleep(max(step_duration * (1 - duty_cycle) / duty_cycle, 0.01))
+        
+        if freed_total:
+            self.pages_vacuumed += freed_total
+            self.bytes_reclaimed += freed_total * storage['page_size']
+            self._log('info', "Incremental vacuum released free pages", details={
+                'pages': freed_total,
+                'bytes_reclaimed_mb': round(freed_total * storage['page_size'] / (1024 * 1024), 2),
+                'duration_seconds': round(time.time() - start_time, 2)
+            })
+    
+    def _quick_check(self):
+        """Run PRAGMA quick_check on its own, less frequent schedule."""
+        if time.time() - self.last_quick_check_time < self.config.get('quick_check_interval', 86400):
+            return
+        
+        start_time = time.time()
+        problems = self.vfs_manager.quick_check()
+        self.quick_checks += 1
+        self.last_quick_check_time = time.time()
+        self.quick_check_problems = problems
+        
+        if problems:
+            self._log('error', "VFS database failed quick_check",
+                      details={'problems': problems[:20], 'problem_count': len(problems)})
+        else:
+            self._log('debug', "VFS database passed quick_check",
+                      details={'duration_seconds': round(time.time() - start_time, 2)})
+    
+    def _sweep_orphans(self):
+        """Drop chunk, metadata and blob rows left behind by deleted files."""
+        if time.time() - self.last_sweep_time < self.config.get('orphan_sweep_interval', 86400):
+            return
+        
+        result = self.vfs_manager.sweep_orphans()
+        self.orphan_sweeps += 1
+        self.last_sweep_time = time.time()
+        self.missing_blobs = result.get('missing_blobs', 0)
+        if self.missing_blobs:
+            self._log('error', "VFS files reference blobs missing from the blob database", details=result)
+        elif any(result.values()):
+            self._log('info', "Swept orphaned VFS rows", details=result)
+    
+    def _perform_maintenance(self):
+        """Run one maintenance pass."""
+        if not self.vfs_manager:
+            self._log('error', "VFS manager not available for maintenance")
+            return
+        
+        self._sweep_orphans()
+        
+        storage = self.vfs_manager.get_storage_stats()
+        self._checkpoint(storage)
+        self._vacuum(storage)
+        self._quick_check()
+        
+        self.last_storage_stats = self.vfs_manager.get_storage_stats()
+        self.last_run_time = time.time()
+        self.total_runs += 1
+    
+    def _run(self):
+        """Main service loop."""
+        self._log('info', "Main loop started")
+        
+        while not self.should_stop():
+            try:
+                self._perform_maintenance()
+                
+                # Sleep for configured interval
+                check_interval = self.config.get('check_interval', 60)
+                time.sleep(check_interval)
+            
+            except Exception as e:
+                self._log('error', f"Error in main loop: {e}", details={'error': str(e)})
+                self.last_error = str(e)
+                time.sleep(300)  # Wait 5 minutes after an error
+        
+        self._log('info', "Main loop stopped")
@@ -140,8 +140,11 @@ Object.assign(SypnexAPI.prototype, {
      * @param {string} [filters.date] - Date to filter by (YYYY-MM-DD format, defaults to today)
      * @param {number} [filters.limit] - Maximum number of logs to return (default: 100)
      * @param {string} [filters.source] - Source to filter by (app name, plugin name, etc.)
+     * @param {string} [filters.start] - Start of a time range (YYYY-MM-DD or ISO timestamp), may span multiple days
+     * @param {string} [filters.end] - End of a time range (YYYY-MM-DD includes the whole day)
+     * @param {string} [filters.cursor] - Cursor from a previous response's next_cursor to fetch the next page
      * @memberof SypnexAPI.prototype
-     * @returns {Promise<object>} - Log entries and metadata
+     * @returns {Promise<object>} - Log entries, next_cursor/has_more and metadata
      */
     async readLogs(filters = {}) {
         try {
@@ -152,6 +155,9 @@ Object.assign(SypnexAPI.prototype, {
             if (filters.date) params.append('date', filters.date);
             if (filters.limit) params.append('limit', filters.limit.toString());
             if (filters.source) params.append('source', filters.source);
+            if (filters.start) params.append('start', filters.start);
+            if (filters.end) params.append('end', filters.end);
+            if (filters.cursor) params.append('cursor', filters.cursor);
             
             const response = await fetch(`${this.baseUrl}/logs/read?${params.toString()}`);
             
@@ -263,6 +263,70 @@ Object.assign(SypnexAPI.prototype, {
         }
     },
     
+    /**
+     * Watch a virtual file system directory for changes
+     * @param {string} path - Directory to watch (changes anywhere below it are included)
+     * @param {function} callback - Called with {room, path, events} for each batch of changes;
+     *                              events have type (create, write, delete, rename), path,
+     *                              is_directory and, where relevant, hash, size and old_path
+     * @memberof SypnexAPI.prototype
+     * @returns {boolean} - Success status
+     */
+    watchVirtualPath(path, callback) {
+        const roomName = `vfs:${this._normalizeWatchPath(path)}`;
+        if (!this.joinRoom(roomName)) {
+            return false;
+        }
+        
+        if (!this.vfsWatchers) {
+            this.vfsWatchers = new Map();
+        }
+        if (!this.vfsWatchers.has(roomName)) {
+            this.vfsWatchers.set(roomName, []);
+        }
+        this.vfsWatchers.get(roomName).push(callback);
+        
+        // One socket listener dispatches every room's batches to its watchers
+        if (this.vfsWatchSocket !== this.socket) {
+            this.vfsWatchSocket = this.socket;
+            this.socket.on('vfs_changes', (data) => {
+                (this.vfsWatchers.get(data.room) || []).forEach(watcher => {
+                    try {
+                        watcher(data);
+                    } catch (error) {
+                        console.error(`SypnexAPI [${this.appId}]: Error in VFS watch callback:`, error);
+                    }
+                });
+            });
+        }
+        return true;
+    },
+    
+    /**
+     * Stop watching a virtual file system directory
+     * @param {string} path - Directory passed to watchVirtualPath
+     * @memberof SypnexAPI.prototype
+     * @returns {boolean} - Success status
+     */
+    unwatchVirtualPath(path) {
+        const roomName = `vfs:${this._normalizeWatchPath(path)}`;
+        if (this.vfsWatchers) {
+            this.vfsWatchers.delete(roomName);
+        }
+        return this.leaveRoom(roomName);
+    },
+    
+    /**
+     * Normalize a directory path the way the server names watch rooms
+     * @param {string} path - Directory path
+     * @memberof SypnexAPI.prototype
+     * @private
+     */
+    _normalizeWatchPath(path) {
+        const parts = (path || '/').split('/').filter(part => part);
+        return '/' + parts.join('/');
+    },
+    
     /**
      * Send a ping to test connection
      * @memberof SypnexAPI.prototype
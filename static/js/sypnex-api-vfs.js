@@ -26,12 +26,27 @@ Object.assign(SypnexAPI.prototype, {
     /**
      * List files and directories in a path
      * @param {string} path - Directory path (defaults to '/')
+     * @param {object} [options] - Listing options
+     * @param {string} [options.sort='name'] - Sort key: 'name', 'size' or 'mtime' (directories always come first)
+     * @param {string} [options.order='asc'] - 'asc' or 'desc'
+     * @param {number} [options.limit] - Page size; omit to list everything
+     * @param {string} [options.cursor] - next_cursor from the previous page
+     * @param {Array<string>} [options.fields] - Columns to return (e.g. ['name', 'is_directory', 'size'])
+     * @param {boolean} [options.countOnly=false] - Only return child counts
      * @memberof SypnexAPI.prototype
-     * @returns {Promise<object>} - Directory contents
+     * @returns {Promise<object>} - Directory listing with items, total, next_cursor and has_more
      */
-    async listVirtualFiles(path = '/') {
+    async listVirtualFiles(path = '/', options = {}) {
         try {
-            const response = await fetch(`${this.baseUrl}/virtual-files/list?path=${encodeURIComponent(path)}`);
+            const params = new URLSearchParams({ path: path });
+            if (options.sort) params.set('sort', options.sort);
+            if (options.order) params.set('order', options.order);
+            if (options.limit) params.set('limit', options.limit);
+            if (options.cursor) params.set('cursor', options.cursor);
+            if (options.fields) params.set('fields', options.fields.join(','));
+            if (options.countOnly) params.set('count_only', 'true');
+            
+            const response = await fetch(`${this.baseUrl}/virtual-files/list?${params}`);
             if (response.ok) {
                 return await response.json();
             } else {
@@ -43,6 +58,38 @@ Object.assign(SypnexAPI.prototype, {
         }
     },
     
+    /**
+     * Search virtual files by name or content
+     * @param {string} query - Text, glob pattern or words to search for
+     * @param {object} [options] - Search options
+     * @param {string} [options.mode] - 'name' (default), 'prefix', 'glob' or 'content'
+     * @param {string} [options.path] - Only search below this directory
+     * @param {number} [options.limit] - Maximum results to return (up to 200)
+     * @param {number} [options.offset] - Number of results to skip
+     * @memberof SypnexAPI.prototype
+     * @returns {Promise<object>} - Ranked results with has_more for pagination
+     */
+    async searchVirtualFiles(query, options = {}) {
+        try {
+            const params = new URLSearchParams({ q: query });
+            if (options.mode) params.set('mode', options.mode);
+            if (options.path) params.set('path', options.path);
+            if (options.limit) params.set('limit', options.limit);
+            if (options.offset) params.set('offset', options.offset);
+            
+            const response = await fetch(`${this.baseUrl}/virtual-files/search?${params}`);
+            if (response.ok) {
+                return await response.json();
+            } else {
+                const errorData = await response.json();
+                throw new Error(errorData.error || `Failed to search files: ${response.status}`);
+            }
+        } catch (error) {
+            console.error(`SypnexAPI [${this.appId}]: Error searching virtual files:`, error);
+            throw error;
+        }
+    },
+    
     /**
      * Create a new folder
      * @param {string} name - Folder name
@@ -214,27 +261,156 @@ Object.assign(SypnexAPI.prototype, {
         }
     },
 
+    /**
+     * Upload a file through a resumable upload session, sending chunks in parallel
+     * and retrying failed chunks. Pass a previous session ID to resume an upload.
+     * @param {File} file - File object from input element
+     * @param {string} parentPath - Parent directory path (defaults to '/')
+     * @param {object} [options={}] - Upload options
+     * @param {number} [options.concurrency=4] - Number of chunks uploaded at once
+     * @param {number} [options.retries=3] - Attempts per chunk before giving up
+     * @param {string} [options.sessionId] - Session to resume instead of starting a new one
+     * @param {Function} [options.onProgress] - Callback for progress updates (percent, sessionId)
+     * @memberof SypnexAPI.prototype
+     * @returns {Promise<object>} - Upload result
+     */
+    async uploadVirtualFileResumable(file, parentPath = '/', options = {}) {
+        const { concurrency = 4, retries = 3, onProgress = null } = options;
+        const uploadsUrl = `${this.baseUrl}/virtual-files/uploads`;
+        
+        const requestJson = async (url, init, action) => {
+            const response = await fetch(url, init);
+            const data = await response.json();
+            if (!response.ok) {
+                throw new Error(data.error || `Failed to ${action}: ${response.status}`);
+            }
+            return data;
+        };
+        
+        try {
+            // Start a new session, or find out which chunks a previous one still needs
+            const session = options.sessionId
+                ? await requestJson(`${uploadsUrl}/${options.sessionId}`, {}, 'resume upload')
+                : await requestJson(uploadsUrl, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({
+                        filename: file.name,
+                        parent_path: parentPath,
+                        size: file.size,
+                        mime_type: file.type || null
+                    })
+                }, 'start upload');
+            
+            const pending = [...session.missing_chunks];
+            let completed = session.chunk_count - pending.length;
+            const reportProgress = () => {
+                if (onProgress) {
+                    const percent = session.chunk_count ? Math.round((completed / session.chunk_count) * 100) : 100;
+                    onProgress(percent, session.session_id);
+                }
+            };
+            reportProgress();
+            
+            const uploadChunk = async (index) => {
+                const chunk = await file.slice(index * session.chunk_size, (index + 1) * session.chunk_size).arrayBuffer();
+                const digest = await crypto.subtle.digest('SHA-256', chunk);
+                const chunkHash = Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+                
+                for (let attempt = 1; ; attempt++) {
+                    try {
+                        await requestJson(`${uploadsUrl}/${session.session_id}/chunks/${index}`, {
+                            method: 'PUT',
+                            headers: { 'X-Chunk-SHA256': chunkHash },
+                            body: chunk
+                        }, `upload chunk ${index}`);
+                        return;
+                    } catch (error) {
+                        if (attempt >= retries) throw error;
+                    }
+                }
+            };
+            
+            const worker = async () => {
+                while (pending.length) {
+                    await uploadChunk(pending.shift());
+                    completed++;
+                    reportProgress();
+                }
+            };
+            await Promise.all(Array.from({ length: Math.max(1, concurrency) }, worker));
+            
+            return await requestJson(`${uploadsUrl}/${session.session_id}/commit`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({})
+            }, 'commit upload');
+        } catch (error) {
+            console.error(`SypnexAPI [${this.appId}]: Error in resumable upload:`, error);
+            throw error;
+        }
+    },
+
     /**
      * Read a file's content
      * @param {string} filePath - Path to the file
+     * @param {object} [options] - Read options
+     * @param {string} [options.format='json'] - 'json' (text content, base64 with encoding: 'base64' for binary),
+     *   'raw' (content as an ArrayBuffer, metadata from response headers), or 'msgpack'/'cbor'
+     * @param {Function} [options.decode] - Decoder for msgpack/cbor bodies, e.g. MessagePack.decode
      * @memberof SypnexAPI.prototype
      * @returns {Promise<object>} - File data
      */
-    async readVirtualFile(filePath) {
+    async readVirtualFile(filePath, options = {}) {
         try {
-            const response = await fetch(`${this.baseUrl}/virtual-files/read/${encodeURIComponent(filePath.substring(1))}`);
-            if (response.ok) {
-                return await response.json();
-            } else {
+            const format = options.format || 'json';
+            if ((format === 'msgpack' || format === 'cbor') && typeof options.decode !== 'function') {
+                throw new Error(`Reading as ${format} requires an options.decode function`);
+            }
+            
+            const response = await fetch(`${this.baseUrl}/virtual-files/read/${encodeURIComponent(filePath.substring(1))}?format=${format}`);
+            if (!response.ok) {
                 const errorData = await response.json();
                 throw new Error(errorData.error || `Failed to read file: ${response.status}`);
             }
+            
+            if (format === 'raw') {
+                return {
+                    path: response.headers.get('X-VFS-Path'),
+                    name: response.headers.get('X-VFS-Path').split('/').pop(),
+                    content: await response.arrayBuffer(),
+                    size: parseInt(response.headers.get('X-VFS-Size'), 10),
+                    mime_type: response.headers.get('X-VFS-Mime-Type'),
+                    created_at: response.headers.get('X-VFS-Created-At'),
+                    updated_at: response.headers.get('X-VFS-Updated-At')
+                };
+            }
+            if (format === 'msgpack' || format === 'cbor') {
+                return options.decode(new Uint8Array(await response.arrayBuffer()));
+            }
+            return await response.json();
         } catch (error) {
             console.error(`SypnexAPI [${this.appId}]: Error reading virtual file:`, error);
             throw error;
         }
     },
     
+    /**
+     * Fetch a file's raw bytes (no JSON wrapping; text is compressed in transit)
+     * @param {string} filePath - Path to the file
+     * @memberof SypnexAPI.prototype
+     * @returns {Promise<Response>} - Fetch response with the file content as its body
+     * @private
+     */
+    async _fetchVirtualFileRaw(filePath) {
+        const response = await fetch(`${this.baseUrl}/virtual-files/read/${encodeURIComponent(filePath.substring(1))}?format=raw`);
+        if (!response.ok) {
+            const errorData = await response.json();
+            throw new Error(errorData.error || `Failed to read file: ${response.status}`);
+        }
+        return response;
+    },
+    
     /**
      * Get a file's content as text
      * @param {string} filePath - Path to the file
@@ -243,8 +419,8 @@ Object.assign(SypnexAPI.prototype, {
      */
     async readVirtualFileText(filePath) {
         try {
-            const fileData = await this.readVirtualFile(filePath);
-            return fileData.content || '';
+            const response = await this._fetchVirtualFileRaw(filePath);
+            return await response.text();
         } catch (error) {
             console.error(`SypnexAPI [${this.appId}]: Error reading virtual file text:`, error);
             throw error;
@@ -259,8 +435,8 @@ Object.assign(SypnexAPI.prototype, {
      */
     async readVirtualFileJSON(filePath) {
         try {
-            const content = await this.readVirtualFileText(filePath);
-            return JSON.parse(content);
+            const response = await this._fetchVirtualFileRaw(filePath);
+            return await response.json();
         } catch (error) {
             console.error(`SypnexAPI [${this.appId}]: Error reading virtual file JSON:`, error);
             throw error;
@@ -319,6 +495,120 @@ Object.assign(SypnexAPI.prototype, {
         }
     },
     
+    /**
+     * Copy a file or directory on the server without downloading its content
+     * @param {string} sourcePath - Path of the item to copy
+     * @param {string} destinationPath - Path of the new copy
+     * @memberof SypnexAPI.prototype
+     * @returns {Promise<object>} - Copy result with item and chunk counts
+     */
+    async copyVirtualItem(sourcePath, destinationPath) {
+        try {
+            const response = await fetch(`${this.baseUrl}/virtual-files/copy`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    source_path: sourcePath,
+                    destination_path: destinationPath
+                })
+            });
+            
+            if (response.ok) {
+                return await response.json();
+            } else {
+                const errorData = await response.json();
+                throw new Error(errorData.error || `Failed to copy item: ${response.status}`);
+            }
+        } catch (error) {
+            console.error(`SypnexAPI [${this.appId}]: Error copying virtual item:`, error);
+            throw error;
+        }
+    },
+    
+    /**
+     * Get a download URL for a file or directory as a tar or zip archive
+     * @param {string} path - File or directory to export
+     * @param {string} [format='tar'] - 'tar' or 'zip'
+     * @memberof SypnexAPI.prototype
+     * @returns {string} - URL that streams the archive
+     */
+    getVirtualExportUrl(path, format = 'tar') {
+        const params = new URLSearchParams({ path: path, format: format });
+        return `${this.baseUrl}/virtual-files/export?${params}`;
+    },
+    
+    /**
+     * Unpack a tar (.tar, .tar.gz, ...) or zip archive into a directory in one transaction
+     * @param {File|Blob} archive - Archive to import
+     * @param {string} [targetPath='/'] - Existing directory to unpack into
+     * @param {object} [options] - Import options
+     * @param {string} [options.format] - 'tar' or 'zip' (guessed from the file name by default)
+     * @param {boolean} [options.overwrite=false] - Replace files that already exist
+     * @memberof SypnexAPI.prototype
+     * @returns {Promise<object>} - Import result with file, directory and byte counts
+     */
+    async importVirtualArchive(archive, targetPath = '/', options = {}) {
+        try {
+            const formData = new FormData();
+            formData.append('file', archive);
+            formData.append('path', targetPath);
+            if (options.format) formData.append('format', options.format);
+            if (options.overwrite) formData.append('overwrite', 'true');
+            
+            const response = await fetch(`${this.baseUrl}/virtual-files/import`, {
+                method: 'POST',
+                body: formData
+            });
+            
+            if (response.ok) {
+                return await response.json();
+            } else {
+                const errorData = await response.json();
+                throw new Error(errorData.error || `Failed to import archive: ${response.status}`);
+            }
+        } catch (error) {
+            console.error(`SypnexAPI [${this.appId}]: Error importing archive:`, error);
+            throw error;
+        }
+    },
+    
+    /**
+     * Apply many VFS operations in a single server-side transaction
+     * @param {Array<object>} operations - Items like {op: 'mkdir'|'create'|'write'|'delete'|'rename', path, content?, encoding?, new_path?}
+     * @param {object} [options] - Batch options
+     * @param {boolean} [options.atomic=true] - Roll back every operation if any one fails
+     * @memberof SypnexAPI.prototype
+     * @returns {Promise<object>} - Batch result with one entry per operation
+     */
+    async batchVirtualFiles(operations, options = {}) {
+        try {
+            const response = await fetch(`${this.baseUrl}/virtual-files/batch`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    operations: operations,
+                    atomic: options.atomic !== false
+                })
+            });
+            
+            const result = await response.json();
+            if (response.ok) {
+                return result;
+            } else {
+                const error = new Error(result.error || `Failed to apply batch: ${response.status}`);
+                error.results = result.results;
+                throw error;
+            }
+        } catch (error) {
+            console.error(`SypnexAPI [${this.appId}]: Error applying virtual file batch:`, error);
+            throw error;
+        }
+    },
+    
     /**
      * Get information about a file or directory
      * @param {string} itemPath - Path to the item
@@ -353,6 +643,27 @@ Object.assign(SypnexAPI.prototype, {
         }
     },
     
+    /**
+     * Get the storage used below a directory and its quota, if it has one
+     * @param {string} [path='/'] - Directory path
+     * @memberof SypnexAPI.prototype
+     * @returns {Promise<object>} - { path, size, files, directories, quota: { max_bytes, max_items } | null }
+     */
+    async getVirtualUsage(path = '/') {
+        try {
+            const response = await fetch(`${this.baseUrl}/virtual-files/usage?path=${encodeURIComponent(path)}`);
+            if (response.ok) {
+                return await response.json();
+            } else {
+                const errorData = await response.json();
+                throw new Error(errorData.error || `Failed to get usage: ${response.status}`);
+            }
+        } catch (error) {
+            console.error(`SypnexAPI [${this.appId}]: Error getting virtual usage:`, error);
+            throw error;
+        }
+    },
+    
     /**
      * Check if a file or directory exists
      * @param {string} itemPath - Path to the item
@@ -401,6 +712,50 @@ Object.assign(SypnexAPI.prototype, {
         }
     },
     
+    /**
+     * Patch part of an existing file without rewriting it
+     * @param {string} filePath - Path to the file
+     * @param {string} content - Content to write at the offset
+     * @param {object} [options={}] - Patch options
+     * @param {number} [options.offset] - Byte offset to write at (omit to append)
+     * @param {number} [options.length] - Bytes to replace at the offset (defaults to the content length)
+     * @param {string} [options.encoding] - 'base64' when content is base64-encoded binary data
+     * @memberof SypnexAPI.prototype
+     * @returns {Promise<object>} - Patch result with the new size and hash
+     */
+    async patchVirtualFile(filePath, content, options = {}) {
+        try {
+            const response = await fetch(`${this.baseUrl}/virtual-files/write${filePath}`, {
+                method: 'PATCH',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ content, ...options })
+            });
+            
+            if (response.ok) {
+                return await response.json();
+            } else {
+                const errorData = await response.json();
+                throw new Error(errorData.error || `Failed to patch file: ${response.status}`);
+            }
+        } catch (error) {
+            console.error(`SypnexAPI [${this.appId}]: Error patching virtual file:`, error);
+            throw error;
+        }
+    },
+    
+    /**
+     * Append content to the end of an existing file
+     * @param {string} filePath - Path to the file
+     * @param {string} content - Content to append
+     * @memberof SypnexAPI.prototype
+     * @returns {Promise<object>} - Patch result with the new size and hash
+     */
+    async appendVirtualFile(filePath, content) {
+        return await this.patchVirtualFile(filePath, content);
+    },
+    
     /**
      * Write JSON content to a file
      * @param {string} filePath - Path to the file
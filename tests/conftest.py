@@ -0,0 +1,64 @@
+"""
+Shared fixtures for the Sypnex OS test suite
+"""
+import builtins
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# eprint is installed as a builtin by utils.print_interceptor when the app starts
+if not hasattr(builtins, 'eprint'):
+    builtins.eprint = lambda *args, **kwargs: print(*args, file=sys.stderr, **kwargs)
+
+from core.virtual_file_manager import VirtualFileManager
+
+
+@pytest.fixture
+def vfs(tmp_path):
+    """A VirtualFileManager on a fresh database in a temporary directory."""
+    manager = VirtualFileManager(str(tmp_path / 'virtual_files.db'))
+    yield manager
+    manager.close()
+
+
+def recount_usage(vfs, path):
+    """(size, files, directories) below a directory, counted from the rows themselves."""
+    lower, upper = vfs._subtree_range(path)
+    with vfs._connection() as conn:
+        return conn.execute('''
+            SELECT COALESCE(SUM(size), 0), COALESCE(SUM(is_directory = 0), 0), COALESCE(SUM(is_directory = 1), 0)
+            FROM virtual_files WHERE path >= ? AND path < ? AND path != ?
+        ''', (lower, upper, path)).fetchone()
+
+
+def inconsistent_directories(vfs):
+    """Directories whose stored usage counters differ from a recount."""
+    with vfs._connection() as conn:
+        rows = conn.execute('''
+            SELECT path, subtree_size, subtree_files, subtree_dirs FROM virtual_files WHERE is_directory = 1
+        ''').fetchall()
+    return [(path, tuple(counters), tuple(recount_usage(vfs, path)))
+            for path, *counters in rows if tuple(counters) != tuple(recount_usage(vfs, path))]
+
+
+@pytest.fixture
+def logs(vfs, tmp_path):
+    """A LogsManager on a fresh logs database, next to the vfs fixture's database."""
+    from core.logs_manager import LogsManager
+    manager = LogsManager(vfs, db_path=str(tmp_path / 'logs.db'), flush_interval=0.05)
+    yield manager
+    manager.shutdown()
+    manager.pool.close_all()
+
+
+@pytest.fixture
+def client(vfs):
+    """A Flask test client with the virtual file routes registered against the vfs fixture."""
+    from flask import Flask
+    from routes.virtual_files import register_virtual_file_routes
+    app = Flask(__name__)
+    register_virtual_file_routes(app, {'virtual_file_manager': vfs})
+    return app.test_client()
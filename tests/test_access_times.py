@@ -0,0 +1,101 @@
+"""
+Deferred, batched accessed_at updates
+"""
+import time
+
+import pytest
+
+from core.virtual_file_manager import AccessTimeBuffer, VirtualFileManager
+
+
+class Recorder:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def __call__(self, updates):
+        if self.fail:
+            raise RuntimeError('database is locked')
+        self.batches.append(sorted(file_id for _, file_id in updates))
+
+
+def test_strict_mode_coalesces_reads_per_flush():
+    recorder = Recorder()
+    buffer = AccessTimeBuffer(recorder, mode='strict', flush_interval=3600)
+    for _ in range(5):
+        buffer.record(1)
+    buffer.record(2)
+
+    assert recorder.batches == []
+    assert buffer.flush() == 2
+    assert recorder.batches == [[1, 2]]
+    assert buffer.flush() == 0
+    buffer.close()
+
+
+def test_relatime_skips_recent_access_times():
+    recorder = Recorder()
+    buffer = AccessTimeBuffer(recorder, mode='relatime', flush_interval=3600)
+    now = AccessTimeBuffer._timestamp()
+    day_ago = AccessTimeBuffer._timestamp(2 * 24 * 3600)
+
+    buffer.record(1, accessed_at=now, updated_at=day_ago)      # Read since the last change: skipped
+    buffer.record(2, accessed_at=day_ago, updated_at=now)      # Changed since the last read
+    buffer.record(3, accessed_at=day_ago, updated_at=day_ago)  # Last read long ago
+    buffer.flush()
+
+    assert recorder.batches == [[2, 3]]
+    assert buffer.stats['skipped'] == 1
+    buffer.close()
+
+
+def test_off_mode_records_nothing():
+    recorder = Recorder()
+    buffer = AccessTimeBuffer(recorder, mode='off')
+    buffer.record(1)
+    buffer.close()
+    assert recorder.batches == []
+    with pytest.raises(ValueError):
+        AccessTimeBuffer(recorder, mode='sometimes')
+
+
+def test_failed_flushes_keep_pending_times():
+    recorder = Recorder(fail=True)
+    buffer = AccessTimeBuffer(recorder, mode='strict', flush_interval=3600)
+    buffer.record(1)
+    assert buffer.flush() == 0
+    assert buffer.stats['flush_errors'] == 1
+
+    recorder.fail = False
+    assert buffer.flush() == 1
+    assert recorder.batches == [[1]]
+    buffer.close()
+
+
+def test_full_buffer_wakes_the_flush_thread():
+    recorder = Recorder()
+    buffer = AccessTimeBuffer(recorder, mode='strict', flush_interval=3600, max_pending=3)
+    for file_id in range(3):
+        buffer.record(file_id)
+    deadline = time.monotonic() + 5
+    while not recorder.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert recorder.batches == [[0, 1, 2]]
+    buffer.close()
+
+
+def test_reads_write_accessed_at_on_flush(tmp_path):
+    vfs = VirtualFileManager(str(tmp_path / 'virtual_files.db'), atime_mode='strict', atime_flush_interval=3600)
+    try:
+        vfs.create_file('/a.txt', b'a')
+        with vfs._connection() as conn:
+            conn.execute("UPDATE virtual_files SET accessed_at = '2000-01-01 00:00:00' WHERE path = '/a.txt'")
+            conn.commit()
+        vfs.cache.clear()
+
+        vfs.read_file('/a.txt')
+        assert vfs.get_file_info('/a.txt')['accessed_at'] == '2000-01-01 00:00:00'
+        vfs.access_times.flush()
+        assert vfs.get_file_info('/a.txt')['accessed_at'] > '2000-01-01 00:00:00'
+    finally:
+        vfs.close()
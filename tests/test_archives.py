@@ -0,0 +1,112 @@
+"""
+Tar and zip export and import of VFS subtrees
+"""
+import io
+import os
+import sqlite3
+import tarfile
+from datetime import datetime
+
+import pytest
+
+
+def build_tree(vfs):
+    vfs.create_directory('/docs')
+    vfs.create_directory('/docs/empty')
+    vfs.create_directory('/docs/sub')
+    files = {
+        '/docs/readme.txt': b'read me',
+        '/docs/sub/data.bin': os.urandom(5000),
+        '/docs/sub/big.bin': os.urandom(vfs.CHUNK_SIZE + 77),
+        '/docs/sub/empty.txt': b''
+    }
+    for path, content in files.items():
+        vfs.create_file(path, content)
+    return files
+
+
+class UnseekableStream(io.RawIOBase):
+    """A request-body-like stream that checks nothing holds the write lock while it is read."""
+
+    def __init__(self, data, db_path):
+        self.data = io.BytesIO(data)
+        self.db_path = db_path
+        self.lock_checks = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        conn = sqlite3.connect(self.db_path, timeout=0)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.rollback()
+            self.lock_checks += 1
+        finally:
+            conn.close()
+        data = self.data.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+@pytest.mark.parametrize('archive_format', ['tar', 'zip'])
+def test_export_import_round_trip(vfs, archive_format):
+    files = build_tree(vfs)
+    archive = b''.join(vfs.export_archive('/docs', archive_format))
+
+    vfs.create_directory('/restored')
+    stats = vfs.import_archive('/restored', io.BytesIO(archive), archive_format)
+    assert stats['files_created'] == len(files)
+    assert stats['bytes_imported'] == sum(len(content) for content in files.values())
+
+    for path, content in files.items():
+        assert vfs.read_file('/restored' + path)['content'] == content
+    assert vfs.get_file_info('/restored/docs/empty')['is_directory']
+
+    # Zip stores times with two-second resolution
+    imported = datetime.fromisoformat(vfs.get_file_info('/restored/docs/readme.txt')['updated_at'])
+    original = datetime.fromisoformat(vfs.get_file_info('/docs/readme.txt')['updated_at'])
+    assert abs((imported - original).total_seconds()) <= (2 if archive_format == 'zip' else 0)
+
+
+@pytest.mark.parametrize('archive_format', ['tar', 'zip'])
+def test_unseekable_uploads_are_spooled_before_the_write_lock(vfs, archive_format):
+    build_tree(vfs)
+    archive = b''.join(vfs.export_archive('/docs', archive_format))
+    vfs.create_directory('/restored')
+
+    stream = UnseekableStream(archive, vfs.db_path)
+    stats = vfs.import_archive('/restored', io.BufferedReader(stream), archive_format)
+    assert stream.lock_checks > 0
+    assert stats['files_created'] == 4
+
+
+def test_import_refuses_conflicts_and_unsafe_names(vfs):
+    build_tree(vfs)
+    archive = b''.join(vfs.export_archive('/docs', 'tar'))
+    with pytest.raises(ValueError):
+        vfs.import_archive('/', io.BytesIO(archive), 'tar')
+    assert vfs.import_archive('/', io.BytesIO(archive), 'tar', overwrite=True)['files_replaced'] == 4
+
+    unsafe = io.BytesIO()
+    with tarfile.open(fileobj=unsafe, mode='w') as archive_file:
+        member = tarfile.TarInfo('../escape.txt')
+        member.size = 1
+        archive_file.addfile(member, io.BytesIO(b'x'))
+    with pytest.raises(ValueError):
+        vfs.import_archive('/docs', io.BytesIO(unsafe.getvalue()), 'tar')
+    assert vfs.get_file_info('/escape.txt') is None
+
+    with pytest.raises(ValueError):
+        vfs.import_archive('/docs', io.BytesIO(b'not an archive'), 'zip')
+
+
+def test_import_route_accepts_a_raw_tar_body(client, vfs):
+    build_tree(vfs)
+    archive = b''.join(vfs.export_archive('/docs', 'tar'))
+    vfs.create_directory('/restored')
+
+    response = client.post('/api/virtual-files/import?path=/restored', data=archive,
+                           content_type='application/x-tar')
+    assert response.status_code == 201
+    assert vfs.read_file('/restored/docs/readme.txt')['content'] == b'read me'
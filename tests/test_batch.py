@@ -0,0 +1,60 @@
+"""
+apply_batch atomicity
+"""
+
+
+def test_atomic_batch_rolls_back_on_failure(vfs):
+    result = vfs.apply_batch([
+        {'op': 'mkdir', 'path': '/batch'},
+        {'op': 'create', 'path': '/batch/a.txt', 'content': b'a'},
+        {'op': 'create', 'path': '/missing/b.txt', 'content': b'b'},
+        {'op': 'create', 'path': '/batch/c.txt', 'content': b'c'}
+    ])
+
+    assert result['committed'] is False
+    assert [op['success'] for op in result['results']] == [False, False, False, False]
+    assert vfs.get_file_info('/batch') is None
+    assert vfs.read_file('/batch/a.txt') is None
+
+
+def test_non_atomic_batch_keeps_successful_operations(vfs):
+    result = vfs.apply_batch([
+        {'op': 'mkdir', 'path': '/batch'},
+        {'op': 'create', 'path': '/missing/b.txt', 'content': b'b'},
+        {'op': 'create', 'path': '/batch/c.txt', 'content': b'c'}
+    ], atomic=False)
+
+    assert result['committed'] is True
+    assert [op['success'] for op in result['results']] == [True, False, True]
+    assert vfs.read_file('/batch/c.txt')['content'] == b'c'
+    assert vfs.read_file('/missing/b.txt') is None
+
+
+def test_batch_commits_every_operation(vfs):
+    vfs.create_file('/old.txt', b'old')
+    result = vfs.apply_batch([
+        {'op': 'mkdir', 'path': '/batch'},
+        {'op': 'create', 'path': '/batch/a.txt', 'content': b'a'},
+        {'op': 'write', 'path': '/batch/a.txt', 'content': b'rewritten'},
+        {'op': 'rename', 'path': '/old.txt', 'new_path': '/batch/old.txt'},
+        {'op': 'delete', 'path': '/batch/old.txt'}
+    ])
+
+    assert result['committed'] is True
+    assert vfs.read_file('/batch/a.txt')['content'] == b'rewritten'
+    assert vfs.get_file_info('/old.txt') is None
+    assert vfs.get_file_info('/batch/old.txt') is None
+
+
+def test_rolled_back_batch_leaves_counters_and_blobs_alone(vfs):
+    vfs.create_directory('/batch')
+    before = vfs.get_usage('/batch')
+
+    vfs.apply_batch([
+        {'op': 'create', 'path': '/batch/big.bin', 'content': b'z' * (3 * 1024 * 1024)},
+        {'op': 'delete', 'path': '/nonexistent'}
+    ])
+
+    assert vfs.get_usage('/batch') == before
+    with vfs._connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM blobs').fetchone()[0] == 0
@@ -0,0 +1,97 @@
+"""
+Change feed delivery to in-process listeners
+"""
+import threading
+import time
+
+from core.virtual_file_manager import ChangeFeed
+
+
+def collect(vfs):
+    batches = []
+    vfs.add_change_listener(batches.append)
+    return batches
+
+
+def flattened(batches):
+    return [(event['type'], event['path']) for batch in batches for event in batch]
+
+
+def test_committed_changes_are_delivered_in_order(vfs):
+    batches = collect(vfs)
+    vfs.create_directory('/dir')
+    vfs.create_file('/dir/a.txt', b'a')
+    vfs.write_file('/dir/a.txt', b'aa')  # merges into the pending create
+    vfs.rename_path('/dir/a.txt', '/dir/b.txt')
+    vfs.delete_path('/dir/b.txt')
+    vfs.changes.flush()
+
+    assert flattened(batches) == [('create', '/dir'), ('create', '/dir/a.txt'),
+                                  ('rename', '/dir/b.txt'), ('delete', '/dir/b.txt')]
+    events = [event for batch in batches for event in batch]
+    assert events[0]['is_directory'] is True
+    assert events[2]['old_path'] == '/dir/a.txt'
+    assert vfs.changes.get_stats()['coalesced'] == 1
+
+
+def test_batch_events_wait_for_commit_and_vanish_on_rollback(vfs):
+    batches = collect(vfs)
+    vfs.apply_batch([
+        {'op': 'create', 'path': '/a.txt', 'content': b'a'},
+        {'op': 'create', 'path': '/missing/b.txt', 'content': b'b'}
+    ])
+    vfs.changes.flush()
+    assert flattened(batches) == []
+
+    vfs.apply_batch([
+        {'op': 'create', 'path': '/a.txt', 'content': b'a'},
+        {'op': 'delete', 'path': '/a.txt'}
+    ])
+    vfs.changes.flush()
+    assert flattened(batches) == [('create', '/a.txt'), ('delete', '/a.txt')]
+
+
+def test_slow_listener_does_not_block_writers(vfs):
+    release = threading.Event()
+    delivered = []
+
+    def slow(events):
+        release.wait(5)
+        delivered.extend(events)
+
+    vfs.changes.interval = 0
+    vfs.add_change_listener(slow)
+    try:
+        started = time.perf_counter()
+        for i in range(5):
+            vfs.create_file(f'/file{i}.txt', b'x')
+        assert time.perf_counter() - started < 2
+    finally:
+        release.set()
+    vfs.changes.close()
+    assert sorted(event['path'] for event in delivered) == [f'/file{i}.txt' for i in range(5)]
+
+
+def test_backlog_cap_drops_and_counts_new_events():
+    feed = ChangeFeed(interval=60, max_pending=2, max_backlog=3)
+    batches = []
+    feed.add_listener(batches.append)
+    feed._full.clear()
+    # Hold the delivery thread back so the backlog can build up
+    with feed._lock:
+        feed._thread = threading.Thread()
+    for i in range(5):
+        feed.publish({'type': 'delete', 'path': f'/f{i}'})
+
+    assert feed.get_stats()['dropped'] == 2
+    assert feed.flush() == 3
+    assert [event['path'] for event in batches[0]] == ['/f0', '/f1', '/f2']
+
+
+def test_removed_listener_gets_nothing(vfs):
+    batches = collect(vfs)
+    vfs.remove_change_listener(batches.append)
+    vfs.create_file('/a.txt', b'a')
+    vfs.changes.flush()
+    assert batches == []
+    assert vfs.changes.get_stats()['published'] == 0
@@ -0,0 +1,80 @@
+"""
+Transparent per-file compression of stored blobs
+"""
+import os
+
+import pytest
+
+from core.virtual_file_manager import STORAGE_CODECS, VirtualFileManager
+
+
+def stored_codecs(vfs):
+    with vfs._connection() as conn:
+        return dict(conn.execute('''
+            SELECT vf.path, b.codec FROM virtual_files vf JOIN blobs b ON b.hash = vf.blob_hash
+        ''').fetchall())
+
+
+def test_text_is_compressed_and_media_is_not(vfs):
+    text = b'compress me please ' * 200
+    vfs.create_file('/notes.txt', text)
+    vfs.create_file('/config.json', b'{"key": "value"}' * 100)
+    vfs.create_file('/photo.png', b'\x89PNG' + b'\x00' * 4000)
+    vfs.create_file('/tiny.txt', b'too small to bother')
+    vfs.create_file('/noise.txt', os.urandom(4000))
+
+    codecs = stored_codecs(vfs)
+    assert codecs['/notes.txt'] == 'gzip'
+    assert codecs['/config.json'] == 'gzip'
+    assert codecs['/photo.png'] is None
+    assert codecs['/tiny.txt'] is None
+    # Content that does not shrink is stored as-is
+    assert codecs['/noise.txt'] is None
+
+    assert vfs.read_file('/notes.txt')['content'] == text
+    assert vfs.read_file('/notes.txt')['size'] == len(text)
+    assert vfs.read_file_stored('/notes.txt', ['gzip'])[0] == 'gzip'
+    assert vfs.read_file_stored('/photo.png', ['gzip']) is None
+
+
+def test_compressed_chunks_read_back_and_slice(vfs):
+    text = (b'0123456789abcdef' * 4096) * 40
+    vfs.create_file('/big.txt', text)
+
+    assert vfs.read_file('/big.txt')['content'] == text
+    assert b''.join(vfs.read_file_range('/big.txt', vfs.CHUNK_SIZE - 7, vfs.CHUNK_SIZE + 9)) == \
+        text[vfs.CHUNK_SIZE - 7:vfs.CHUNK_SIZE + 9]
+    with vfs._connection() as conn:
+        stored, original = conn.execute('SELECT SUM(length(data)), SUM(size) FROM blobs').fetchone()
+    assert stored < original / 10
+
+
+@pytest.mark.parametrize('codec', sorted(STORAGE_CODECS))
+def test_every_codec_round_trips(tmp_path, codec):
+    vfs = VirtualFileManager(str(tmp_path / 'virtual_files.db'), compression=codec)
+    try:
+        text = b'round trip ' * 500
+        vfs.create_file('/notes.txt', text)
+        assert stored_codecs(vfs)['/notes.txt'] == codec
+        assert vfs.read_file('/notes.txt')['content'] == text
+    finally:
+        vfs.close()
+
+
+def test_compression_can_be_turned_off(tmp_path):
+    vfs = VirtualFileManager(str(tmp_path / 'virtual_files.db'), compression=None)
+    try:
+        vfs.create_file('/notes.txt', b'plain text ' * 500)
+        assert stored_codecs(vfs)['/notes.txt'] is None
+    finally:
+        vfs.close()
+
+    # Blobs written compressed stay readable whatever the current setting
+    vfs = VirtualFileManager(str(tmp_path / 'other.db'), compression='gzip')
+    vfs.create_file('/notes.txt', b'plain text ' * 500)
+    vfs.close()
+    vfs = VirtualFileManager(str(tmp_path / 'other.db'), compression=None)
+    try:
+        assert vfs.read_file('/notes.txt')['content'] == b'plain text ' * 500
+    finally:
+        vfs.close()
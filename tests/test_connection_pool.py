@@ -0,0 +1,89 @@
+"""
+Pooled connections and reads that span several of them
+"""
+import os
+import threading
+
+import pytest
+
+from core.virtual_file_manager import FileChangedError, SQLiteConnectionPool
+
+
+def test_nested_use_shares_one_connection(tmp_path):
+    pool = SQLiteConnectionPool(str(tmp_path / 'pool.db'), pool_size=2)
+    with pool.connection() as outer:
+        with pool.connection() as inner:
+            assert inner is outer
+    with pool.connection() as again:
+        assert again is outer
+    pool.close_all()
+
+
+def test_threads_get_their_own_connections(tmp_path):
+    pool = SQLiteConnectionPool(str(tmp_path / 'pool.db'), pool_size=4)
+    seen = []
+    barrier = threading.Barrier(3)
+
+    def worker():
+        with pool.connection() as conn:
+            seen.append(conn)
+            barrier.wait()
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(map(id, seen))) == 3
+    pool.close_all()
+
+
+def test_stream_aborts_when_a_chunked_file_is_rewritten(vfs):
+    content = os.urandom(3 * vfs.CHUNK_SIZE)
+    vfs.create_file('/big.bin', content)
+
+    metadata, chunks = vfs.read_file_streaming('/big.bin')
+    assert next(chunks) == content[:vfs.CHUNK_SIZE]
+
+    vfs.write_file('/big.bin', os.urandom(3 * vfs.CHUNK_SIZE))
+    with pytest.raises(FileChangedError):
+        list(chunks)
+
+
+def test_stream_aborts_when_a_chunked_file_is_patched(vfs):
+    content = os.urandom(3 * vfs.CHUNK_SIZE)
+    vfs.create_file('/big.bin', content)
+
+    metadata, chunks = vfs.read_file_streaming('/big.bin')
+    assert next(chunks) == content[:vfs.CHUNK_SIZE]
+
+    vfs.patch_file('/big.bin', b'patched', offset=vfs.CHUNK_SIZE - 3)
+    with pytest.raises(FileChangedError):
+        list(chunks)
+
+
+def test_range_aborts_when_the_file_changes(vfs):
+    content = os.urandom(3 * vfs.CHUNK_SIZE)
+    vfs.create_file('/big.bin', content)
+    vfs.create_file('/small.txt', b'0123456789')
+
+    big_range = vfs.read_file_range('/big.bin', 10, 2 * vfs.CHUNK_SIZE + 10)
+    small_range = vfs.read_file_range('/small.txt', 2, 5)
+    assert next(big_range) == content[10:vfs.CHUNK_SIZE]
+
+    vfs.write_file('/big.bin', b'short now')
+    vfs.write_file('/small.txt', b'abcdefghij')
+    with pytest.raises(FileChangedError):
+        list(big_range)
+    with pytest.raises(FileChangedError):
+        list(small_range)
+
+
+def test_unchanged_files_stream_completely(vfs):
+    content = os.urandom(2 * vfs.CHUNK_SIZE + 5)
+    vfs.create_file('/big.bin', content)
+
+    metadata, chunks = vfs.read_file_streaming('/big.bin')
+    assert b''.join(chunks) == content
+    assert b''.join(vfs.read_file_range('/big.bin', 5, vfs.CHUNK_SIZE + 7)) == content[5:vfs.CHUNK_SIZE + 7]
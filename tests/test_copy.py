@@ -0,0 +1,67 @@
+"""
+Server-side copies that share blobs with their source
+"""
+import os
+
+from tests.conftest import inconsistent_directories
+
+
+def blob_stats(vfs):
+    with vfs._connection() as conn:
+        return conn.execute('SELECT COUNT(*), COALESCE(SUM(ref_count), 0) FROM blobs').fetchone()
+
+
+def test_copied_subtree_shares_blobs(vfs):
+    vfs.create_directory('/src')
+    vfs.create_directory('/src/sub')
+    files = {
+        '/src/a.txt': b'inline content',
+        '/src/sub/big.bin': os.urandom(2 * vfs.CHUNK_SIZE + 1),
+        '/src/sub/empty.txt': b''
+    }
+    for path, content in files.items():
+        vfs.create_file(path, content)
+    blobs, refs = blob_stats(vfs)
+
+    stats = vfs.copy_path('/src', '/dst')
+    assert stats['items_copied'] == 5
+    assert stats['chunks_copied'] == 3
+
+    # Same blobs, one more reference each
+    assert blob_stats(vfs) == (blobs, 2 * refs)
+    for path, content in files.items():
+        assert vfs.read_file('/dst' + path[len('/src'):])['content'] == content
+    assert inconsistent_directories(vfs) == []
+
+    # Either side can go without affecting the other
+    vfs.delete_path('/src')
+    assert blob_stats(vfs) == (blobs, refs)
+    assert vfs.read_file('/dst/sub/big.bin')['content'] == files['/src/sub/big.bin']
+    vfs.write_file('/dst/a.txt', b'changed')
+    assert vfs.sweep_orphans()['missing_blobs'] == 0
+
+
+def test_copy_refuses_bad_targets(vfs):
+    vfs.create_directory('/src')
+    vfs.create_file('/src/a.txt', b'a')
+    vfs.create_file('/taken.txt', b't')
+
+    assert vfs.copy_path('/src', '/src/inside') is None
+    assert vfs.copy_path('/', '/root-copy') is None
+    assert vfs.copy_path('/src/a.txt', '/taken.txt') is None
+    assert vfs.copy_path('/missing', '/other') is None
+    assert vfs.read_file('/taken.txt')['content'] == b't'
+
+
+def test_copy_route(client, vfs):
+    vfs.create_file('/a.txt', b'a')
+
+    response = client.post('/api/virtual-files/copy', json={'source_path': '/a.txt', 'destination_path': '/b.txt'})
+    assert response.status_code == 201
+    assert response.get_json()['items_copied'] == 1
+    assert vfs.read_file('/b.txt')['content'] == b'a'
+
+    response = client.post('/api/virtual-files/copy', json={'source_path': '/a.txt', 'destination_path': '/b.txt'})
+    assert response.status_code == 400
+    response = client.post('/api/virtual-files/copy', json={'source_path': '/nope', 'destination_path': '/c.txt'})
+    assert response.status_code == 404
@@ -0,0 +1,89 @@
+"""
+The hot-file LRU cache and its invalidation
+"""
+from core.virtual_file_manager import FileCache
+
+
+def result(content):
+    return {'content': content}
+
+
+def test_lru_eviction_by_size():
+    cache = FileCache(max_bytes=100, max_entry_bytes=60)
+    cache.put('/a', (1, 'ha', 't'), result(b'a' * 40))
+    cache.put('/b', (2, 'hb', 't'), result(b'b' * 40))
+    assert cache.get('/a', (1, 'ha', 't'))  # /a is now the most recently used
+    cache.put('/c', (3, 'hc', 't'), result(b'c' * 40))
+
+    assert cache.get('/b', (2, 'hb', 't')) is None
+    assert cache.get('/a', (1, 'ha', 't'))['content'] == b'a' * 40
+    assert cache.get_stats()['evictions'] == 1
+    assert cache.get_stats()['bytes'] == 80
+
+    cache.put('/big', (4, 'hbig', 't'), result(b'x' * 61))
+    assert cache.get_stats()['too_large'] == 1
+
+
+def test_entries_only_match_their_exact_version():
+    cache = FileCache(max_bytes=100)
+    cache.put('/a', (1, 'hash', '2026-01-01 00:00:00'), result(b'a'))
+
+    assert cache.get('/a', (2, 'hash', '2026-01-01 00:00:00')) is None
+    assert cache.get('/a', (1, 'other', '2026-01-01 00:00:00')) is None
+    assert cache.get('/a', (1, 'hash', '2026-01-01 00:00:01')) is None
+    assert cache.get('/a', (1, 'hash', '2026-01-01 00:00:00')) is not None
+
+    # Empty files have no hash and are never cached
+    cache.put('/empty', (2, '', 't'), result(b''))
+    assert cache.peek_version('/empty') is None
+
+
+def test_subtree_invalidation():
+    cache = FileCache(max_bytes=100)
+    for path in ('/dir/a', '/dir/sub/b', '/dirty'):
+        cache.put(path, (1, 'h', 't'), result(b'x'))
+    cache.invalidate('/dir', subtree=True)
+    assert cache.peek_version('/dir/a') is None
+    assert cache.peek_version('/dir/sub/b') is None
+    assert cache.peek_version('/dirty') is not None
+
+
+def test_reads_are_served_from_the_cache_until_the_file_changes(vfs):
+    vfs.create_file('/notes.txt', b'first')
+    vfs.read_file('/notes.txt')
+    hits = vfs.cache.get_stats()['hits']
+    assert vfs.read_file('/notes.txt')['content'] == b'first'
+    assert vfs.cache.get_stats()['hits'] == hits + 1
+
+    vfs.write_file('/notes.txt', b'second')
+    assert vfs.read_file('/notes.txt')['content'] == b'second'
+    vfs.patch_file('/notes.txt', b'!')
+    assert vfs.read_file('/notes.txt')['content'] == b'second!'
+
+
+def test_renames_deletes_and_recreates_are_never_served_stale(vfs):
+    vfs.create_directory('/dir')
+    vfs.create_file('/dir/a.txt', b'same bytes')
+    vfs.read_file('/dir/a.txt')
+
+    vfs.rename_path('/dir', '/moved')
+    assert vfs.read_file('/dir/a.txt') is None
+    assert vfs.read_file('/moved/a.txt')['content'] == b'same bytes'
+
+    # Same path and content, but a new file with a different type
+    vfs.delete_path('/moved/a.txt')
+    assert vfs.read_file('/moved/a.txt') is None
+    vfs.create_file('/moved/a.txt', b'same bytes', mime_type='application/x-custom')
+    assert vfs.read_file('/moved/a.txt')['mime_type'] == 'application/x-custom'
+
+
+def test_writes_made_outside_the_manager_are_noticed(vfs):
+    vfs.create_file('/notes.txt', b'cached')
+    vfs.read_file('/notes.txt')
+
+    other = type(vfs)(vfs.db_path)
+    try:
+        other.write_file('/notes.txt', b'written by another process')
+    finally:
+        other.close()
+    assert vfs.read_file('/notes.txt')['content'] == b'written by another process'
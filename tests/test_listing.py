@@ -0,0 +1,78 @@
+"""
+Directory listing pagination, sorting and projection
+"""
+import pytest
+
+
+@pytest.fixture
+def populated(vfs):
+    vfs.create_directory('/dir')
+    for name in ('zeta', 'alpha'):
+        vfs.create_directory(f'/dir/{name}')
+    sizes = {'b.txt': 30, 'a.txt': 10, 'c.txt': 20, 'd.txt': 20, 'e.txt': 0}
+    for name, size in sizes.items():
+        vfs.create_file(f'/dir/{name}', b'x' * size)
+    return vfs
+
+
+def names(page):
+    return [item['name'] for item in page['items']]
+
+
+def walk(vfs, limit, **kwargs):
+    listed, cursor = [], None
+    while True:
+        page = vfs.list_directory_page('/dir', limit=limit, cursor=cursor, **kwargs)
+        listed += names(page)
+        cursor = page['next_cursor']
+        if not page['has_more']:
+            assert cursor is None
+            return listed
+
+
+def test_directories_come_first_in_each_order(populated):
+    assert names(populated.list_directory_page('/dir')) == ['alpha', 'zeta', 'a.txt', 'b.txt', 'c.txt', 'd.txt', 'e.txt']
+    assert names(populated.list_directory_page('/dir', descending=True)) == \
+        ['zeta', 'alpha', 'e.txt', 'd.txt', 'c.txt', 'b.txt', 'a.txt']
+    by_size = names(populated.list_directory_page('/dir', sort='size'))
+    assert by_size[2:] == ['e.txt', 'a.txt', 'c.txt', 'd.txt', 'b.txt']
+
+
+@pytest.mark.parametrize('sort', ['name', 'size', 'mtime'])
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('limit', [1, 2, 3, 7])
+def test_pages_add_up_to_the_full_listing(populated, sort, descending, limit):
+    full = names(populated.list_directory_page('/dir', sort=sort, descending=descending))
+    assert walk(populated, limit, sort=sort, descending=descending) == full
+
+
+def test_fields_limit_the_returned_columns(populated):
+    page = populated.list_directory_page('/dir', fields=['name', 'size'], limit=1)
+    assert page['items'] == [{'name': 'alpha', 'size': 0}]
+
+
+def test_bad_arguments_are_rejected(populated):
+    with pytest.raises(ValueError):
+        populated.list_directory_page('/dir', sort='owner')
+    with pytest.raises(ValueError):
+        populated.list_directory_page('/dir', fields=['content'])
+    with pytest.raises(ValueError):
+        populated.list_directory_page('/dir', limit=0)
+    with pytest.raises(ValueError):
+        populated.list_directory_page('/dir', cursor='garbage')
+    assert populated.list_directory_page('/missing') is None
+
+
+def test_list_route(client, populated):
+    body = client.get('/api/virtual-files/list?path=/dir&limit=3&sort=size&order=desc&fields=name').get_json()
+    assert body['items'] == [{'name': 'zeta'}, {'name': 'alpha'}, {'name': 'b.txt'}]
+    assert body['total'] == 7
+    assert body['has_more']
+
+    body = client.get(f"/api/virtual-files/list?path=/dir&limit=3&sort=size&order=desc&fields=name"
+                      f"&cursor={body['next_cursor']}").get_json()
+    assert len(body['items']) == 3
+
+    assert client.get('/api/virtual-files/list?path=/dir&count_only=true').get_json()['files'] == 5
+    assert client.get('/api/virtual-files/list?path=/dir&sort=owner').status_code == 400
+    assert client.get('/api/virtual-files/list?path=/dir&limit=0').status_code == 400
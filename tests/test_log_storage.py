@@ -0,0 +1,112 @@
+"""
+Append-only log segments, rotation and retention
+"""
+import json
+
+from flask import Flask
+
+from core.logs_manager import LogsManager
+
+
+def entry(timestamp, message='hello', level='INFO'):
+    return {'timestamp': timestamp, 'level': level, 'message': message, 'source': 'test'}
+
+
+def segments(logs):
+    with logs.pool.connection() as conn:
+        return conn.execute('''
+            SELECT component_type, log_date, segment, entry_count FROM log_segments
+            ORDER BY component_type, log_date, segment
+        ''').fetchall()
+
+
+def test_entries_rotate_into_new_segments(logs):
+    logs.max_file_size = 1000
+    logs.max_segments = 3
+    batch = [('core-os', entry(f'2026-01-01T00:00:{index % 60:02d}Z', 'x' * 80)) for index in range(60)]
+
+    rotations = logs._append_entries(batch)
+
+    kept = segments(logs)
+    assert rotations > logs.max_segments
+    assert len(kept) == logs.max_segments
+    with logs.pool.connection() as conn:
+        stored = conn.execute('SELECT COUNT(*) FROM log_entries').fetchone()[0]
+        sizes = conn.execute('SELECT size_bytes FROM log_segments').fetchall()
+    assert stored == sum(row[3] for row in kept)
+    assert all(size <= logs.max_file_size for size, in sizes)
+
+
+def test_days_and_components_get_their_own_segments(logs):
+    logs._append_entries([
+        ('core-os', entry('2026-01-01T10:00:00Z')),
+        ('core-os', entry('2026-01-02T10:00:00Z')),
+        ('services', entry('2026-01-02T11:00:00Z'))
+    ])
+    assert segments(logs) == [
+        ('core-os', '2026-01-01', 0, 1),
+        ('core-os', '2026-01-02', 0, 1),
+        ('services', '2026-01-02', 0, 1)
+    ]
+
+
+def test_drop_segments_by_date_and_size(logs):
+    for day in range(1, 6):
+        logs._append_entries([('core-os', entry(f'2026-01-0{day}T00:00:00Z', 'y' * 100)) for _ in range(10)])
+
+    result = logs.drop_segments(before_date='2026-01-03')
+    assert result['segments_deleted'] == 2
+    assert result['entries_deleted'] == 20
+    assert [row[1] for row in segments(logs)] == ['2026-01-03', '2026-01-04', '2026-01-05']
+
+    with logs.pool.connection() as conn:
+        day_size = conn.execute("SELECT size_bytes FROM log_segments WHERE log_date = '2026-01-05'").fetchone()[0]
+    result = logs.drop_segments(max_total_bytes=day_size)
+    assert result['segments_deleted'] == 2
+    assert [row[1] for row in segments(logs)] == ['2026-01-05']
+    entries, _ = logs.query_logs()
+    assert len(entries) == 10
+
+
+def test_legacy_vfs_log_files_are_imported(vfs, tmp_path):
+    vfs.create_directory('/logs')
+    vfs.create_directory('/logs/services')
+    lines = [json.dumps(entry(f'2025-06-01T00:00:0{index}Z', f'old {index}')) for index in range(3)]
+    vfs.create_file('/logs/services/2025-06-01.log', ('\n'.join(lines) + '\nnot json\n').encode())
+
+    logs = LogsManager(vfs, db_path=str(tmp_path / 'logs.db'))
+    try:
+        entries, _ = logs.query_logs(components=['services'])
+        assert sorted(item['message'] for item in entries) == ['old 0', 'old 1', 'old 2']
+        assert vfs.get_file_info('/logs/services/2025-06-01.log') is None
+    finally:
+        logs.shutdown()
+        logs.pool.close_all()
+
+
+def test_clear_route_drops_segments(logs):
+    logs._append_entries([
+        ('core-os', entry('2026-01-01T00:00:00Z')),
+        ('services', entry('2026-01-01T00:00:00Z'))
+    ])
+    app = Flask(__name__)
+    logs.register_routes(app)
+
+    response = app.test_client().delete('/api/logs/clear?component=core-os')
+    assert response.status_code == 200
+    assert response.get_json()['cleared_files'] == ['/logs/core-os/2026-01-01.log']
+    assert [row[0] for row in segments(logs)] == ['services']
+
+
+def test_cleanup_service_applies_retention(logs):
+    from services.log_cleanup_service import LogCleanupService
+
+    logs._append_entries([('core-os', entry('2020-01-01T00:00:00Z')), ('core-os', entry('2999-01-01T00:00:00Z'))])
+    service = LogCleanupService()
+    service.logs_manager = logs
+    service.config = {'retention_days': 14, 'max_total_size_mb': 256}
+
+    service._perform_cleanup()
+
+    assert service.get_stats()['last_scan_segments_deleted'] == 1
+    assert '2020-01-01' not in [row[1] for row in segments(logs)]
@@ -0,0 +1,77 @@
+"""
+The background log writer and its bounded queue
+"""
+import time
+
+from core.logs_manager import LogsManager
+
+
+def count_entries(logs):
+    with logs.pool.connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM log_entries').fetchone()[0]
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_entries_are_written_in_batches(logs):
+    for index in range(200):
+        assert logs.log('info', f'message {index}')
+    assert logs.flush(timeout=5)
+
+    stats = logs.get_writer_stats()
+    assert count_entries(logs) == 200
+    assert stats['written'] == 200
+    assert stats['batches'] < 200
+    assert stats['running']
+
+
+def test_full_queue_drops_entries(vfs, tmp_path):
+    logs = LogsManager(vfs, db_path=str(tmp_path / 'logs.db'), queue_size=2, flush_interval=0.05, batch_size=1)
+    try:
+        # Stall the writer inside its first batch so the queue fills up behind it
+        with logs.write_lock:
+            assert logs.log('info', 'taken by the writer')
+            wait_until(lambda: logs.queue.qsize() == 0)
+            assert logs.log('info', 'queued 1')
+            assert logs.log('info', 'queued 2')
+            assert not logs.log('info', 'dropped')
+
+        assert logs.flush(timeout=5)
+        assert logs.get_writer_stats()['dropped'] == 1
+        assert count_entries(logs) == 3
+    finally:
+        logs.shutdown()
+        logs.pool.close_all()
+
+
+def test_block_policy_waits_for_room(vfs, tmp_path):
+    logs = LogsManager(vfs, db_path=str(tmp_path / 'logs.db'), queue_size=1, flush_interval=0.05,
+                       overflow_policy='block')
+    try:
+        for index in range(20):
+            assert logs.log('info', f'message {index}')
+        assert logs.flush(timeout=5)
+        assert count_entries(logs) == 20
+        assert logs.get_writer_stats()['dropped'] == 0
+    finally:
+        logs.shutdown()
+        logs.pool.close_all()
+
+
+def test_shutdown_writes_everything_still_queued(logs):
+    with logs.write_lock:
+        for index in range(50):
+            logs.log('info', f'message {index}')
+    logs.shutdown()
+
+    assert not logs.get_writer_stats()['running']
+    assert count_entries(logs) == 50
+
+    # Without a writer entries are written inline
+    assert logs.log('info', 'after shutdown')
+    assert count_entries(logs) == 51
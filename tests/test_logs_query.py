@@ -0,0 +1,82 @@
+"""
+Log queries, cursor paging and the /api/logs/read route
+"""
+import pytest
+from flask import Flask
+
+
+def write_entries(logs, count, **kwargs):
+    for index in range(count):
+        logs.log(kwargs.get('level', 'info'), f'message {index}', component=kwargs.get('component', 'core-os'),
+                 source=kwargs.get('source', 'system'))
+    assert logs.flush(timeout=5)
+
+
+def test_filters_are_applied(logs):
+    write_entries(logs, 3, level='info', component='core-os')
+    write_entries(logs, 2, level='error', component='services', source='health')
+
+    entries, next_cursor = logs.query_logs(components=['services'])
+    assert len(entries) == 2
+    assert next_cursor is None
+    assert {entry['level'] for entry in entries} == {'ERROR'}
+
+    entries, _ = logs.query_logs(level='info')
+    assert len(entries) == 3
+    entries, _ = logs.query_logs(source='HEALTH')
+    assert len(entries) == 2
+
+
+def test_cursor_pages_through_every_entry_once(logs):
+    write_entries(logs, 25)
+
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        entries, cursor = logs.query_logs(limit=10, cursor=cursor)
+        seen.extend(entry['message'] for entry in entries)
+        pages += 1
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert sorted(seen) == sorted(f'message {index}' for index in range(25))
+    assert seen[0] == 'message 24'
+
+
+@pytest.mark.parametrize('limit', ['ten', '', '1.5', 0, -3, None, True, [10]])
+def test_bad_limits_are_rejected(logs, limit):
+    with pytest.raises(ValueError):
+        logs.query_logs(limit=limit)
+
+
+def test_limit_is_capped(logs):
+    assert logs._parse_limit('50') == 50
+    assert logs._parse_limit(10 ** 9) == logs.MAX_QUERY_LIMIT
+
+
+def test_read_route_validates_limit(logs):
+    write_entries(logs, 5)
+    app = Flask(__name__)
+    logs.register_routes(app)
+    client = app.test_client()
+
+    response = client.get('/api/logs/read?limit=abc')
+    assert response.status_code == 400
+    assert client.get('/api/logs/read?limit=0').status_code == 400
+
+    response = client.get('/api/logs/read?limit=1000000&date=all')
+    assert response.status_code == 200
+    assert response.get_json()['filters']['limit'] == logs.MAX_QUERY_LIMIT
+    assert response.get_json()['total'] == 5
+
+    response = client.get('/api/logs/read?limit=2&date=all')
+    body = response.get_json()
+    assert body['total'] == 2
+    assert body['has_more'] is True
+
+    response = client.get(f"/api/logs/read?limit=2&date=all&cursor={body['next_cursor']}")
+    assert response.get_json()['total'] == 2
+
+    assert client.get('/api/logs/read?cursor=not-a-cursor').status_code == 400
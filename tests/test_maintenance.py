@@ -0,0 +1,81 @@
+"""
+Incremental vacuum, WAL checkpoints and integrity checks
+"""
+import os
+
+import pytest
+
+from services.vfs_maintenance_service import VFSMaintenanceService
+
+
+def fill_and_delete(vfs, count=20, size=64 * 1024):
+    for i in range(count):
+        vfs.create_file(f'/f{i}.bin', os.urandom(size))
+    for i in range(count):
+        vfs.delete_path(f'/f{i}.bin')
+    vfs.sweep_orphans()
+
+
+def test_incremental_vacuum_releases_free_pages(vfs):
+    assert vfs.get_storage_stats()['auto_vacuum'] == 'incremental'
+    fill_and_delete(vfs)
+    before = vfs.get_storage_stats()
+    assert before['freelist_count'] > 0
+
+    released = vfs.incremental_vacuum(max_pages=5)
+    assert released == 5
+    released += vfs.incremental_vacuum(max_pages=before['freelist_count'])
+
+    after = vfs.get_storage_stats()
+    assert released == before['freelist_count']
+    assert after['freelist_count'] == 0
+    assert after['file_size'] == before['file_size'] - released * before['page_size']
+    assert vfs.incremental_vacuum() == 0
+
+
+def test_incremental_vacuum_refuses_to_run_inside_a_transaction(vfs):
+    with vfs._write_transaction():
+        with pytest.raises(RuntimeError):
+            vfs.incremental_vacuum()
+
+    vfs._batch.active = True
+    try:
+        with pytest.raises(RuntimeError):
+            vfs.incremental_vacuum()
+    finally:
+        vfs._batch.active = False
+
+
+def test_truncate_checkpoint_empties_the_wal(vfs):
+    vfs.create_file('/a.bin', os.urandom(256 * 1024))
+    assert vfs.get_storage_stats()['wal_size'] > 0
+
+    result = vfs.checkpoint_wal('truncate')
+    assert result['busy'] is False
+    assert result['checkpointed_pages'] == result['wal_pages']
+    assert vfs.get_storage_stats()['wal_size'] == 0
+
+    with pytest.raises(ValueError):
+        vfs.checkpoint_wal('sideways')
+
+
+def test_quick_check_passes_on_a_healthy_database(vfs):
+    vfs.create_file('/a.txt', b'a')
+    assert vfs.quick_check() == []
+
+
+def test_maintenance_pass_vacuums_checkpoints_and_checks(vfs):
+    fill_and_delete(vfs)
+    service = VFSMaintenanceService()
+    service.vfs_manager = vfs
+    service.config = {'vacuum_min_free_mb': 0, 'vacuum_duty_cycle': 1.0,
+                      'quick_check_interval': 0, 'orphan_sweep_interval': 0}
+
+    service._perform_maintenance()
+
+    stats = service.get_stats()
+    assert stats['pages_vacuumed'] > 0
+    assert stats['bytes_reclaimed'] == stats['pages_vacuumed'] * vfs.get_storage_stats()['page_size']
+    assert stats['checkpoints'] == 1 and stats['busy_checkpoints'] == 0
+    assert stats['quick_checks'] == 1 and stats['quick_check_ok'] is True
+    assert stats['database_free_size'] == 0
@@ -0,0 +1,148 @@
+"""
+Schema migrations from the version 2 layout up to the current version
+"""
+import hashlib
+import os
+import sqlite3
+
+import pytest
+
+from core.virtual_file_manager import VirtualFileManager, blob_store_path
+from tests.conftest import inconsistent_directories
+
+CHUNK = 1024 * 1024
+
+
+def build_version_2_database(db_path, files):
+    """Write a database the way the version 2 VirtualFileManager left it."""
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE virtual_files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            parent_path TEXT,
+            is_directory BOOLEAN DEFAULT 0,
+            size INTEGER DEFAULT 0,
+            content BLOB,
+            mime_type TEXT,
+            hash TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            accessed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_chunked BOOLEAN DEFAULT 0
+        );
+        CREATE TABLE file_metadata (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (file_id) REFERENCES virtual_files(id)
+        );
+        CREATE TABLE file_chunks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_id INTEGER NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            chunk_data BLOB NOT NULL,
+            chunk_size INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (file_id) REFERENCES virtual_files(id) ON DELETE CASCADE,
+            UNIQUE(file_id, chunk_index)
+        );
+        CREATE INDEX idx_virtual_files_path ON virtual_files(path);
+        CREATE INDEX idx_virtual_files_parent ON virtual_files(parent_path);
+        CREATE INDEX idx_file_chunks_file_id ON file_chunks(file_id);
+        PRAGMA user_version = 2;
+    ''')
+
+    conn.execute('''
+        INSERT INTO virtual_files (path, name, parent_path, is_directory, size, mime_type)
+        VALUES ('/', '', NULL, 1, 0, 'inode/directory')
+    ''')
+    for path in ('/home', '/home/docs', '/apps'):
+        parent_path = path.rsplit('/', 1)[0] or '/'
+        conn.execute('''
+            INSERT INTO virtual_files (path, name, parent_path, is_directory, size, mime_type)
+            VALUES (?, ?, ?, 1, 0, 'inode/directory')
+        ''', (path, path.rsplit('/', 1)[1], parent_path))
+
+    for path, content in files.items():
+        parent_path = path.rsplit('/', 1)[0] or '/'
+        is_chunked = len(content) >= CHUNK
+        cursor = conn.execute('''
+            INSERT INTO virtual_files (path, name, parent_path, is_directory, size, content, mime_type, hash, is_chunked)
+            VALUES (?, ?, ?, 0, ?, ?, 'application/octet-stream', ?, ?)
+        ''', (path, path.rsplit('/', 1)[1], parent_path, len(content), None if is_chunked else content,
+              hashlib.sha256(content).hexdigest() if content else '', is_chunked))
+        if is_chunked:
+            for index, offset in enumerate(range(0, len(content), CHUNK)):
+                chunk_data = content[offset:offset + CHUNK]
+                conn.execute('''
+                    INSERT INTO file_chunks (file_id, chunk_index, chunk_data, chunk_size) VALUES (?, ?, ?, ?)
+                ''', (cursor.lastrowid, index, chunk_data, len(chunk_data)))
+    conn.commit()
+    conn.close()
+
+
+def test_version_2_database_migrates_to_current(tmp_path):
+    db_path = str(tmp_path / 'virtual_files.db')
+    shared = b'the same bytes in two files'
+    files = {
+        '/home/a.txt': shared,
+        '/home/docs/b.txt': shared,
+        '/home/docs/empty.txt': b'',
+        '/apps/app.bin': os.urandom(5000),
+        '/home/big.bin': os.urandom(2 * CHUNK + 123)
+    }
+    build_version_2_database(db_path, files)
+
+    vfs = VirtualFileManager(db_path)
+    try:
+        for path, content in files.items():
+            assert vfs.read_file(path)['content'] == content
+
+        assert inconsistent_directories(vfs) == []
+        usage = vfs.get_usage('/home')
+        assert usage['size'] == sum(len(content) for path, content in files.items() if path.startswith('/home/'))
+        assert usage['files'] == 4
+        assert usage['directories'] == 1
+
+        with vfs._connection() as conn:
+            assert conn.execute('PRAGMA user_version').fetchone()[0] == 8
+            assert conn.execute(
+                "SELECT COUNT(*) FROM main.sqlite_master WHERE type = 'table' AND name = 'blobs'").fetchone()[0] == 0
+            assert conn.execute('SELECT ref_count FROM blobs WHERE hash = ?',
+                                (hashlib.sha256(shared).hexdigest(),)).fetchone()[0] == 2
+            assert conn.execute('SELECT COUNT(*) FROM blobs').fetchone()[0] == 5
+
+        assert vfs.sweep_orphans()['missing_blobs'] == 0
+    finally:
+        vfs.close()
+
+    assert os.path.exists(blob_store_path(db_path))
+
+    # Opening the migrated database again must not migrate anything twice
+    vfs = VirtualFileManager(db_path)
+    try:
+        assert vfs.read_file('/home/big.bin')['content'] == files['/home/big.bin']
+        assert inconsistent_directories(vfs) == []
+    finally:
+        vfs.close()
+
+
+def test_missing_blob_database_fails_startup(tmp_path):
+    db_path = str(tmp_path / 'virtual_files.db')
+    vfs = VirtualFileManager(db_path)
+    vfs.create_file('/kept.txt', b'content that lives in the blob database')
+    vfs.close()
+    
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(blob_store_path(db_path) + suffix):
+            os.remove(blob_store_path(db_path) + suffix)
+    
+    with pytest.raises(RuntimeError, match='restore it from a backup'):
+        VirtualFileManager(db_path)
+    # Still refused on the next start, rather than accepting an empty store
+    with pytest.raises(RuntimeError):
+        VirtualFileManager(db_path)
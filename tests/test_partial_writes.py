@@ -0,0 +1,87 @@
+"""
+Offset and append patches, and the PATCH write route
+"""
+import base64
+import hashlib
+import os
+
+import pytest
+
+
+def patch_and_compare(vfs, expected, data, offset=None, length=None):
+    result = vfs.patch_file('/file.bin', data, offset, length)
+    assert result is not None
+    if offset is None:
+        offset, length = len(expected), 0
+    elif length is None:
+        length = len(data)
+    expected[offset:offset + length] = data
+
+    assert result['size'] == len(expected)
+    assert result['hash'] == hashlib.sha256(bytes(expected)).hexdigest()
+    assert vfs.read_file('/file.bin')['content'] == bytes(expected)
+    return result
+
+
+def test_patches_across_chunk_boundaries(vfs):
+    chunk = vfs.CHUNK_SIZE
+    expected = bytearray(os.urandom(3 * chunk + 100))
+    vfs.create_file('/file.bin', bytes(expected))
+
+    result = patch_and_compare(vfs, expected, b'A' * 20, offset=chunk - 10)
+    assert result['is_chunked']
+    assert result['chunks_written'] == 2
+
+    # Replace fewer bytes than written (insert) and more bytes than written (delete)
+    patch_and_compare(vfs, expected, b'B' * 5000, offset=2 * chunk - 3, length=7)
+    patch_and_compare(vfs, expected, b'C', offset=chunk // 2, length=chunk)
+    patch_and_compare(vfs, expected, b'D' * 300)
+    assert vfs.read_file('/file.bin')['size'] == len(expected)
+
+
+def test_inline_file_grows_into_chunks_and_shrinks_back(vfs):
+    expected = bytearray(b'small file')
+    vfs.create_file('/file.bin', bytes(expected))
+
+    result = patch_and_compare(vfs, expected, os.urandom(vfs.CHUNK_SIZE + 10))
+    assert result['is_chunked']
+
+    result = patch_and_compare(vfs, expected, b'', offset=5, length=vfs.CHUNK_SIZE)
+    assert not result['is_chunked']
+
+
+def test_out_of_range_patches_fail(vfs):
+    vfs.create_file('/file.bin', b'0123456789')
+    assert vfs.patch_file('/file.bin', b'x', offset=11) is None
+    assert vfs.patch_file('/missing.bin', b'x') is None
+    assert vfs.read_file('/file.bin')['content'] == b'0123456789'
+
+
+def test_patch_route(client, vfs):
+    vfs.create_file('/notes.txt', b'hello world')
+
+    response = client.patch('/api/virtual-files/write/notes.txt', json={'content': 'HELLO', 'offset': 0})
+    assert response.status_code == 200
+    response = client.patch('/api/virtual-files/write/notes.txt', json={
+        'content': base64.b64encode(b'\x00\xff').decode(), 'encoding': 'base64'})
+    assert response.status_code == 200
+    assert response.get_json()['size'] == 13
+    assert vfs.read_file('/notes.txt')['content'] == b'HELLO world\x00\xff'
+
+
+@pytest.mark.parametrize('body', [
+    {'content': 5},
+    {'content': ['a']},
+    {'content': None},
+    {'content': {'a': 1}},
+    {'content': 'x', 'offset': -1},
+    {'content': 'x', 'offset': '3'},
+    {'content': 'x', 'length': 2},
+    {'content': '!!', 'encoding': 'base64'},
+    ['not', 'an', 'object']
+])
+def test_patch_route_rejects_bad_bodies(client, vfs, body):
+    vfs.create_file('/notes.txt', b'hello world')
+    response = client.patch('/api/virtual-files/write/notes.txt', json=body)
+    assert response.status_code == 400
+    assert vfs.read_file('/notes.txt')['content'] == b'hello world'
@@ -0,0 +1,62 @@
+"""
+Concurrent writers under the striped path locks
+"""
+import threading
+
+from core.virtual_file_manager import PathLockManager
+from tests.conftest import inconsistent_directories
+
+
+def run_threads(target, count):
+    errors = []
+
+    def worker(index):
+        try:
+            target(index)
+        except Exception as e:  # Surface failures from the worker threads
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_same_path_appends_are_serialized(vfs):
+    vfs.create_file('/log.txt', b'')
+
+    def append(index):
+        for _ in range(25):
+            assert vfs.patch_file('/log.txt', b'x' * 10) is not None
+
+    run_threads(append, 8)
+
+    result = vfs.read_file('/log.txt')
+    assert result['size'] == 8 * 25 * 10
+    assert result['content'] == b'x' * (8 * 25 * 10)
+
+
+def test_writers_on_different_paths(vfs):
+    for index in range(8):
+        vfs.create_directory(f'/dir{index}')
+
+    def create(index):
+        for number in range(20):
+            assert vfs.create_file(f'/dir{index}/file{number}.txt', f'{index}-{number}'.encode())
+
+    run_threads(create, 8)
+
+    for index in range(8):
+        assert len(vfs.list_directory(f'/dir{index}')) == 20
+    assert vfs.read_file('/dir3/file7.txt')['content'] == b'3-7'
+    assert inconsistent_directories(vfs) == []
+
+
+def test_lock_is_reentrant_and_covers_several_paths():
+    locks = PathLockManager(stripes=4)
+    with locks.hold('/a', '/b', '/c', '/d', '/e'):
+        with locks.hold('/a'):
+            pass
+    assert locks.get_stats()['acquisitions'] >= 2
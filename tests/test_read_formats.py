@@ -0,0 +1,83 @@
+"""
+Binary-safe read formats on /api/virtual-files/read
+"""
+import base64
+import gzip
+import os
+
+import pytest
+
+from routes import virtual_files as virtual_file_routes
+
+
+def test_json_read_keeps_text_and_base64_encodes_binary(client, vfs):
+    vfs.create_file('/notes.txt', 'héllo'.encode('utf-8'))
+    vfs.create_file('/data.bin', b'\xff\x00\xfe')
+
+    body = client.get('/api/virtual-files/read/notes.txt').get_json()
+    assert body['content'] == 'héllo'
+    assert 'encoding' not in body
+
+    body = client.get('/api/virtual-files/read/data.bin').get_json()
+    assert body['encoding'] == 'base64'
+    assert base64.b64decode(body['content']) == b'\xff\x00\xfe'
+
+
+def test_raw_read_sends_bytes_with_metadata_headers(client, vfs):
+    content = os.urandom(vfs.CHUNK_SIZE + 10)
+    vfs.create_file('/data.bin', content)
+
+    response = client.get('/api/virtual-files/read/data.bin?format=raw')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/octet-stream'
+    assert response.data == content
+    assert response.headers['X-VFS-Size'] == str(len(content))
+    assert response.headers['X-VFS-Path'] == '/data.bin'
+
+    # The Accept header selects the format as well
+    response = client.get('/api/virtual-files/read/data.bin', headers={'Accept': 'application/octet-stream'})
+    assert response.data == content
+
+    etag = response.headers['ETag']
+    response = client.get('/api/virtual-files/read/data.bin?format=raw', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+def test_text_reads_are_compressed_when_accepted(client, vfs):
+    text = b'a very repetitive line of text\n' * 500
+    vfs.create_file('/notes.txt', text)
+
+    response = client.get('/api/virtual-files/read/notes.txt?format=raw', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == text
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    response = client.get('/api/virtual-files/read/notes.txt', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] in ('gzip', 'br')
+
+
+def test_unknown_and_unavailable_formats(client, vfs):
+    vfs.create_file('/notes.txt', b'x')
+    assert client.get('/api/virtual-files/read/notes.txt?format=xml').status_code == 400
+    assert client.get('/api/virtual-files/read/missing.txt?format=raw').status_code == 404
+
+    if not virtual_file_routes.MSGPACK_AVAILABLE:
+        assert client.get('/api/virtual-files/read/notes.txt?format=msgpack').status_code == 406
+    if not virtual_file_routes.CBOR_AVAILABLE:
+        assert client.get('/api/virtual-files/read/notes.txt?format=cbor').status_code == 406
+
+
+def test_msgpack_read_is_binary_safe(client, vfs):
+    msgpack = pytest.importorskip('msgpack')
+    vfs.create_file('/data.bin', b'\xff\x00\xfe')
+
+    response = client.get('/api/virtual-files/read/data.bin', headers={'Accept': 'application/msgpack'})
+    assert msgpack.unpackb(response.data, raw=False)['content'] == b'\xff\x00\xfe'
+
+
+def test_cbor_read_is_binary_safe(client, vfs):
+    cbor2 = pytest.importorskip('cbor2')
+    vfs.create_file('/data.bin', b'\xff\x00\xfe')
+
+    response = client.get('/api/virtual-files/read/data.bin?format=cbor')
+    assert cbor2.loads(response.data)['content'] == b'\xff\x00\xfe'
@@ -0,0 +1,71 @@
+"""
+Name and full-text search over the VFS index
+"""
+import pytest
+
+
+@pytest.fixture
+def indexed(vfs):
+    if not vfs.search_available:
+        pytest.skip('SQLite was built without FTS5')
+    vfs.create_directory('/docs')
+    vfs.create_directory('/docs/reports')
+    vfs.create_file('/docs/report-2024.txt', b'Quarterly revenue grew strongly in the northern region')
+    vfs.create_file('/docs/reports/summary.md', b'Revenue summary for the board')
+    vfs.create_file('/docs/photo.png', b'\x89PNG revenue')
+    vfs.create_file('/notes.txt', b'Shopping list: apples, pears')
+    return vfs
+
+
+def paths(result):
+    return [item['path'] for item in result['results']]
+
+
+def test_name_modes(indexed):
+    assert set(paths(indexed.search('report', mode='name'))) == {'/docs/reports', '/docs/report-2024.txt'}
+    assert paths(indexed.search('SUMM', mode='prefix')) == ['/docs/reports/summary.md']
+    assert set(paths(indexed.search('*.txt', mode='glob'))) == {'/docs/report-2024.txt', '/notes.txt'}
+    assert paths(indexed.search('/docs/reports/*', mode='glob')) == ['/docs/reports/summary.md']
+
+
+def test_content_mode_ranks_text_files(indexed):
+    result = indexed.search('revenue', mode='content')
+    assert set(paths(result)) == {'/docs/report-2024.txt', '/docs/reports/summary.md'}
+    assert all('snippet' in item and 'score' in item for item in result['results'])
+
+    assert paths(indexed.search('quarter north', mode='content')) == ['/docs/report-2024.txt']
+    assert paths(indexed.search('revenue', mode='content', path='/docs/reports')) == ['/docs/reports/summary.md']
+
+
+def test_index_follows_writes_renames_and_deletes(indexed):
+    indexed.write_file('/notes.txt', b'Shopping list: revenue of the lemonade stand')
+    assert '/notes.txt' in paths(indexed.search('lemonade', mode='content'))
+
+    indexed.rename_path('/docs', '/archive')
+    assert set(paths(indexed.search('report', mode='name'))) == {'/archive/reports', '/archive/report-2024.txt'}
+    assert '/archive/reports/summary.md' in paths(indexed.search('board', mode='content'))
+
+    indexed.delete_path('/archive')
+    assert paths(indexed.search('report', mode='name')) == []
+    assert paths(indexed.search('board', mode='content')) == []
+
+
+def test_pagination_and_bad_queries(indexed):
+    for index in range(5):
+        indexed.create_file(f'/page-{index}.txt', b'')
+    first = indexed.search('page-', limit=3)
+    second = indexed.search('page-', limit=3, offset=3)
+    assert first['has_more'] and not second['has_more']
+    assert len(set(paths(first)) | set(paths(second))) == 5
+
+    with pytest.raises(ValueError):
+        indexed.search('x', mode='regex')
+    with pytest.raises(ValueError):
+        indexed.search('', mode='name')
+
+
+def test_search_route(client, indexed):
+    body = client.get('/api/virtual-files/search?q=summary').get_json()
+    assert [item['path'] for item in body['results']] == ['/docs/reports/summary.md']
+    assert client.get('/api/virtual-files/search?q=x&mode=regex').status_code == 400
+    assert client.get('/api/virtual-files/search?q=x&limit=0').status_code == 400
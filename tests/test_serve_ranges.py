@@ -0,0 +1,95 @@
+"""
+Byte ranges and conditional requests on /api/virtual-files/serve
+"""
+import gzip
+import hashlib
+import os
+
+URL = '/api/virtual-files/serve/data.bin'
+
+
+def test_full_response_carries_validators(client, vfs):
+    content = os.urandom(3000)
+    vfs.create_file('/data.bin', content)
+
+    response = client.get(URL)
+    assert response.status_code == 200
+    assert response.data == content
+    assert response.headers['ETag'] == f'"{hashlib.sha256(content).hexdigest()}"'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.headers['Content-Length'] == '3000'
+    assert 'Last-Modified' in response.headers
+
+
+def test_if_none_match_returns_304(client, vfs):
+    vfs.create_file('/data.bin', b'cached content')
+    etag = client.get(URL).headers['ETag']
+
+    response = client.get(URL, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    vfs.write_file('/data.bin', b'changed content')
+    response = client.get(URL, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.data == b'changed content'
+
+
+def test_single_ranges(client, vfs):
+    content = os.urandom(2 * vfs.CHUNK_SIZE + 100)
+    vfs.create_file('/data.bin', content)
+    size = len(content)
+
+    cases = {
+        'bytes=0-9': (0, 10),
+        f'bytes={vfs.CHUNK_SIZE - 5}-{vfs.CHUNK_SIZE + 4}': (vfs.CHUNK_SIZE - 5, vfs.CHUNK_SIZE + 5),
+        'bytes=-50': (size - 50, size),
+        f'bytes={size - 10}-': (size - 10, size)
+    }
+    for header, (start, stop) in cases.items():
+        response = client.get(URL, headers={'Range': header})
+        assert response.status_code == 206, header
+        assert response.data == content[start:stop], header
+        assert response.headers['Content-Range'] == f'bytes {start}-{stop - 1}/{size}'
+        assert response.headers['Content-Length'] == str(stop - start)
+
+
+def test_multiple_ranges_are_sent_as_multipart(client, vfs):
+    content = b'0123456789' * 100
+    vfs.create_file('/data.bin', content)
+
+    response = client.get(URL, headers={'Range': 'bytes=0-4,100-104'})
+    assert response.status_code == 206
+    assert response.mimetype == 'multipart/byteranges'
+    assert int(response.headers['Content-Length']) == len(response.data)
+    assert b'Content-Range: bytes 0-4/1000' in response.data
+    assert b'Content-Range: bytes 100-104/1000' in response.data
+
+
+def test_unsatisfiable_range_returns_416(client, vfs):
+    vfs.create_file('/data.bin', b'short')
+    response = client.get(URL, headers={'Range': 'bytes=100-200'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == 'bytes */5'
+
+
+def test_stale_if_range_sends_the_whole_file(client, vfs):
+    vfs.create_file('/data.bin', b'0123456789')
+    response = client.get(URL, headers={'Range': 'bytes=0-1', 'If-Range': '"stale"'})
+    assert response.status_code == 200
+    assert response.data == b'0123456789'
+
+
+def test_stored_gzip_is_sent_without_recompressing(client, vfs):
+    text = b'compressible text ' * 1000
+    vfs.create_file('/notes.txt', text)
+
+    response = client.get('/api/virtual-files/serve/notes.txt', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == text
+    assert response.headers['ETag'].startswith('W/')
+
+    response = client.get('/api/virtual-files/serve/notes.txt')
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == text
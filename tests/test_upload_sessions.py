@@ -0,0 +1,121 @@
+"""
+Resumable, parallel chunked upload sessions
+"""
+import hashlib
+import os
+import threading
+
+import pytest
+
+
+def blob_refs(vfs):
+    with vfs._connection() as conn:
+        return conn.execute('SELECT COALESCE(SUM(ref_count), 0) FROM blobs').fetchone()[0]
+
+
+def split(vfs, content):
+    return [content[offset:offset + vfs.CHUNK_SIZE] for offset in range(0, len(content), vfs.CHUNK_SIZE)]
+
+
+def test_chunks_upload_in_parallel_and_out_of_order(vfs):
+    content = os.urandom(3 * vfs.CHUNK_SIZE + 500)
+    session = vfs.create_upload_session('/upload.bin', len(content), hashlib.sha256(content).hexdigest())
+    chunks = split(vfs, content)
+    assert session['missing_chunks'] == [0, 1, 2, 3]
+
+    threads = [threading.Thread(target=vfs.put_upload_chunk, args=(session['session_id'], index, chunk))
+               for index, chunk in reversed(list(enumerate(chunks)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert vfs.get_upload_session(session['session_id'])['missing_chunks'] == []
+    info = vfs.commit_upload_session(session['session_id'])
+    assert info['size'] == len(content)
+    assert vfs.read_file('/upload.bin')['content'] == content
+    assert vfs.get_upload_session(session['session_id']) is None
+
+
+def test_interrupted_upload_resumes_from_missing_chunks(vfs):
+    content = os.urandom(2 * vfs.CHUNK_SIZE + 10)
+    chunks = split(vfs, content)
+    session_id = vfs.create_upload_session('/upload.bin', len(content))['session_id']
+    vfs.put_upload_chunk(session_id, 0, chunks[0])
+
+    # A client reconnecting asks which chunks are still needed
+    session = vfs.get_upload_session(session_id)
+    assert session['received_chunks'] == [0]
+    assert session['bytes_received'] == vfs.CHUNK_SIZE
+    with pytest.raises(ValueError, match='missing'):
+        vfs.commit_upload_session(session_id)
+
+    for index in session['missing_chunks']:
+        vfs.put_upload_chunk(session_id, index, chunks[index])
+    vfs.commit_upload_session(session_id, hashlib.sha256(content).hexdigest())
+    assert vfs.read_file('/upload.bin')['content'] == content
+
+
+def test_hash_mismatches_are_rejected(vfs):
+    content = os.urandom(vfs.CHUNK_SIZE + 1)
+    chunks = split(vfs, content)
+    session_id = vfs.create_upload_session('/upload.bin', len(content), 'ab' * 32)['session_id']
+
+    with pytest.raises(ValueError, match='hash mismatch'):
+        vfs.put_upload_chunk(session_id, 0, chunks[0], expected_chunk_hash='00' * 32)
+    with pytest.raises(ValueError):
+        vfs.put_upload_chunk(session_id, 1, chunks[1] + b'extra')
+
+    vfs.put_upload_chunk(session_id, 0, chunks[0], expected_chunk_hash=hashlib.sha256(chunks[0]).hexdigest())
+    vfs.put_upload_chunk(session_id, 1, chunks[1])
+    with pytest.raises(ValueError, match='hash mismatch'):
+        vfs.commit_upload_session(session_id)
+    assert vfs.get_file_info('/upload.bin') is None
+
+    # The session survives a failed commit and can still be committed with the right hash
+    vfs.commit_upload_session(session_id, hashlib.sha256(content).hexdigest())
+    assert vfs.read_file('/upload.bin')['content'] == content
+
+
+def test_resent_and_aborted_chunks_release_their_blobs(vfs):
+    session_id = vfs.create_upload_session('/upload.bin', vfs.CHUNK_SIZE + 3)['session_id']
+    vfs.put_upload_chunk(session_id, 0, os.urandom(vfs.CHUNK_SIZE))
+    vfs.put_upload_chunk(session_id, 0, os.urandom(vfs.CHUNK_SIZE))
+    vfs.put_upload_chunk(session_id, 1, b'end')
+    assert blob_refs(vfs) == 2
+
+    assert vfs.abort_upload_session(session_id)
+    assert blob_refs(vfs) == 0
+    assert vfs.put_upload_chunk(session_id, 1, b'end') is None
+
+
+def test_sessions_refuse_bad_targets(vfs):
+    vfs.create_file('/taken.txt', b'x')
+    with pytest.raises(ValueError):
+        vfs.create_upload_session('/taken.txt', 10)
+    with pytest.raises(ValueError):
+        vfs.create_upload_session('/missing/upload.bin', 10)
+    with pytest.raises(ValueError):
+        vfs.create_upload_session('/upload.bin', 10, 'not-a-hash')
+
+
+class FailingStream:
+    """A stream that breaks off after a few reads, like a dropped connection."""
+
+    def __init__(self, reads):
+        self.reads = reads
+
+    def read(self, size):
+        self.reads -= 1
+        if self.reads < 0:
+            raise IOError('connection dropped')
+        return b'q' * size
+
+
+def test_failed_stream_leaves_nothing_staged(vfs):
+    assert not vfs.create_file_streaming('/stream.bin', FailingStream(40), chunk_size=64 * 1024)
+
+    assert vfs.get_file_info('/stream.bin') is None
+    assert blob_refs(vfs) == 0
+    with vfs._connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM upload_sessions').fetchone()[0] == 0
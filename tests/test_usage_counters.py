@@ -0,0 +1,145 @@
+"""
+Subtree usage counters and quotas
+"""
+import random
+import threading
+
+import pytest
+
+from core.virtual_file_manager import QuotaExceededError
+from tests.conftest import inconsistent_directories, recount_usage
+
+
+def test_counters_follow_single_operations(vfs):
+    vfs.create_directory('/a')
+    vfs.create_directory('/a/b')
+    vfs.create_file('/a/b/one.txt', b'12345')
+    vfs.create_file('/a/two.txt', b'123')
+
+    assert vfs.get_usage('/a')['size'] == 8
+    assert vfs.get_usage('/a')['files'] == 2
+    assert vfs.get_usage('/a')['directories'] == 1
+
+    vfs.write_file('/a/b/one.txt', b'1')
+    vfs.copy_path('/a/b', '/a/c')
+    vfs.rename_path('/a/two.txt', '/a/c/two.txt')
+    vfs.delete_path('/a/b')
+
+    assert vfs.get_usage('/a')['size'] == 4
+    assert vfs.get_usage('/a')['files'] == 2
+    assert vfs.get_usage('/a')['directories'] == 1
+    assert inconsistent_directories(vfs) == []
+
+
+def test_counters_stay_consistent_under_concurrent_writers(vfs):
+    directories = ['/shared', '/shared/x', '/shared/y', '/other']
+    for directory in directories:
+        vfs.create_directory(directory)
+
+    errors = []
+
+    def writer(seed):
+        rng = random.Random(seed)
+        try:
+            for step in range(60):
+                directory = rng.choice(directories)
+                path = f'{directory}/f{rng.randrange(12)}'
+                action = rng.randrange(6)
+                if action == 0:
+                    vfs.create_file(path, b'c' * rng.randrange(1, 500))
+                elif action == 1:
+                    vfs.write_file(path, b'w' * rng.randrange(0, 800))
+                elif action == 2:
+                    vfs.patch_file(path, b'p' * rng.randrange(1, 50))
+                elif action == 3:
+                    vfs.rename_path(path, f'{rng.choice(directories)}/r{seed}_{step}')
+                elif action == 4:
+                    vfs.copy_path(path, f'{rng.choice(directories)}/c{seed}_{step}')
+                else:
+                    vfs.delete_path(path)
+        except Exception as e:  # Surface failures from the worker threads
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert inconsistent_directories(vfs) == []
+    usage = vfs.get_usage('/')
+    assert (usage['size'], usage['files'], usage['directories']) == recount_usage(vfs, '/')
+
+
+def test_quota_rejects_writes_over_the_limit(vfs):
+    vfs.create_directory('/limited')
+    vfs.set_quota('/limited', max_bytes=100, max_items=3)
+
+    assert vfs.create_file('/limited/a.txt', b'a' * 60)
+    with pytest.raises(QuotaExceededError):
+        vfs.create_file('/limited/b.txt', b'b' * 60)
+    with pytest.raises(QuotaExceededError):
+        vfs.write_file('/limited/a.txt', b'a' * 101)
+
+    assert vfs.create_directory('/limited/sub')
+    assert vfs.create_file('/limited/sub/c.txt', b'c')
+    with pytest.raises(QuotaExceededError):
+        vfs.create_file('/limited/d.txt', b'd')
+
+    assert vfs.get_usage('/limited')['size'] == 61
+    assert inconsistent_directories(vfs) == []
+
+
+def test_quota_rejects_copies_into_a_full_directory(vfs):
+    vfs.create_directory('/limited')
+    vfs.create_directory('/source')
+    vfs.create_file('/source/big.bin', b'z' * 200)
+    vfs.set_quota('/limited', max_bytes=100)
+
+    with pytest.raises(QuotaExceededError):
+        vfs.copy_path('/source', '/limited/source')
+    assert vfs.get_file_info('/limited/source') is None
+    assert vfs.get_usage('/limited')['size'] == 0
+
+
+class CountingStream:
+    """A stream of total bytes that counts how much of it was read."""
+    
+    def __init__(self, total):
+        self.remaining = total
+        self.bytes_read = 0
+    
+    def read(self, size):
+        size = min(size, self.remaining)
+        self.remaining -= size
+        self.bytes_read += size
+        return b's' * size
+
+
+def test_streamed_upload_stops_at_the_quota(vfs):
+    vfs.create_directory('/limited')
+    vfs.set_quota('/limited', max_bytes=2 * vfs.CHUNK_SIZE)
+    
+    stream = CountingStream(12 * vfs.CHUNK_SIZE)
+    with pytest.raises(QuotaExceededError):
+        vfs.create_file_streaming('/limited/huge.bin', stream, chunk_size=64 * 1024)
+    
+    assert stream.bytes_read <= 3 * vfs.CHUNK_SIZE
+    assert vfs.get_file_info('/limited/huge.bin') is None
+    with vfs._connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM upload_chunks').fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(*) FROM upload_sessions').fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(*) FROM blobs WHERE ref_count > 0').fetchone()[0] == 0
+    assert inconsistent_directories(vfs) == []
+
+
+def test_streamed_upload_into_a_full_directory_stages_nothing(vfs):
+    vfs.create_directory('/limited')
+    vfs.set_quota('/limited', max_items=1)
+    vfs.create_file('/limited/a.txt', b'a')
+    
+    stream = CountingStream(10)
+    with pytest.raises(QuotaExceededError):
+        vfs.create_file_streaming('/limited/b.bin', stream)
+    assert stream.bytes_read == 0
@@ -66,21 +66,14 @@ def install_app_direct(package_file, virtual_file_manager):
         app_vfs_path = f"{installed_vfs_path}/{app_id}"
         app_exists = virtual_file_manager._path_exists(app_vfs_path)
         
+        # Removing the old version, creating the app directory and writing its
+        # files is one batch, so an install either fully applies or leaves the
+        # previous version untouched
+        operations = []
         if app_exists:
             print(f"🔄 App '{app_id}' already exists in VFS - overwriting")
-            # Delete existing app directory
-            print(f"🗑️  Removing existing app: {app_id}")
-            success = virtual_file_manager.delete_path(app_vfs_path)
-            if not success:
-                print(f"❌ Error: Failed to remove existing app")
-                return False
-        
-        # Create app directory in VFS
-        print(f"📁 Creating app directory: {app_vfs_path}")
-        success = virtual_file_manager.create_directory(app_vfs_path)
-        if not success:
-            print(f"❌ Error: Failed to create app directory {app_vfs_path}")
-            return False
+            operations.append({'op': 'delete', 'path': app_vfs_path})
+        operations.append({'op': 'mkdir', 'path': app_vfs_path})
         
         # Install files
         print(f"📥 Installing app files...")
@@ -94,21 +87,20 @@ def install_app_direct(package_file, virtual_file_manager):
             try:
                 # Decode base64 content
                 content = base64.b64decode(base64_content)
-                
-                # Create file in VFS
-                file_vfs_path = f"{app_vfs_path}/{filename}"
-                success = virtual_file_manager.create_file(file_vfs_path, content)
-                
-                if success:
-                    installed_files.append(filename)
-                    print(f"✅ Installed: {filename} ({len(content)} bytes)")
-                else:
-                    print(f"❌ Error: Failed to install {filename}")
-                    return False
-                    
             except Exception as e:
                 eprint(f"❌ Error installing {filename}: {e}")
                 return False
+            
+            operations.append({'op': 'create', 'path': f"{app_vfs_path}/{filename}", 'content': content})
+            installed_files.append((filename, len(content)))
+        
+        batch = virtual_file_manager.apply_batch(operations)
+        if not batch['success']:
+            print(f"❌ Error: Failed to install app files, installation rolled back")
+            return False
+        
+        for filename, size in installed_files:
+            print(f"✅ Installed: {filename} ({size} bytes)")
         
         # Verify installation
         print(f"🔍 Verifying installation...")